@@ -1,11 +1,25 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
-from typing import List, Optional, Dict, Any
+from sqlalchemy import event, inspect, Integer
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.sql import func, cast
+from typing import BinaryIO, List, Optional, Dict, Any
+from itertools import chain
 import os
 
+from app.cache import TTLCache
+from app.utils import query_with_counts
 from app.base_map.models import BaseMap
 from app.base_map.schemas import BaseMapCreate, BaseMapUpdate
+from app.storage import crud as storage_crud
+from app.storage.backends import get_storage
 from app.defect_mark.models import DefectMark
+from app.defect.models import Defect
+from app.defect_category.models import DefectCategory
+
+# zoom 0 時每個叢集格子的邊長（底圖像素），每放大一級邊長減半
+CLUSTER_BASE_CELL_SIZE = 512.0
+
+# (base_map_id, zoom) -> 叢集結果；其他 worker 的寫入靠 ttl 限制過期時間
+_cluster_cache = TTLCache(ttl=30, maxsize=512)
 
 def get_base_map(db: Session, base_map_id: int) -> Optional[BaseMap]:
     """Get a single base map by ID"""
@@ -45,16 +59,43 @@ def update_base_map(db: Session, base_map_id: int, base_map: BaseMapUpdate) -> O
     db.refresh(db_base_map)
     return db_base_map
 
+def save_base_map_image(
+    db: Session,
+    db_base_map: BaseMap,
+    source: BinaryIO,
+    filename: Optional[str],
+    content_type: Optional[str] = None
+    ) -> BaseMap:
+    """Store an uploaded image as the base map's file"""
+    # 建立檔案名稱 (使用 base_map_id)
+    file_extension = os.path.splitext(filename)[1] if filename else ".png"
+    image_path = f"static/base_map/base_map_{db_base_map.base_map_id}{file_extension}"
+    checksum = storage_crud.save_file(get_storage(), image_path, source, content_type)
+
+    db_base_map.file_path = image_path
+    storage_crud.record_checksums(db, {image_path: checksum}, db_base_map.project_id)
+    db.commit()
+    db.refresh(db_base_map)
+    return db_base_map
+
 def delete_base_map(db: Session, base_map_id: int) -> bool:
     """Delete a base map"""
-    db_base_map = get_base_map(db, base_map_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_base_map = (
+        db.query(BaseMap)
+        .options(
+            selectinload(BaseMap.defect_marks)
+        )
+        .filter(BaseMap.base_map_id == base_map_id)
+        .first()
+    )
     if not db_base_map:
         return False
 
     # 刪除圖片檔案（若不是 default.png）
-    if db_base_map.file_path and os.path.exists(db_base_map.file_path):
+    if db_base_map.file_path:
         try:
-            os.remove(db_base_map.file_path)
+            get_storage().delete(db_base_map.file_path)
         except Exception:
             pass
     
@@ -64,15 +105,14 @@ def delete_base_map(db: Session, base_map_id: int) -> bool:
 
 def get_base_maps_with_defect_counts(db: Session, project_id: int) -> List[Dict[str, Any]]:
     """Get base maps with defect counts for a project"""
-    base_maps = get_base_maps_by_project(db, project_id)
+    rows = (
+        query_with_counts(db, BaseMap, {"defect_count": DefectMark.base_map_id})
+        .filter(BaseMap.project_id == project_id)
+        .all()
+    )
     
     result = []
-    for base_map in base_maps:
-        # Count defect marks for this base map
-        defect_count = db.query(func.count(DefectMark.defect_mark_id)).filter(
-            DefectMark.base_map_id == base_map.base_map_id
-        ).scalar()
-        
+    for base_map, defect_count in rows:
         result.append({
             "base_map_id": base_map.base_map_id,
             "project_id": base_map.project_id,
@@ -82,3 +122,118 @@ def get_base_maps_with_defect_counts(db: Session, project_id: int) -> List[Dict[
         })
     
     return result
+
+def get_cluster_cell_size(zoom: int) -> float:
+    """Grid cell size in base map pixels for a zoom level"""
+    return CLUSTER_BASE_CELL_SIZE / (2 ** zoom)
+
+def get_base_map_clusters(db: Session, base_map_id: int, zoom: int) -> Dict[str, Any]:
+    """Get defect marks of a base map grouped into grid clusters for a zoom level"""
+    cache_key = (base_map_id, zoom)
+    cached = _cluster_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    cell_size = get_cluster_cell_size(zoom)
+    cell_x = cast(DefectMark.coordinate_x / cell_size, Integer).label("cell_x")
+    cell_y = cast(DefectMark.coordinate_y / cell_size, Integer).label("cell_y")
+
+    # 一次 GROUP BY 取得每個格子內各狀態、各類別的數量
+    rows = (
+        db.query(
+            cell_x,
+            cell_y,
+            Defect.status,
+            DefectCategory.category_name,
+            func.count(DefectMark.defect_mark_id),
+            func.sum(DefectMark.coordinate_x),
+            func.sum(DefectMark.coordinate_y),
+            func.min(DefectMark.defect_mark_id)
+        )
+        .join(Defect, DefectMark.defect_id == Defect.defect_id)
+        .outerjoin(DefectCategory, Defect.defect_category_id == DefectCategory.defect_category_id)
+        .filter(DefectMark.base_map_id == base_map_id)
+        .group_by(cell_x, cell_y, Defect.status, DefectCategory.category_name)
+        .all()
+    )
+
+    clusters: Dict[tuple, Dict[str, Any]] = {}
+    for cx, cy, defect_status, category_name, count, sum_x, sum_y, min_mark_id in rows:
+        cluster = clusters.setdefault((cx, cy), {
+            "cell_x": cx,
+            "cell_y": cy,
+            "count": 0,
+            "sum_x": 0.0,
+            "sum_y": 0.0,
+            "defect_mark_id": min_mark_id,
+            "status_counts": {},
+            "category_counts": {}
+        })
+        cluster["count"] += count
+        cluster["sum_x"] += sum_x
+        cluster["sum_y"] += sum_y
+        cluster["defect_mark_id"] = min(cluster["defect_mark_id"], min_mark_id)
+        status_key = defect_status or "未設定"
+        cluster["status_counts"][status_key] = cluster["status_counts"].get(status_key, 0) + count
+        category_key = category_name or "未分類"
+        cluster["category_counts"][category_key] = cluster["category_counts"].get(category_key, 0) + count
+
+    result_clusters = []
+    for key in sorted(clusters):
+        cluster = clusters[key]
+        result_clusters.append({
+            "cell_x": cluster["cell_x"],
+            "cell_y": cluster["cell_y"],
+            "center_x": cluster["sum_x"] / cluster["count"],
+            "center_y": cluster["sum_y"] / cluster["count"],
+            "count": cluster["count"],
+            # 單一標記的叢集直接回傳標記 ID，前端可直接畫出該標記
+            "defect_mark_id": cluster["defect_mark_id"] if cluster["count"] == 1 else None,
+            "status_counts": cluster["status_counts"],
+            "category_counts": cluster["category_counts"]
+        })
+
+    result = {
+        "base_map_id": base_map_id,
+        "zoom": zoom,
+        "cell_size": cell_size,
+        "total_count": sum(c["count"] for c in result_clusters),
+        "clusters": result_clusters
+    }
+    _cluster_cache.set(cache_key, result)
+    return result
+
+def invalidate_base_map_clusters(base_map_id: Optional[int] = None) -> None:
+    """Drop cached clusters for one base map, or for all base maps"""
+    if base_map_id is None:
+        _cluster_cache.clear()
+    else:
+        _cluster_cache.invalidate_where(lambda key: key[0] == base_map_id)
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_clusters_after_flush(session, flush_context):
+    """Invalidate cached clusters whenever marks, or the status/category of marked defects, change"""
+    base_map_ids = set()
+    clear_all = False
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, DefectMark):
+            base_map_ids.add(obj.base_map_id)
+            # 標記被移到其他底圖時，舊底圖的快取也要清除
+            base_map_ids.update(inspect(obj).attrs.base_map_id.history.deleted)
+        elif isinstance(obj, BaseMap):
+            base_map_ids.add(obj.base_map_id)
+        elif isinstance(obj, Defect) and obj not in session.new:
+            state = inspect(obj)
+            if (
+                obj in session.deleted
+                or state.attrs.status.history.has_changes()
+                or state.attrs.defect_category_id.history.has_changes()
+            ):
+                clear_all = True
+
+    if clear_all:
+        invalidate_base_map_clusters()
+    else:
+        for base_map_id in base_map_ids:
+            if base_map_id is not None:
+                invalidate_base_map_clusters(base_map_id)
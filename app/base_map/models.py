@@ -1,14 +1,20 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
+from datetime import datetime
 
 class BaseMap(Base):
     __tablename__ = "base_maps"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_base_maps_project_id_updated_at", "project_id", "updated_at"),
+    )
     
     base_map_id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"))
     map_name = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     project = relationship("Project", back_populates="base_maps")
@@ -1,9 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-import os
-from pathlib import Path
 
 from app.database import get_db
 from app.base_map import crud, schemas
@@ -53,6 +50,19 @@ def read_base_map(base_map_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Base map not found")
     return db_base_map
 
+@router.get("/{base_map_id}/clusters", response_model=schemas.BaseMapClustersOut)
+def read_base_map_clusters(
+    base_map_id: int,
+    zoom: int = Query(0, ge=0, le=12),
+    db: Session = Depends(get_db)
+):
+    """Get defect marks grouped into grid clusters for a zoom level
+
+    - zoom: 0 為最遠視角（格子邊長 512 像素），每增加 1 級格子邊長減半
+    """
+    check_exists(db, BaseMap, base_map_id, "base_map_id")
+    return crud.get_base_map_clusters(db, base_map_id=base_map_id, zoom=zoom)
+
 @router.put("/{base_map_id}", response_model=schemas.BaseMapOut)
 def update_base_map(
     base_map_id: int, base_map: schemas.BaseMapUpdate, db: Session = Depends(get_db)
@@ -78,20 +88,4 @@ def upload_project_image(base_map_id: int, file: UploadFile = File(...), db: Ses
     if db_base_map is None:
         raise HTTPException(status_code=404, detail="Base map not found")
 
-    # 確保目錄存在
-    image_dir = Path("static/base_map")
-    image_dir.mkdir(parents=True, exist_ok=True)
-
-    # 建立檔案名稱 (使用 project_id)
-    file_extension = os.path.splitext(file.filename)[1] if file.filename else ".png"
-    image_filename = f"base_map_{base_map_id}{file_extension}"
-    image_path = f"static/base_map/{image_filename}"
-
-    # 儲存檔案
-    with open(image_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # 更新專案的圖片路徑
-    update_data = schemas.BaseMapUpdate(file_path=image_path)
-    updated_base_map = crud.update_base_map(db, base_map_id=base_map_id, base_map=update_data)
-    return updated_base_map
\ No newline at end of file
+    return crud.save_base_map_image(db, db_base_map, file.file, file.filename, file.content_type)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class BaseMapBase(BaseModel):
     project_id: int
@@ -20,3 +20,20 @@ class BaseMapOut(BaseMapBase):
 
 class BaseMapWithDefectCountOut(BaseMapOut):
     defect_count: int
+
+class BaseMapClusterOut(BaseModel):
+    cell_x: int
+    cell_y: int
+    center_x: float
+    center_y: float
+    count: int
+    defect_mark_id: Optional[int] = None
+    status_counts: Dict[str, int]
+    category_counts: Dict[str, int]
+
+class BaseMapClustersOut(BaseModel):
+    base_map_id: int
+    zoom: int
+    cell_size: float
+    total_count: int
+    clusters: List[BaseMapClusterOut]
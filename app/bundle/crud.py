@@ -0,0 +1,237 @@
+import bisect
+import hashlib
+import os
+import posixpath
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.photo.jobs import get_thumbnail_url
+from app.project.models import Project
+from app.responses import dumps
+from app.storage import crud as storage_crud
+from app.storage.backends import LocalStorage, StorageBackend, get_storage, storage_key
+from app.storage.models import StoredFile
+from app.sync import crud as sync_crud
+from app.sync.models import Tombstone
+from app.zipstream import ZipEntry, ZipLayout, build_zip_layout, iter_zip_range, read_stream_range, source_entry
+
+BUNDLE_DATA_NAME = "data.json"
+# 每個 worker 保留幾個專案的離線包版面；版面只記錄檔案位置與 data.json 的分頁起點，不含內容
+BUNDLE_CACHE_SIZE = int(os.getenv("BUNDLE_CACHE_SIZE", "8"))
+
+# project_id -> ProjectBundle；版本改變時整筆取代
+_bundle_cache = TTLCache(maxsize=BUNDLE_CACHE_SIZE)
+
+class BundleVersion(NamedTuple):
+    version: str
+    latest: datetime  # 專案資料最新的異動時間，data.json 的 next_token
+
+class DataCheckpoint(NamedTuple):
+    """Where a page of data.json starts, enough to regenerate it from there"""
+    offset: int
+    after: Optional[Tuple[int, int]]  # 傳給 get_changes 的 after；None 表示只剩結尾
+    opened: int  # 已開啟的資料表陣列數
+    table_rows: int  # 目前資料表陣列已寫入的列數
+
+class BundleData(NamedTuple):
+    """data.json of a bundle, regenerated from the database on every read"""
+    project_id: int
+    token: str
+    page_size: int
+    checkpoints: List[DataCheckpoint]
+
+class ProjectBundle(NamedTuple):
+    version: str
+    layout: ZipLayout
+    etag: str
+    data: BundleData
+
+def _static_key(path: Optional[str]) -> Optional[str]:
+    """Storage key of a path stored in the database, None if outside static/"""
+    if not path:
+        return None
+    key = posixpath.normpath(storage_key(path))
+    return key if key.startswith("static/") else None
+
+def get_bundle_file_paths(changes: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """Static files referenced by a full project dump: project image, base maps, photos and thumbnails"""
+    paths = [row["image_path"] for row in changes["projects"]]
+    paths += [row["file_path"] for row in changes["base_maps"]]
+    for row in changes["photos"]:
+        paths.append(row["image_url"])
+        paths.append(get_thumbnail_url(row["image_url"]))
+    return paths
+
+def get_bundle_version(db: Session, project_id: int) -> Optional[BundleVersion]:
+    """
+    Version of a project's bundle in a single query, None when the project does
+    not exist. It changes whenever a row is written or deleted, or a file of
+    the project is written.
+    """
+    columns = []
+    for model in sync_crud.SYNCED_MODELS:
+        # 走 (project_id, updated_at) 索引
+        columns.append(select(func.max(model.updated_at)).where(model.project_id == project_id).scalar_subquery())
+    columns.append(select(func.max(Tombstone.deleted_at)).where(Tombstone.project_id == project_id).scalar_subquery())
+    # 縮圖等檔案寫入時不一定會修改資料列
+    columns.append(select(func.max(StoredFile.written_at)).where(StoredFile.project_id == project_id).scalar_subquery())
+
+    row = db.execute(select(*columns).where(Project.project_id == project_id)).first()
+    if row is None:
+        return None
+    updated = [value for value in row[:len(sync_crud.SYNCED_MODELS)] if value is not None]
+    key = "|".join(str(value) for value in (project_id, *row))
+    return BundleVersion(hashlib.sha1(key.encode("utf-8")).hexdigest()[:20], max(updated, default=datetime(1970, 1, 1)))
+
+def _iter_bundle_data(
+    db: Session,
+    data: BundleData,
+    checkpoint: DataCheckpoint
+    ) -> Iterator[Tuple[DataCheckpoint, bytes, Dict[str, List[Dict[str, Any]]]]]:
+    """
+    data.json in the shape of a full /changes response, from a checkpoint on,
+    one page of rows at a time: (checkpoint of the page, its bytes, its rows).
+    The output only depends on the rows, so every run produces the same bytes
+    while the bundle version is unchanged.
+    """
+    table_names = [model.__table__.name for model in sync_crud.SYNCED_MODELS]
+    offset, after, opened, table_rows = checkpoint
+    while after is not None:
+        page_checkpoint = DataCheckpoint(offset, after, opened, table_rows)
+        parts: List[bytes] = []
+        if offset == 0:
+            parts.append(b'{"project_id":' + dumps(data.project_id) + b',"full":true,"changes":{')
+        page = sync_crud.get_changes(db, data.project_id, limit=data.page_size, after=after)
+        # 依序開啟資料表陣列，中間沒有資料的資料表寫成空陣列
+        for index, name in enumerate(table_names):
+            rows = page["changes"][name]
+            if not rows:
+                continue
+            while opened <= index:
+                parts.append((b"]," if opened else b"") + dumps(table_names[opened]) + b":[")
+                opened += 1
+                table_rows = 0
+            for row in rows:
+                parts.append((b"," if table_rows else b"") + dumps(row))
+                table_rows += 1
+        after = page["next_position"]
+        if after is None:
+            while opened < len(table_names):
+                parts.append((b"]," if opened else b"") + dumps(table_names[opened]) + b":[")
+                opened += 1
+            parts.append(b']},"deleted":{},"since":null,"next_token":' + dumps(data.token) + b"}")
+        piece = b"".join(parts)
+        yield page_checkpoint, piece, page["changes"]
+        offset += len(piece)
+
+def _file_entries(db: Session, storage: StorageBackend, paths: List[str], modified: datetime) -> List[ZipEntry]:
+    """
+    Entries of the static files that exist in storage, using the size and
+    CRC32 recorded when they were written
+    """
+    keys = list(dict.fromkeys(key for key in map(_static_key, paths) if key is not None))
+    checksums = storage_crud.get_checksums(db, keys)
+    computed: Dict[str, storage_crud.FileChecksum] = {}
+    entries = []
+    for key in keys:
+        if not storage.exists(key):
+            continue
+        checksum = checksums.get(key)
+        # 本機檔案可直接比對大小，發現在程式之外被替換時重新計算
+        if checksum is not None and isinstance(storage, LocalStorage) and checksum.size != os.path.getsize(storage.path(key)):
+            checksum = None
+        # 沒有紀錄（功能上線前的檔案）時讀一次檔案，之後的離線包直接使用紀錄
+        if checksum is None:
+            with storage.open(key) as f:
+                checksum = computed[key] = storage_crud.read_checksum(f)
+        # 儲存端不一定提供修改時間，統一使用資料的最新異動時間，內容不變時版面才會相同
+        entries.append(source_entry(key, key, checksum.size, checksum.crc32, modified=modified))
+    if computed:
+        storage_crud.record_checksums(db, computed, written=False)
+        db.commit()
+    return entries
+
+def _read_storage_range(storage: StorageBackend, key: str, first: int, last: int) -> Iterator[bytes]:
+    """Bytes first..last (exclusive) of a stored file"""
+    with storage.open(key) as f:
+        yield from read_stream_range(f, first, last, key)
+
+def build_project_bundle(db: Session, project_id: int, version: Optional[BundleVersion] = None) -> Optional[ProjectBundle]:
+    """
+    Layout of the offline ZIP of a project: data.json with every row of the
+    project, in the same shape as a full /changes response, plus the static
+    files it references under their storage keys, read through the storage
+    backend. data.json is generated once
+    to learn its size and CRC32 and regenerated from the nearest page when
+    read, so nothing is written to disk.
+    """
+    version = version or get_bundle_version(db, project_id)
+    if version is None:
+        return None
+    # 以資料本身最新的異動時間作為 token，內容不變時 data.json 每次都相同，才能續傳；
+    # 之後的增量同步有 SYNC_OVERLAP_SECONDS 的重疊，不會漏掉同時寫入的資料
+    data = BundleData(project_id, sync_crud.encode_sync_token(version.latest), sync_crud.SYNC_PAGE_SIZE, [])
+    size = crc = 0
+    paths: List[str] = []
+    for checkpoint, piece, changes in _iter_bundle_data(db, data, DataCheckpoint(0, (0, 0), 0, 0)):
+        data.checkpoints.append(checkpoint)
+        size += len(piece)
+        crc = zlib.crc32(piece, crc)
+        paths += get_bundle_file_paths(changes)
+
+    entries = [source_entry(BUNDLE_DATA_NAME, data, size, crc, modified=version.latest)]
+    entries += _file_entries(db, get_storage(), paths, version.latest)
+    layout = build_zip_layout(entries)
+    digest = hashlib.sha1()
+    for entry in layout.entries:
+        digest.update(f"{entry.name}\0{entry.size}\0{entry.crc}\0{entry.modified}\n".encode("utf-8"))
+    return ProjectBundle(version.version, layout, f'"{digest.hexdigest()[:20]}"', data)
+
+def get_project_bundle(db: Session, project_id: int) -> Optional[ProjectBundle]:
+    """Bundle of a project, rebuilt only when its version changed"""
+    version = get_bundle_version(db, project_id)
+    if version is None:
+        _bundle_cache.pop(project_id)
+        return None
+    bundle = _bundle_cache.get(project_id)
+    if bundle is None or bundle.version != version.version:
+        bundle = build_project_bundle(db, project_id, version)
+        _bundle_cache.set(project_id, bundle)
+    return bundle
+
+def _read_data_range(db: Session, bundle: ProjectBundle, first: int, last: int) -> Iterator[bytes]:
+    """Bytes first..last (exclusive) of data.json, generated from the nearest page before first"""
+    checkpoints = bundle.data.checkpoints
+    index = bisect.bisect_right([checkpoint.offset for checkpoint in checkpoints], first) - 1
+    for checkpoint, piece, _ in _iter_bundle_data(db, bundle.data, checkpoints[index]):
+        # 資料在建立版面之後改變時分頁位置會不同，繼續輸出會產生錯誤的壓縮檔
+        if index >= len(checkpoints) or checkpoint != checkpoints[index]:
+            raise IOError(f"Bundle data of project {bundle.data.project_id} changed while streaming")
+        index += 1
+        piece_end = checkpoint.offset + len(piece)
+        chunk = piece[max(first - checkpoint.offset, 0):last - checkpoint.offset]
+        if piece_end >= last:
+            # 內容相同長度的修改無法由分頁位置察覺，送出最後一段前再確認版本
+            current = get_bundle_version(db, bundle.data.project_id)
+            if current is None or current.version != bundle.version:
+                raise IOError(f"Bundle data of project {bundle.data.project_id} changed while streaming")
+            yield chunk
+            return
+        yield chunk
+    raise IOError(f"Bundle data of project {bundle.data.project_id} changed while streaming")
+
+def iter_bundle_range(db: Session, bundle: ProjectBundle, start: int, end: int) -> Iterator[bytes]:
+    """Bytes start..end (inclusive) of the bundle; only the pages of data.json in the range are generated"""
+    storage = get_storage()
+
+    def read_source(source: Any, first: int, last: int) -> Iterator[bytes]:
+        if source is bundle.data:
+            return _read_data_range(db, bundle, first, last)
+        return _read_storage_range(storage, source, first, last)
+
+    return iter_zip_range(bundle.layout, start, end, read_source)
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.bundle import crud
+from app.database import get_db
+from app.responses import RangeNotSatisfiable, etag_matches, parse_range
+
+router = APIRouter()
+
+@router.get(
+    "/{project_id}/bundle.zip",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/zip": {}}}}
+)
+def download_project_bundle(project_id: int, request: Request, db: Session = Depends(get_db)):
+    """Download the project's data and photos as a ZIP for offline use
+
+    支援 Range 續傳；帶 If-Range 時內容不同會改回傳完整檔案
+    """
+    bundle = crud.get_project_bundle(db, project_id)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    size = bundle.layout.size
+    headers = {
+        "ETag": bundle.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f'attachment; filename="project_{project_id}.zip"'
+    }
+    if etag_matches(request.headers.get("if-none-match"), bundle.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # If-Range 必須強比對，內容改變後續傳的片段會拼出損壞的檔案
+    if if_range is None or if_range.strip() == bundle.etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE, headers=headers)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    # 續傳只產生範圍內的 data.json 分頁與檔案；db 在串流結束後才關閉
+    return StreamingResponse(
+        crud.iter_bundle_range(db, bundle, start, end),
+        status_code=status_code,
+        media_type="application/zip",
+        headers=headers
+    )
@@ -0,0 +1,208 @@
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 為選用依賴，未安裝時只提供 gzip
+    brotli = None
+
+# 小於此 bytes 數的回應不壓縮，壓縮標頭與 CPU 成本不划算
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# brotli 預設品質 11 太耗 CPU，動態回應用 4 左右壓縮率已優於 gzip
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# 圖片、ZIP 等已壓縮的格式不再處理
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+    "image/svg+xml",
+)
+
+def get_supported_encodings() -> Tuple[str, ...]:
+    """Encodings this process can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}, e.g. 'gzip, br;q=0.5' -> {'gzip': 1.0, 'br': 0.5}"""
+    codings: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+def select_encoding(header: str, supported: Optional[Tuple[str, ...]] = None) -> Optional[str]:
+    """Best encoding acceptable to the client, None for identity"""
+    supported = supported or get_supported_encodings()
+    codings = parse_accept_encoding(header)
+    best = None
+    best_q = 0.0
+    for encoding in supported:
+        q = codings.get(encoding, codings.get("*", 0.0))
+        # q 相同時依 supported 的順序（br 優先）
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+            self._compress = self._compressor.process
+        else:
+            # wbits=31 產生 gzip 標頭
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+            self._compress = self._compressor.compress
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        chunk = self._compress(data)
+        # 串流時每段都 flush，SSE 或逐步輸出的內容才不會卡在壓縮緩衝區
+        return chunk + self._flush() if flush else chunk
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compress(data) + self._finish()
+
+def compress(data: bytes, encoding: str, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+             brotli_quality: int = COMPRESSION_BROTLI_QUALITY) -> bytes:
+    """Compress a complete body with the given content coding"""
+    return _Compressor(encoding, gzip_level, brotli_quality).finish(data)
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower() or vary.strip() == b"*":
+        return headers
+    return [
+        (key, value + b", Accept-Encoding" if key.lower() == b"vary" else value)
+        for key, value in headers
+    ]
+
+def _is_compressible(headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if _header(headers, b"content-encoding") is not None or _header(headers, b"content-range") is not None:
+        return False
+    cache_control = _header(headers, b"cache-control")
+    if cache_control is not None and b"no-transform" in cache_control.lower():
+        return False
+    content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses with the best encoding the
+    client accepts.
+
+    Complete bodies under minimum_size are sent as is. Streamed bodies are
+    compressed chunk by chunk and flushed after each one, so long-lived
+    streams keep delivering data promptly.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = b""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value
+                break
+        encoding = select_encoding(accept_encoding.decode("latin-1"))
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if not _is_compressible(headers, message["status"]):
+                    passthrough = True
+                    await send(message)
+                    return
+                # 可壓縮的內容一律加上 Vary，避免快取把壓縮版本給不支援的客戶端
+                start_message = {**message, "headers": _add_vary(headers)}
+                if encoding is None:
+                    passthrough = True
+                    await send(start_message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = start_message["headers"]
+
+            if compressor is None:
+                content_length = _header(headers, b"content-length")
+                too_small = (
+                    len(body) < self.minimum_size if not more_body
+                    else content_length is not None and int(content_length) < self.minimum_size
+                )
+                if too_small:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [
+                    (key, value) for key, value in headers if key.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                if not more_body:
+                    compressed = compressor.finish(body)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start_message, "headers": headers})
+
+            if more_body:
+                chunk = compressor.compress(body, flush=True)
+            else:
+                chunk = compressor.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
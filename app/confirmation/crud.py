@@ -7,6 +7,7 @@ from app.confirmation.schemas import ConfirmationCreate, ConfirmationUpdate
 from app.user.models import User
 from app.improvement.models import Improvement
 from app.defect.models import Defect
+from app.notification import crud as notification_crud
 
 def get_confirmation(db: Session, confirmation_id: int) -> Optional[Confirmation]:
     """Get a single confirmation by ID"""
@@ -58,6 +59,14 @@ def create_confirmation(db: Session, confirmation: ConfirmationCreate) -> Confir
         created_at=datetime.utcnow()
     )
     db.add(db_confirmation)
+    
+    # 與確認結果在同一交易寫入通知 outbox
+    improvement = db.query(Improvement).filter(Improvement.improvement_id == confirmation.improvement_id).first()
+    if improvement:
+        defect = db.query(Defect).filter(Defect.defect_id == improvement.defect_id).first()
+        if defect:
+            notification_crud.queue_confirmation_made(db, defect, confirmation.status, confirmation.comment)
+    
     db.commit()
     db.refresh(db_confirmation)
     
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class Confirmation(Base):
     __tablename__ = "confirmations"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_confirmations_project_id_updated_at", "project_id", "updated_at"),
+    )
     
     confirmation_id = Column(Integer, primary_key=True, index=True)
     improvement_id = Column(Integer, ForeignKey("improvements.improvement_id", ondelete="CASCADE"))
@@ -13,6 +17,9 @@ class Confirmation(Base):
     confirmation_date = Column(String)
     status = Column(String)  # 接受、退回、未確認
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 所屬專案的冗餘欄位，新增時由 app.sync 自動帶入，供增量同步依專案查詢
+    project_id = Column(Integer)
     
     # Relationships
     improvement = relationship("Improvement", back_populates="confirmations")
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.exc import InvalidRequestError
 import os
+import logging
 from dotenv import load_dotenv
 
 from sqlalchemy import event
@@ -15,6 +17,19 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 # Load environment variables
 load_dotenv()
 
+# 嚴格載入模式（測試與 staging 開啟）：查詢未宣告載入方式的 relationship 若需要發出 SQL 就直接報錯
+STRICT_LOADING = os.getenv("STRICT_LOADING", "").lower() in ("1", "true", "yes")
+
+@event.listens_for(Session, "do_orm_execute")
+def raise_on_lazy_load(orm_execute_state):
+    # 等同所有 relationship 使用 lazy="raise_on_sql"；identity map 已有的物件不受影響
+    if STRICT_LOADING and orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None:
+        attribute = orm_execute_state.loader_strategy_path[-1]
+        raise InvalidRequestError(
+            f"'{attribute}' is not available due to strict loading; "
+            "declare selectinload()/joinedload() for it in the query"
+        )
+
 # Get database URL from environment variables or use default
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./defect.db")
 
@@ -36,3 +51,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def create_missing_indexes(bind) -> None:
+    """
+    Create indexes declared on the models that are missing in an existing database.
+    create_all() only builds indexes together with new tables, so indexes added to
+    existing models would otherwise never reach databases created earlier.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except Exception as e:
+                # 例如既有資料違反新的唯一索引，記錄後繼續啟動
+                logging.getLogger(__name__).warning("Could not create index %s: %s", index.name, e)
+
+def add_missing_columns(bind) -> None:
+    """
+    Add nullable columns declared on the models that are missing in an existing database.
+    create_all() never alters existing tables, so new columns would otherwise only exist
+    in databases created after they were added.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    preparer = bind.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if column.primary_key or not column.nullable:
+                logging.getLogger(__name__).warning(
+                    "Cannot add NOT NULL column %s.%s automatically", table.name, column.name
+                )
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                ))
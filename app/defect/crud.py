@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session, joinedload, aliased
+from sqlalchemy.orm import Session, joinedload, aliased, selectinload
 from sqlalchemy.sql import func
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -12,6 +12,7 @@ from app.vendor.models import Vendor
 from app.defect_mark.models import DefectMark
 from app.photo.models import Photo
 from app.improvement.models import Improvement
+from app.notification import crud as notification_crud
 
 def get_defect(db: Session, defect_id: int) -> Optional[Defect]:
     """Get a single defect by ID"""
@@ -56,7 +57,7 @@ def get_defects(
 def get_defects_with_details(
     db: Session, 
     skip: int = 0, 
-    limit: int = 100,
+    limit: Optional[int] = 100,
     project_id: Optional[int] = None,
     submitted_id: Optional[int] = None,
     defect_category_id: Optional[int] = None,
@@ -110,6 +111,7 @@ def get_defects_with_details(
             "previous_defect_id": defect.previous_defect_id,
             "status": defect.status,
             "created_at": defect.created_at,
+            "updated_at": defect.updated_at,
             
             # 直接從關聯資料中獲取名稱
             "project_name": defect.project.project_name if defect.project else None,
@@ -149,6 +151,10 @@ def create_defect(db: Session, defect: DefectCreate) -> Defect:
     
     db_defect = Defect(**defect_data)
     db.add(db_defect)
+    if db_defect.assigned_vendor_id:
+        # 與缺失在同一交易寫入通知 outbox
+        db.flush()
+        notification_crud.queue_defect_assigned(db, db_defect)
     db.commit()
     db.refresh(db_defect)
     return db_defect
@@ -166,11 +172,16 @@ def update_defect(db: Session, defect_id: int, defect: DefectUpdate) -> Optional
     
     # 儲存更新前的狀態，以便後續比較
     old_status = db_defect.status
+    old_assigned_vendor_id = db_defect.assigned_vendor_id
     
     update_data = defect.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_defect, key, value)
     
+    # 指派廠商變更時，與更新在同一交易寫入通知 outbox
+    if db_defect.assigned_vendor_id and db_defect.assigned_vendor_id != old_assigned_vendor_id:
+        notification_crud.queue_defect_assigned(db, db_defect)
+    
     db.commit()
     db.refresh(db_defect)
     
@@ -192,7 +203,17 @@ def update_defect(db: Session, defect_id: int, defect: DefectUpdate) -> Optional
 
 def delete_defect(db: Session, defect_id: int) -> bool:
     """Delete a defect"""
-    db_defect = get_defect(db, defect_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_defect = (
+        db.query(Defect)
+        .options(
+            selectinload(Defect.defect_marks),
+            selectinload(Defect.improvements),
+            selectinload(Defect.next_defects)
+        )
+        .filter(Defect.defect_id == defect_id)
+        .first()
+    )
     if not db_defect:
         return False
     
@@ -218,10 +239,11 @@ def get_defect_details(
         joinedload(Defect.assigned_vendor),
         joinedload(Defect.responsible_vendor)
     ]
+    # 集合改用 selectinload，避免標記與改善 join 後資料列相乘
     if with_marks:
-        options.append(joinedload(Defect.defect_marks))
+        options.append(selectinload(Defect.defect_marks))
     if with_improvements:
-        options.append(joinedload(Defect.improvements))
+        options.append(selectinload(Defect.improvements))
 
     defect_obj = db.query(Defect).filter(Defect.defect_id == defect_id).options(*options).first()
     if not defect_obj:
@@ -243,6 +265,7 @@ def get_defect_details(
         "previous_defect_id": defect_obj.previous_defect_id,
         "status": defect_obj.status,
         "created_at": defect_obj.created_at,
+        "updated_at": defect_obj.updated_at,
         "confirmer_id": defect_obj.confirmer_id,
         "project_name": defect_obj.project.project_name if defect_obj.project else None,
         "submitter_name": defect_obj.submitter.name if defect_obj.submitter else None,
@@ -397,3 +420,26 @@ def get_defect_stats(db: Session, project_id: Optional[int] = None) -> Dict[str,
         "rejected_count": rejected_count,
         "category_stats": category_stats
     }
+
+# get_defect_stats 各計數欄位對應的狀態
+_STATUS_COUNT_FIELDS = {
+    "等待中": "waiting_count",
+    "改善中": "improving_count",
+    "待確認": "pending_confirmation_count",
+    "已完成": "completed_count",
+    "退件": "rejected_count"
+}
+
+def summarize_defect_stats(defects: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Same result as get_defect_stats, computed from already loaded get_defects_with_details rows"""
+    stats: Dict[str, Any] = {"total_count": len(defects)}
+    stats.update({field: 0 for field in _STATUS_COUNT_FIELDS.values()})
+    category_counts: Dict[str, int] = {}
+    for defect in defects:
+        field = _STATUS_COUNT_FIELDS.get(defect["status"])
+        if field is not None:
+            stats[field] += 1
+        if defect["category_name"] is not None:
+            category_counts[defect["category_name"]] = category_counts.get(defect["category_name"], 0) + 1
+    stats["category_stats"] = [{"category": name, "count": count} for name, count in category_counts.items()]
+    return stats
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -6,6 +6,13 @@ import uuid
 
 class Defect(Base):
     __tablename__ = "defects"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_defects_project_id_updated_at", "project_id", "updated_at"),
+        # 廠商工作量統計（未完成、逾期、待確認）使用
+        Index("ix_defects_assigned_vendor_status_due", "assigned_vendor_id", "status", "expected_completion_day"),
+        Index("ix_defects_responsible_vendor_status_due", "responsible_vendor_id", "status", "expected_completion_day"),
+    )
     
     defect_id = Column(Integer, primary_key=True, index=True)
     unique_code = Column(String, default=lambda: str(uuid.uuid4()), nullable=False, unique=True)
@@ -22,6 +29,7 @@ class Defect(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String)  # 等待中、改善中、待確認、已完成、退件
     confirmer_id = Column(Integer, ForeignKey("users.user_id", ondelete="SET NULL"))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     project = relationship("Project", back_populates="defects")
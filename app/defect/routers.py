@@ -6,6 +6,7 @@ from app.database import get_db
 from app.defect import crud, schemas
 from app.defect.models import Defect
 from app.utils import check_exists
+from app.responses import trusted_response
 from app.project.models import Project
 from app.user.models import User
 from app.defect_category.models import DefectCategory
@@ -58,7 +59,7 @@ def read_defects(
         assigned_vendor_id=assigned_vendor_id,
         status=status
     )
-    return defects
+    return trusted_response(defects, schemas.DefectDetailOut)
 
 @router.get("/stats", response_model=dict)
 def read_defect_stats(
@@ -113,7 +114,13 @@ def read_defect(
     )
     if defect_data is None:
         raise HTTPException(status_code=404, detail="Defect not found")
-    return defect_data
+    if with_full_related:
+        model = schemas.DefectFullDetailOut
+    elif with_marks or with_photos or with_improvements:
+        model = schemas.DefectWithMarksAndPhotosOut
+    else:
+        model = schemas.DefectDetailOut
+    return trusted_response(defect_data, model)
 
 # 保留舊端點以向後相容，但標記為棄用
 @router.get("/{defect_id}/full", response_model=schemas.DefectFullDetailOut, deprecated=True)
@@ -122,7 +129,7 @@ def read_defect_full(defect_id: int, db: Session = Depends(get_db)):
     defect_data = crud.get_defect_details(db, defect_id=defect_id, with_marks=True, with_photos=True, with_improvements=True, with_full_related=True)
     if defect_data is None:
         raise HTTPException(status_code=404, detail="Defect not found")
-    return defect_data
+    return trusted_response(defect_data, schemas.DefectFullDetailOut)
 
 @router.put("/{defect_id}", response_model=schemas.DefectOut)
 def update_defect(
@@ -1,10 +1,10 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional, Dict, Any
 
 from app.defect_category.models import DefectCategory
 from app.defect_category.schemas import DefectCategoryCreate, DefectCategoryUpdate
 from app.defect.models import Defect
+from app.utils import query_with_counts
 
 def get_defect_category(db: Session, defect_category_id: int) -> Optional[DefectCategory]:
     """Get a single defect category by ID"""
@@ -42,7 +42,15 @@ def update_defect_category(db: Session, defect_category_id: int, defect_category
 
 def delete_defect_category(db: Session, defect_category_id: int) -> bool:
     """Delete a defect category"""
-    db_defect_category = get_defect_category(db, defect_category_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_defect_category = (
+        db.query(DefectCategory)
+        .options(
+            selectinload(DefectCategory.defects)
+        )
+        .filter(DefectCategory.defect_category_id == defect_category_id)
+        .first()
+    )
     if not db_defect_category:
         return False
     
@@ -52,15 +60,14 @@ def delete_defect_category(db: Session, defect_category_id: int) -> bool:
 
 def get_defect_categories_with_counts(db: Session) -> List[Dict[str, Any]]:
     """Get defect categories with defect counts"""
-    categories = get_defect_categories(db)
+    rows = (
+        query_with_counts(db, DefectCategory, {"defect_count": Defect.defect_category_id})
+        .limit(100)
+        .all()
+    )
     
     result = []
-    for category in categories:
-        # Count defects in this category
-        defect_count = db.query(func.count(Defect.defect_id)).filter(
-            Defect.defect_category_id == category.defect_category_id
-        ).scalar()
-        
+    for category, defect_count in rows:
         result.append({
             "defect_category_id": category.defect_category_id,
             "project_id": category.project_id,
@@ -1,14 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
+from datetime import datetime
 
 class DefectCategory(Base):
     __tablename__ = "defect_categories"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_defect_categories_project_id_updated_at", "project_id", "updated_at"),
+    )
     
     defect_category_id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
     category_name = Column(String, nullable=False)
     description = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     project = relationship("Project", back_populates="defect_categories")
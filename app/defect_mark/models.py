@@ -1,16 +1,24 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
+from datetime import datetime
 
 class DefectMark(Base):
     __tablename__ = "defect_marks"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_defect_marks_project_id_updated_at", "project_id", "updated_at"),
+    )
     
     defect_mark_id = Column(Integer, primary_key=True, index=True)
     defect_id = Column(Integer, ForeignKey("defects.defect_id", ondelete="CASCADE"))
-    base_map_id = Column(Integer, ForeignKey("base_maps.base_map_id", ondelete="CASCADE"))
+    base_map_id = Column(Integer, ForeignKey("base_maps.base_map_id", ondelete="CASCADE"), index=True)
     coordinate_x = Column(Float, nullable=False)
     coordinate_y = Column(Float, nullable=False)
     scale = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 所屬專案的冗餘欄位，新增時由 app.sync 自動帶入，供增量同步依專案查詢
+    project_id = Column(Integer)
     
     # Relationships
     defect = relationship("Defect", back_populates="defect_marks")
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.event import crud
+
+logger = logging.getLogger(__name__)
+
+# 每個 worker 輪詢事件表的間隔；只有在有訂閱者時才輪詢
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "0.5"))
+# 事件 ID 出現空缺時（較早取號的交易較晚 commit）持續補查的秒數
+EVENTS_GAP_TIMEOUT = float(os.getenv("EVENTS_GAP_TIMEOUT", "10"))
+EVENTS_QUEUE_SIZE = 1000
+
+class EventBroker:
+    """
+    Fans project events out to the SSE connections of this worker.
+
+    Every worker polls the shared project_events table on its own, so one
+    query per poll interval serves all open connections, and events written
+    by any worker reach every subscriber.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        poll_interval: float = EVENTS_POLL_INTERVAL,
+        gap_timeout: float = EVENTS_GAP_TIMEOUT
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.last_event_id: Optional[int] = None
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._missing: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._poll_lock: Optional[asyncio.Lock] = None
+
+    def _run_in_session(self, func: Callable[..., Any], *args: Any) -> Any:
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    async def run_query(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(db, *args) in a worker thread with a session of its own"""
+        return await asyncio.to_thread(self._run_in_session, func, *args)
+
+    async def subscribe(self, project_id: int) -> asyncio.Queue:
+        """Queue receiving the project's events; None in it means the subscriber fell behind"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self._subscribers.setdefault(project_id, set()).add(queue)
+        if self.last_event_id is None:
+            # 只推送訂閱後的事件，之前的由 SSE 端點依 Last-Event-ID 補送
+            self.last_event_id = await self.run_query(crud.get_latest_event_id)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._poll_loop())
+        return queue
+
+    def unsubscribe(self, project_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(project_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[project_id]
+
+    def publish(self, events: List[Dict[str, Any]]) -> None:
+        """Deliver events to the subscribers of their projects"""
+        for item in events:
+            for queue in list(self._subscribers.get(item["project_id"], ())):
+                try:
+                    queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    # 客戶端處理不及：清空佇列並通知重新連線，重連後依 Last-Event-ID 補送
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+                    self.unsubscribe(item["project_id"], queue)
+
+    def _track_missing(self, events: List[Dict[str, Any]]) -> None:
+        now = time.monotonic()
+        seen = {item["event_id"] for item in events}
+        for event_id in seen:
+            self._missing.pop(event_id, None)
+        highest = max(seen, default=self.last_event_id)
+        # 空缺過大（例如事件被清除）時不追蹤，避免每次輪詢都帶上大量 ID
+        if highest - self.last_event_id <= EVENTS_QUEUE_SIZE:
+            for event_id in range(self.last_event_id + 1, highest):
+                if event_id not in seen:
+                    self._missing.setdefault(event_id, now)
+        self._missing = {
+            event_id: since for event_id, since in self._missing.items()
+            if now - since < self.gap_timeout
+        }
+        self.last_event_id = max(highest, self.last_event_id)
+
+    async def poll_once(self) -> List[Dict[str, Any]]:
+        """Fetch and publish events newer than the last seen one"""
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        # 同時只能有一個輪詢，否則兩次查詢都從同一個 last_event_id 開始，事件會重複推送
+        async with self._poll_lock:
+            if self.last_event_id is None:
+                return []
+            events = await self.run_query(crud.get_events_after, self.last_event_id, list(self._missing))
+            self._track_missing(events)
+            self.publish(events)
+            return events
+
+    async def _poll_loop(self) -> None:
+        while self._subscribers:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Polling project events failed")
+            await asyncio.sleep(self.poll_interval)
+        # 沒有訂閱者後停止輪詢，下次訂閱從當時最新的事件開始，不必追趕中間的事件
+        self.last_event_id = None
+        self._missing.clear()
+
+broker = EventBroker()
+
+def get_event_broker() -> EventBroker:
+    return broker
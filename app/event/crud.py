@@ -0,0 +1,103 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.confirmation.models import Confirmation
+from app.defect.models import Defect
+from app.defect_mark.models import DefectMark
+from app.event.models import ProjectEvent
+from app.improvement.models import Improvement
+from app.photo.models import Photo
+import app.sync.crud  # noqa: F401  before_flush 帶入子資料表的 project_id
+
+# 事件保留時數；每個專案最新的一筆永遠保留
+EVENTS_RETENTION_HOURS = int(os.getenv("EVENTS_RETENTION_HOURS", "24"))
+
+# 會推送事件的資料表，project_id 在 app.sync 的 before_flush 已經帶入
+EVENT_MODELS = (Defect, DefectMark, Improvement, Confirmation, Photo)
+
+def _event_dict(row: Any) -> Dict[str, Any]:
+    return {
+        "event_id": row.event_id,
+        "project_id": row.project_id,
+        "entity": row.entity,
+        "entity_id": row.entity_id,
+        "action": row.action,
+        "created_at": row.created_at
+    }
+
+@event.listens_for(Session, "after_flush")
+def _record_project_events(session, flush_context):
+    """Write a project event for every change of an evented model, in the same transaction"""
+    created_at = datetime.utcnow()
+    rows = []
+    for action, objects in (("created", session.new), ("updated", session.dirty), ("deleted", session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, EVENT_MODELS) or obj.project_id is None:
+                continue
+            if action == "updated" and not session.is_modified(obj, include_collections=False):
+                continue
+            state = inspect(obj)
+            rows.append({
+                "project_id": obj.project_id,
+                "entity": state.mapper.local_table.name,
+                "entity_id": state.mapper.primary_key_from_instance(obj)[0],
+                "action": action,
+                "created_at": created_at
+            })
+    if rows:
+        session.connection().execute(insert(ProjectEvent), rows)
+
+def get_project_events(
+    db: Session,
+    project_id: int,
+    after_event_id: int,
+    limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+    """Events of a project after an event ID, oldest first"""
+    rows = db.execute(
+        select(ProjectEvent)
+        .where(ProjectEvent.project_id == project_id, ProjectEvent.event_id > after_event_id)
+        .order_by(ProjectEvent.event_id)
+        .limit(limit)
+    ).scalars()
+    return [_event_dict(row) for row in rows]
+
+def get_events_after(
+    db: Session,
+    after_event_id: int,
+    missing_ids: Iterable[int] = (),
+    limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+    """Events of all projects after an event ID, plus the listed IDs, oldest first"""
+    condition = ProjectEvent.event_id > after_event_id
+    missing_ids = list(missing_ids)
+    if missing_ids:
+        condition = or_(condition, ProjectEvent.event_id.in_(missing_ids))
+    rows = db.execute(
+        select(ProjectEvent).where(condition).order_by(ProjectEvent.event_id).limit(limit)
+    ).scalars()
+    return [_event_dict(row) for row in rows]
+
+def get_latest_event_id(db: Session, project_id: Optional[int] = None) -> int:
+    """Highest event ID, of one project or overall; 0 when there are none"""
+    query = select(func.max(ProjectEvent.event_id))
+    if project_id is not None:
+        query = query.where(ProjectEvent.project_id == project_id)
+    return db.execute(query).scalar() or 0
+
+def prune_project_events(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete events past the retention period except each project's latest, returns the count"""
+    now = now or datetime.utcnow()
+    latest = select(func.max(ProjectEvent.event_id)).group_by(ProjectEvent.project_id)
+    result = db.execute(
+        delete(ProjectEvent).where(
+            ProjectEvent.created_at < now - timedelta(hours=EVENTS_RETENTION_HOURS),
+            ProjectEvent.event_id.notin_(latest)
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,14 @@
+from datetime import timedelta
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from app.event import crud
+from app.job.handlers import register_periodic_handler
+
+PRUNE_EVENTS_JOB_TYPE = "event.prune"
+
+@register_periodic_handler(PRUNE_EVENTS_JOB_TYPE, timedelta(hours=1))
+def prune_project_events(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove project events past the retention period"""
+    return {"removed": crud.prune_project_events(db)}
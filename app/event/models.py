@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.database import Base
+from datetime import datetime
+
+class ProjectEvent(Base):
+    __tablename__ = "project_events"
+    __table_args__ = (
+        # SSE 斷線重連時依專案補送 Last-Event-ID 之後的事件
+        Index("ix_project_events_project_id_event_id", "project_id", "event_id"),
+    )
+    
+    event_id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, nullable=False)
+    entity = Column(String, nullable=False)  # 資料表名稱，例如 defects
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)  # created、updated、deleted
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from typing import AsyncIterator, Dict, Any, Optional, Set
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.event import crud
+from app.event import jobs  # noqa: F401  註冊事件清理工作
+from app.event.broker import EventBroker, get_event_broker
+from app.project.models import Project
+from app.responses import dumps
+from app.utils import check_exists
+
+router = APIRouter()
+
+# 沒有事件時定期送出註解行，避免 cloudflared 等代理判定連線閒置而中斷
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# 單一連線的最長秒數；結束後 EventSource 會帶 Last-Event-ID 自動重連，連線也會重新分散到各 worker
+EVENTS_STREAM_MAX_SECONDS = float(os.getenv("EVENTS_STREAM_MAX_SECONDS", "300"))
+EVENTS_REPLAY_LIMIT = 1000
+EVENTS_RETRY_MS = 3000
+
+def format_event(item: Dict[str, Any]) -> str:
+    """One project event in text/event-stream format"""
+    return (
+        f"id: {item['event_id']}\n"
+        f"event: {item['entity']}.{item['action']}\n"
+        f"data: {dumps(item).decode('utf-8')}\n\n"
+    )
+
+async def stream_project_events(
+    broker: EventBroker,
+    project_id: int,
+    last_event_id: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    heartbeat_seconds: Optional[float] = None
+    ) -> AsyncIterator[str]:
+    """Replay events after last_event_id, then stream new ones until max_seconds pass"""
+    max_seconds = EVENTS_STREAM_MAX_SECONDS if max_seconds is None else max_seconds
+    heartbeat_seconds = EVENTS_HEARTBEAT_SECONDS if heartbeat_seconds is None else heartbeat_seconds
+    # 先訂閱再補送，補送查詢之後才 commit 的事件一定會進佇列
+    queue = await broker.subscribe(project_id)
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        replayed: Set[int] = set()
+        if last_event_id is not None:
+            events = await broker.run_query(
+                crud.get_project_events, project_id, last_event_id, EVENTS_REPLAY_LIMIT + 1
+            )
+            if len(events) > EVENTS_REPLAY_LIMIT:
+                # 錯過太多事件：通知客戶端改用 /projects/{id}/changes 重新同步
+                latest = await broker.run_query(crud.get_latest_event_id, project_id)
+                yield f"id: {latest}\nevent: reset\ndata: {{}}\n\n"
+                replayed.update(range(last_event_id + 1, latest + 1))
+            else:
+                for item in events:
+                    replayed.add(item["event_id"])
+                    yield format_event(item)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), min(heartbeat_seconds, remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                # 佇列滿了被 broker 移除，結束連線讓客戶端重連補送
+                break
+            if item["event_id"] in replayed:
+                continue
+            yield format_event(item)
+    finally:
+        broker.unsubscribe(project_id, queue)
+
+@router.get("/{project_id}/events", response_class=StreamingResponse)
+def stream_events(
+    project_id: int,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    broker: EventBroker = Depends(get_event_broker)
+):
+    """Stream defect, mark, improvement, confirmation and photo changes of a project (SSE)
+
+    - last_event_id: 從此事件之後補送；瀏覽器重連時會以 Last-Event-ID 標頭帶入
+    """
+    check_exists(db, Project, project_id, "project_id")
+    resume_from = last_event_id_header or last_event_id
+    try:
+        resume_id = int(resume_from) if resume_from else None
+    except ValueError:
+        resume_id = None
+    return StreamingResponse(
+        stream_project_events(broker, project_id, resume_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -6,6 +6,7 @@ from app.improvement.models import Improvement
 from app.improvement.schemas import ImprovementCreate, ImprovementUpdate
 from app.user.models import User
 from app.defect.models import Defect
+from app.notification import crud as notification_crud
 
 def get_improvement(db: Session, improvement_id: int) -> Optional[Improvement]:
     """Get a single improvement by ID"""
@@ -54,6 +55,8 @@ def create_improvement(db: Session, improvement: ImprovementCreate) -> Improveme
     defect = db.query(Defect).filter(Defect.defect_id == improvement.defect_id).first()
     if defect:
         defect.status = "待確認"
+        # 與改善在同一交易寫入通知 outbox
+        notification_crud.queue_improvement_submitted(db, defect, improvement.content)
     
     db.commit()
     db.refresh(db_improvement)
@@ -75,7 +78,15 @@ def update_improvement(db: Session, improvement_id: int, improvement: Improvemen
 
 def delete_improvement(db: Session, improvement_id: int) -> bool:
     """Delete an improvement"""
-    db_improvement = get_improvement(db, improvement_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_improvement = (
+        db.query(Improvement)
+        .options(
+            selectinload(Improvement.confirmations)
+        )
+        .filter(Improvement.improvement_id == improvement_id)
+        .first()
+    )
     if not db_improvement:
         return False
     
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class Improvement(Base):
     __tablename__ = "improvements"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_improvements_project_id_updated_at", "project_id", "updated_at"),
+    )
     
     improvement_id = Column(Integer, primary_key=True, index=True)
     defect_id = Column(Integer, ForeignKey("defects.defect_id", ondelete="CASCADE"))
@@ -12,6 +16,9 @@ class Improvement(Base):
     content = Column(Text)
     improvement_date = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 所屬專案的冗餘欄位，新增時由 app.sync 自動帶入，供增量同步依專案查詢
+    project_id = Column(Integer)
     
     # Relationships
     defect = relationship("Defect", back_populates="improvements")
@@ -0,0 +1,130 @@
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+import json
+
+from app.job.models import Job
+
+# 重試間隔：第 n 次失敗後等待 JOB_BACKOFF_BASE_SECONDS * 2^(n-1) 秒，最多 JOB_BACKOFF_MAX_SECONDS
+JOB_BACKOFF_BASE_SECONDS = 5
+JOB_BACKOFF_MAX_SECONDS = 3600
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    """Get a single job by ID"""
+    return db.query(Job).filter(Job.job_id == job_id).first()
+
+def enqueue_job(
+    db: Session,
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    max_attempts: int = 5,
+    run_after: Optional[datetime] = None,
+    commit: bool = True
+    ) -> Job:
+    """Queue a new job; pass commit=False to enqueue inside the caller's transaction"""
+    db_job = Job(
+        job_type=job_type,
+        payload=json.dumps(payload or {}),
+        status="queued",
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.utcnow()
+    )
+    db.add(db_job)
+    if commit:
+        db.commit()
+        db.refresh(db_job)
+    else:
+        db.flush()
+    return db_job
+
+def claim_next_job(db: Session, worker_id: str, now: Optional[datetime] = None) -> Optional[Job]:
+    """Atomically mark the next due job as running and return it"""
+    now = now or datetime.utcnow()
+    # 其他 worker 可能同時搶同一筆，條件式 UPDATE 失敗時改試下一筆
+    for _ in range(5):
+        candidate = (
+            db.query(Job.job_id)
+            .filter(Job.status == "queued", Job.run_after <= now)
+            .order_by(Job.run_after, Job.job_id)
+            .first()
+        )
+        if candidate is None:
+            return None
+        claimed = (
+            db.query(Job)
+            .filter(Job.job_id == candidate.job_id, Job.status == "queued")
+            .update({
+                Job.status: "running",
+                Job.locked_at: now,
+                Job.locked_by: worker_id,
+                Job.attempts: Job.attempts + 1
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return get_job(db, candidate.job_id)
+    return None
+
+def get_job_payload(job: Job) -> Dict[str, Any]:
+    """Decode the JSON payload of a job"""
+    return json.loads(job.payload) if job.payload else {}
+
+def complete_job(db: Session, job: Job, result: Optional[Any] = None) -> Job:
+    """Mark a job as succeeded"""
+    job.status = "succeeded"
+    job.result = json.dumps(result) if result is not None else None
+    job.last_error = None
+    job.locked_at = None
+    job.locked_by = None
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_backoff_seconds(attempts: int) -> int:
+    """Seconds to wait before retrying a job that has failed `attempts` times"""
+    return min(JOB_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_BACKOFF_MAX_SECONDS)
+
+def fail_job(db: Session, job: Job, error: str, now: Optional[datetime] = None) -> Job:
+    """Schedule a retry with exponential backoff, or mark the job failed once attempts run out"""
+    now = now or datetime.utcnow()
+    job.last_error = error
+    job.locked_at = None
+    job.locked_by = None
+    if job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.run_after = now + timedelta(seconds=get_backoff_seconds(job.attempts))
+    else:
+        job.status = "failed"
+        job.finished_at = now
+    db.commit()
+    db.refresh(job)
+    return job
+
+def requeue_stale_jobs(db: Session, timeout_seconds: int, now: Optional[datetime] = None) -> int:
+    """Put back jobs left running by a worker that died, returns the number requeued"""
+    now = now or datetime.utcnow()
+    count = (
+        db.query(Job)
+        .filter(Job.status == "running", Job.locked_at < now - timedelta(seconds=timeout_seconds))
+        .update({
+            Job.status: "queued",
+            Job.locked_at: None,
+            Job.locked_by: None,
+            Job.run_after: now
+        }, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+def ensure_job_queued(db: Session, job_type: str) -> bool:
+    """Queue a job of job_type unless one is already queued or running, returns True if queued"""
+    pending = (
+        db.query(Job.job_id)
+        .filter(Job.job_type == job_type, Job.status.in_(["queued", "running"]))
+        .first()
+    )
+    if pending is not None:
+        return False
+    enqueue_job(db, job_type)
+    return True
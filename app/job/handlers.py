@@ -0,0 +1,39 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, List, Optional
+
+from app.job import crud
+
+# job_type -> handler(db, payload)，回傳值會以 JSON 存入 Job.result
+JobHandler = Callable[[Session, Dict[str, Any]], Optional[Any]]
+
+_handlers: Dict[str, JobHandler] = {}
+# 週期性維護工作：job_type -> 執行間隔
+_periodic: Dict[str, timedelta] = {}
+
+def register_handler(job_type: str):
+    """Decorator registering the function that runs jobs of `job_type`"""
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+def register_periodic_handler(job_type: str, interval: timedelta):
+    """Like register_handler, for maintenance jobs that queue their next run after each run"""
+    def decorator(func: JobHandler) -> JobHandler:
+        def run_and_reschedule(db: Session, payload: Dict[str, Any]) -> Optional[Any]:
+            result = func(db, payload)
+            crud.enqueue_job(db, job_type, run_after=datetime.utcnow() + interval)
+            return result
+        _handlers[job_type] = run_and_reschedule
+        _periodic[job_type] = interval
+        return func
+    return decorator
+
+def get_handler(job_type: str) -> Optional[JobHandler]:
+    """Get the handler registered for a job type"""
+    return _handlers.get(job_type)
+
+def get_periodic_job_types() -> List[str]:
+    """Job types registered with register_periodic_handler"""
+    return list(_periodic)
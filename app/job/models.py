@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.database import Base
+from datetime import datetime
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # worker 取下一筆工作時使用
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+    
+    job_id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)
+    payload = Column(Text)  # JSON
+    status = Column(String, nullable=False, default="queued")  # queued、running、succeeded、failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime)
+    locked_by = Column(String)
+    last_error = Column(Text)
+    result = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
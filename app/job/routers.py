@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.job import crud, schemas
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=schemas.JobOut)
+def read_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the status of a background job"""
+    db_job = crud.get_job(db, job_id=job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
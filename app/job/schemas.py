@@ -0,0 +1,26 @@
+from pydantic import BaseModel, field_validator
+from datetime import datetime
+from typing import Optional, Any
+import json
+
+class JobOut(BaseModel):
+    job_id: int
+    job_type: str
+    status: str  # queued、running、succeeded、failed
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    model_config = {"from_attributes": True}
+
+    @field_validator("result", mode="before")
+    @classmethod
+    def parse_result(cls, value):
+        # 資料庫以 JSON 字串儲存
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
@@ -0,0 +1,116 @@
+"""
+背景工作 worker，與 API 使用同一個資料庫的 jobs 資料表。
+
+    python -m app.job.worker --concurrency 4
+
+gunicorn worker 重啟不會遺失工作：尚未完成的工作留在資料表中，
+逾時未完成的 running 工作會被重新排入佇列。
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import traceback
+from typing import Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.main  # noqa: F401  載入所有資料表與工作處理器
+from app.database import SessionLocal
+from app.job import crud
+from app.job.handlers import get_handler, get_periodic_job_types
+
+logger = logging.getLogger(__name__)
+
+def process_next_job(db: Session, worker_id: str) -> bool:
+    """Claim and run one due job, returns False when the queue is empty"""
+    job = crud.claim_next_job(db, worker_id)
+    if job is None:
+        return False
+
+    handler = get_handler(job.job_type)
+    if handler is None:
+        crud.fail_job(db, job, f"No handler registered for job type {job.job_type}")
+        return True
+
+    try:
+        result = handler(db, crud.get_job_payload(job))
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.job_id, job.job_type)
+        db.rollback()
+        crud.fail_job(db, job, traceback.format_exc(limit=5))
+        return True
+
+    crud.complete_job(db, job, result)
+    return True
+
+def _worker_loop(
+    session_factory: sessionmaker,
+    worker_id: str,
+    poll_interval: float,
+    stale_timeout: int,
+    stop_event: threading.Event
+    ) -> None:
+    while not stop_event.is_set():
+        db = session_factory()
+        try:
+            crud.requeue_stale_jobs(db, stale_timeout)
+            # 有工作就連續處理，佇列清空後才休息
+            while not stop_event.is_set() and process_next_job(db, worker_id):
+                pass
+        except Exception:
+            logger.exception("Worker %s loop error", worker_id)
+        finally:
+            db.close()
+        stop_event.wait(poll_interval)
+
+def run_worker(
+    concurrency: int = 2,
+    poll_interval: float = 1.0,
+    stale_timeout: int = 600,
+    session_factory: sessionmaker = SessionLocal,
+    stop_event: Optional[threading.Event] = None
+    ) -> None:
+    """Run `concurrency` worker threads until stop_event is set"""
+    stop_event = stop_event or threading.Event()
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=_worker_loop,
+            args=(session_factory, f"{base_id}:{i}", poll_interval, stale_timeout, stop_event),
+            name=f"job-worker-{i}",
+            daemon=True
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run background jobs")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_WORKER_CONCURRENCY", "2")))
+    parser.add_argument("--poll-interval", type=float, default=float(os.getenv("JOB_POLL_INTERVAL", "1.0")))
+    parser.add_argument("--stale-timeout", type=int, default=int(os.getenv("JOB_STALE_TIMEOUT", "600")),
+                        help="seconds before a running job is considered abandoned")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # 週期性維護工作執行後會自行排入下一次，啟動時補排尚未排入的
+    db = SessionLocal()
+    try:
+        for job_type in get_periodic_job_types():
+            crud.ensure_job_queued(db, job_type)
+    finally:
+        db.close()
+    stop_event = threading.Event()
+    # 收到停止訊號時處理完手上的工作再結束
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    run_worker(args.concurrency, args.poll_interval, args.stale_timeout, stop_event=stop_event)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
+import logging
 import os
 
-from app.database import Base, engine
+from app.database import Base, engine, add_missing_columns, create_missing_indexes
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware, router as metrics_router
+from app.profiling import QueryProfilingMiddleware, SQL_PROFILING, SQL_SLOW_QUERY_MS, install_query_profiler
 
 # Import routers
 from app.project.routers import router as project_router
@@ -17,9 +22,21 @@ from app.defect_mark.routers import router as defect_mark_router
 from app.photo.routers import router as photo_router
 from app.improvement.routers import router as improvement_router
 from app.confirmation.routers import router as confirmation_router
+from app.job.routers import router as job_router
+from app.sync.routers import router as sync_router
+from app.event.routers import router as event_router
+from app.snapshot.routers import router as snapshot_router
+from app.bundle.routers import router as bundle_router
+from app.upload.routers import router as upload_router
+from app.report.routers import router as report_router
+from app.trend.routers import router as trend_router
+from app.storage import jobs as storage_jobs  # noqa: F401  註冊孤兒檔案清理工作
+from app.storage.backends import LocalStorage, get_storage, upload_default_images
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+create_missing_indexes(engine)
 
 app = FastAPI(
     title="Backend Defect API",
@@ -36,6 +53,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 依 Accept-Encoding 以 brotli/gzip 壓縮 JSON 等文字回應
+app.add_middleware(CompressionMiddleware)
+
+# 各路由的延遲、回應大小（壓縮後）與錯誤統計，於 /metrics 輸出
+app.add_middleware(MetricsMiddleware)
+
+# 開發除錯用：SQL_PROFILING=1 回傳每個請求的 SQL 次數與時間，SQL_SLOW_QUERY_MS 記錄慢查詢
+if SQL_PROFILING:
+    app.add_middleware(QueryProfilingMiddleware)
+elif SQL_SLOW_QUERY_MS is not None:
+    install_query_profiler()
+
 # Include routers
 app.include_router(project_router, prefix="/projects", tags=["Projects"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
@@ -48,6 +77,15 @@ app.include_router(defect_mark_router, prefix="/defect-marks", tags=["Defect Mar
 app.include_router(photo_router, prefix="/photos", tags=["Photos"])
 app.include_router(improvement_router, prefix="/improvements", tags=["Improvements"])
 app.include_router(confirmation_router, prefix="/confirmations", tags=["Confirmations"])
+app.include_router(job_router, prefix="/jobs", tags=["Jobs"])
+app.include_router(sync_router, prefix="/projects", tags=["Sync"])
+app.include_router(event_router, prefix="/projects", tags=["Events"])
+app.include_router(snapshot_router, prefix="/projects", tags=["Snapshot"])
+app.include_router(bundle_router, prefix="/projects", tags=["Bundle"])
+app.include_router(upload_router, prefix="/uploads", tags=["Uploads"])
+app.include_router(report_router, prefix="/projects", tags=["Reports"])
+app.include_router(trend_router, prefix="/projects", tags=["Trends"])
+app.include_router(metrics_router, tags=["Metrics"])
 
 # Mount static files directory for photos and avatars
 # 使用專案根目錄的 static 資料夾
@@ -58,7 +96,19 @@ if not os.path.exists(static_dir):
 avatar_dir = os.path.join(static_dir, "avatar")
 if not os.path.exists(avatar_dir):
     os.makedirs(avatar_dir)
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+if isinstance(get_storage(), LocalStorage):
+    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+else:
+    # 預設圖片隨程式部署，物件儲存上沒有時先上傳，轉址後才有檔案
+    try:
+        upload_default_images(get_storage())
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not upload default images: %s", e)
+
+    # 檔案放在物件儲存時，舊的 /static 網址轉址到儲存端（預簽網址或公開網址）
+    @app.get("/static/{key:path}", include_in_schema=False)
+    def redirect_static(key: str, request: Request):
+        return RedirectResponse(get_storage().url(f"static/{key}", str(request.base_url)))
 
 @app.get("/")
 async def root():
@@ -0,0 +1,466 @@
+import atexit
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 沒有 fcntl，不合併已結束 worker 的檔案
+    fcntl = None
+
+# 延遲（秒）與回應大小（bytes）的 histogram 分桶
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# 沒有對應路由的請求統一歸到同一個 label，避免任意 URL 造成 label 爆量
+UNMATCHED_ROUTE = "<unmatched>"
+
+# 每個 gunicorn worker 將自己的計數寫到此目錄，/metrics 時加總
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+# /metrics 需帶 Authorization: Bearer <METRICS_TOKEN>；未設定時停用
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# 已結束 worker 的計數合併到此檔案，避免目錄隨 worker 重啟無限增長
+EXITED_SNAPSHOT_NAME = "metrics-exited.json"
+LOCK_NAME = ".lock"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _new_histogram(buckets: Tuple[float, ...]) -> Dict[str, Any]:
+    # counts 為非累積分桶，最後一格為 +Inf
+    return {"counts": [0] * (len(buckets) + 1), "sum": 0.0}
+
+def _observe(histogram: Dict[str, Any], buckets: Tuple[float, ...], value: float) -> None:
+    index = len(buckets)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            index = i
+            break
+    histogram["counts"][index] += 1
+    histogram["sum"] += value
+
+class MetricsRegistry:
+    """
+    Request metrics of a single process.
+
+    Counters and histograms are keyed by (method, route template) so that
+    /defects/1 and /defects/2 share one series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests: Dict[Tuple[str, str, str], int] = {}
+            self.errors: Dict[Tuple[str, str], int] = {}
+            self.durations: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            self.sizes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            self.in_flight = 0
+            # 上次寫出快照後是否有新的請求
+            self.dirty = False
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        response_size: int,
+        error: bool = False
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            request_key = (method, route, str(status_code))
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            if error or status_code >= 500:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if key not in self.durations:
+                self.durations[key] = _new_histogram(DURATION_BUCKETS)
+                self.sizes[key] = _new_histogram(SIZE_BUCKETS)
+            _observe(self.durations[key], DURATION_BUCKETS, duration)
+            _observe(self.sizes[key], SIZE_BUCKETS, response_size)
+            self.dirty = True
+
+    def take_dirty(self) -> bool:
+        """Whether requests finished since the last call"""
+        with self._lock:
+            dirty, self.dirty = self.dirty, False
+            return dirty
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of the current values"""
+        with self._lock:
+            return {
+                "pid": self.pid,
+                "requests": [[*key, value] for key, value in self.requests.items()],
+                "errors": [[*key, value] for key, value in self.errors.items()],
+                "durations": [
+                    [*key, list(h["counts"]), h["sum"]] for key, h in self.durations.items()
+                ],
+                "sizes": [
+                    [*key, list(h["counts"]), h["sum"]] for key, h in self.sizes.items()
+                ],
+                "in_flight": self.in_flight
+            }
+
+registry = MetricsRegistry()
+
+def _snapshot_path(metrics_dir: str) -> str:
+    # pid 可能被重複使用，加上啟動時間避免覆蓋已結束 worker 的計數
+    return os.path.join(
+        metrics_dir, f"metrics-{registry.pid}-{int(registry.started_at * 1000)}.json"
+    )
+
+def write_snapshot(metrics_dir: Optional[str] = None) -> None:
+    """Atomically write this process's metrics for other workers to read"""
+    metrics_dir = metrics_dir or METRICS_DIR
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = _snapshot_path(metrics_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+class SnapshotFlusher:
+    """
+    Background thread writing this worker's snapshot to METRICS_DIR every
+    interval while requests keep finishing, so the last requests before a
+    quiet period are not left unwritten.
+    """
+
+    def __init__(self, interval: float = METRICS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def start(self) -> None:
+        """Start the thread once per process"""
+        # fork 出的 worker 沒有父行程的執行緒，依 pid 判斷是否需要重新啟動
+        if not METRICS_DIR or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name="metrics-flush", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the snapshot if requests finished since the last write"""
+        if not METRICS_DIR or not registry.take_dirty():
+            return
+        try:
+            write_snapshot()
+        except OSError:
+            # 下次再試
+            registry.dirty = True
+
+    def stop(self) -> None:
+        """Stop the thread and write the remaining requests"""
+        with self._lock:
+            self._stop.set()
+            thread, self._thread, self._pid = self._thread, None, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1)
+        self.flush()
+
+flusher = SnapshotFlusher()
+# worker 結束時寫出最後的計數；lifespan shutdown 已寫出時不會重複寫入
+atexit.register(flusher.stop)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+@contextmanager
+def _locked(metrics_dir: str, exclusive: bool) -> Iterator[None]:
+    # 讀取時共用鎖，合併時獨佔鎖，避免讀到合併到一半的結果而重複計算
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(metrics_dir, LOCK_NAME), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _read_snapshot_files(metrics_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    own_path = _snapshot_path(metrics_dir)
+    files = []
+    for name in sorted(os.listdir(metrics_dir)):
+        path = os.path.join(metrics_dir, name)
+        if not name.endswith(".json") or path == own_path:
+            continue
+        try:
+            with open(path) as f:
+                files.append((path, json.load(f)))
+        except (OSError, ValueError):
+            # 寫入中或損毀的檔案略過，下次 scrape 再讀
+            continue
+    return files
+
+def read_snapshots(metrics_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Snapshots of every worker, this process's taken live"""
+    metrics_dir = metrics_dir or METRICS_DIR
+    snapshots = [registry.snapshot()]
+    if not metrics_dir or not os.path.isdir(metrics_dir):
+        return snapshots
+    with _locked(metrics_dir, exclusive=False):
+        snapshots += [snapshot for _, snapshot in _read_snapshot_files(metrics_dir)]
+    return snapshots
+
+def compact_snapshots(metrics_dir: Optional[str] = None) -> int:
+    """
+    Fold the snapshots of exited workers into a single file and remove them.
+    Returns the number of snapshot files removed.
+    """
+    metrics_dir = metrics_dir or METRICS_DIR
+    if not metrics_dir or not os.path.isdir(metrics_dir) or fcntl is None:
+        return 0
+    exited_path = os.path.join(metrics_dir, EXITED_SNAPSHOT_NAME)
+    with _locked(metrics_dir, exclusive=True):
+        files = _read_snapshot_files(metrics_dir)
+        dead = [
+            (path, snapshot) for path, snapshot in files
+            if path != exited_path and snapshot.get("pid") != registry.pid and not _pid_alive(snapshot["pid"])
+        ]
+        if not dead:
+            return 0
+        snapshots = [snapshot for path, snapshot in files if path == exited_path]
+        merged = merge_snapshots(snapshots + [snapshot for _, snapshot in dead], include_in_flight=False)
+        tmp_path = f"{exited_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_merged_to_snapshot(merged), f)
+        os.replace(tmp_path, exited_path)
+        for path, _ in dead:
+            os.remove(path)
+    return len(dead)
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]], include_in_flight: bool = True) -> Dict[str, Any]:
+    """
+    Sum snapshots of several workers.
+
+    Counters of exited workers are kept so totals never go backwards;
+    their in-flight gauge is dropped.
+    """
+    requests: Dict[tuple, int] = {}
+    errors: Dict[tuple, int] = {}
+    durations: Dict[tuple, Dict[str, Any]] = {}
+    sizes: Dict[tuple, Dict[str, Any]] = {}
+    in_flight = 0
+    for snapshot in snapshots:
+        for *key, value in snapshot["requests"]:
+            requests[tuple(key)] = requests.get(tuple(key), 0) + value
+        for *key, value in snapshot["errors"]:
+            errors[tuple(key)] = errors.get(tuple(key), 0) + value
+        for target, series in ((durations, snapshot["durations"]), (sizes, snapshot["sizes"])):
+            for method, route, counts, total in series:
+                histogram = target.setdefault(
+                    (method, route), {"counts": [0] * len(counts), "sum": 0.0}
+                )
+                histogram["counts"] = [a + b for a, b in zip(histogram["counts"], counts)]
+                histogram["sum"] += total
+        # 合併檔沒有 pid，其 in-flight 一律為 0
+        if include_in_flight and snapshot["pid"] and (
+            snapshot["pid"] == registry.pid or _pid_alive(snapshot["pid"])
+        ):
+            in_flight += snapshot["in_flight"]
+    return {
+        "requests": requests,
+        "errors": errors,
+        "durations": durations,
+        "sizes": sizes,
+        "in_flight": in_flight
+    }
+
+def _merged_to_snapshot(merged: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "pid": None,
+        "requests": [[*key, value] for key, value in merged["requests"].items()],
+        "errors": [[*key, value] for key, value in merged["errors"].items()],
+        "durations": [[*key, h["counts"], h["sum"]] for key, h in merged["durations"].items()],
+        "sizes": [[*key, h["counts"], h["sum"]] for key, h in merged["sizes"].items()],
+        "in_flight": 0
+    }
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+def _render_histogram(
+    lines: List[str],
+    name: str,
+    help_text: str,
+    buckets: Tuple[float, ...],
+    series: Dict[tuple, Dict[str, Any]]
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(series.items()):
+        labels = _labels(method=method, route=route)
+        cumulative = 0
+        for bound, count in zip(buckets, histogram["counts"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {cumulative}')
+        cumulative += histogram["counts"][-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+def render_prometheus(merged: Dict[str, Any]) -> str:
+    """Render merged metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    lines.append("# HELP http_requests_total Total HTTP requests by route and status code.")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route, status_code), value in sorted(merged["requests"].items()):
+        lines.append(
+            f"http_requests_total{{{_labels(method=method, route=route, status=status_code)}}} {value}"
+        )
+    lines.append("# HELP http_request_errors_total Requests that raised or returned a 5xx status.")
+    lines.append("# TYPE http_request_errors_total counter")
+    for (method, route), value in sorted(merged["errors"].items()):
+        lines.append(f"http_request_errors_total{{{_labels(method=method, route=route)}}} {value}")
+    _render_histogram(
+        lines, "http_request_duration_seconds", "HTTP request latency in seconds.",
+        DURATION_BUCKETS, merged["durations"]
+    )
+    _render_histogram(
+        lines, "http_response_size_bytes", "HTTP response body size in bytes.",
+        SIZE_BUCKETS, merged["sizes"]
+    )
+    lines.append("# HELP http_requests_in_flight HTTP requests currently being served.")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    lines.append(f"http_requests_in_flight {merged['in_flight']}")
+    return "\n".join(lines) + "\n"
+
+def get_route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the matched route, e.g. /defects/{defect_id}"""
+    # 新版 FastAPI 的 include_router 不再攤平路由，完整路徑在 effective_route_context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None and getattr(context, "path_format", None):
+        return context.path_format
+    route = scope.get("route")
+    if route is not None and getattr(route, "path_format", None):
+        return route.path_format
+    # StaticFiles 等掛載的子應用程式
+    root_path = scope.get("root_path", "")
+    app_root_path = scope.get("app_root_path", root_path)
+    if root_path != app_root_path and root_path.startswith(app_root_path):
+        return root_path[len(app_root_path):] + "/{path}"
+    return UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, size, status and in-flight
+    requests per route template. The snapshot for other workers is written
+    by the flusher thread and once more at lifespan shutdown.
+    """
+
+    def __init__(self, app, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.app = app
+        flusher.interval = flush_interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, receive, self._lifespan_send(send))
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        response_size = 0
+        error = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        registry.request_started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            registry.request_finished(
+                scope["method"],
+                get_route_template(scope),
+                status_code,
+                time.perf_counter() - start,
+                response_size,
+                error=error
+            )
+            flusher.start()
+
+    @staticmethod
+    def _lifespan_send(send):
+        async def send_wrapper(message):
+            if message["type"] == "lifespan.shutdown.complete":
+                flusher.stop()
+            await send(message)
+        return send_wrapper
+
+router = APIRouter()
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Only scrapers holding METRICS_TOKEN may read the metrics"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics(_: None = Depends(require_metrics_token)):
+    """Request metrics of all workers in Prometheus text format"""
+    if METRICS_DIR:
+        write_snapshot()
+        compact_snapshots()
+    merged = merge_snapshots(read_snapshots())
+    return PlainTextResponse(render_prometheus(merged), media_type=PROMETHEUS_CONTENT_TYPE)
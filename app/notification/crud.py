@@ -0,0 +1,108 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta
+import json
+
+from app.notification.models import NotificationOutbox
+from app.defect.models import Defect
+from app.user.models import User
+from app.vendor.models import Vendor
+
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_BACKOFF_BASE_SECONDS = 30
+
+def add_notification(
+    db: Session,
+    event_type: str,
+    recipient_type: str,
+    recipient_id: int,
+    line_id: str,
+    payload: Dict[str, Any]
+    ) -> NotificationOutbox:
+    """Add a notification to the outbox without committing, so it shares the caller's transaction"""
+    db_notification = NotificationOutbox(
+        event_type=event_type,
+        recipient_type=recipient_type,
+        recipient_id=recipient_id,
+        line_id=line_id,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        status="pending",
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(db_notification)
+    return db_notification
+
+def _defect_payload(defect: Defect) -> Dict[str, Any]:
+    return {
+        "defect_id": defect.defect_id,
+        "unique_code": defect.unique_code,
+        "project_id": defect.project_id,
+        "defect_description": defect.defect_description,
+        "location": defect.location
+    }
+
+def queue_defect_assigned(db: Session, defect: Defect) -> Optional[NotificationOutbox]:
+    """Notify the assigned vendor of a defect, if the vendor has a LINE ID"""
+    if not defect.assigned_vendor_id:
+        return None
+    vendor = db.query(Vendor).filter(Vendor.vendor_id == defect.assigned_vendor_id).first()
+    if not vendor or not vendor.line_id:
+        return None
+    return add_notification(db, "defect_assigned", "vendor", vendor.vendor_id, vendor.line_id, _defect_payload(defect))
+
+def queue_improvement_submitted(db: Session, defect: Defect, content: str) -> Optional[NotificationOutbox]:
+    """Notify the user who reported the defect that an improvement was submitted"""
+    if not defect.submitted_id:
+        return None
+    user = db.query(User).filter(User.user_id == defect.submitted_id).first()
+    if not user or not user.line_id:
+        return None
+    payload = _defect_payload(defect)
+    payload["improvement_content"] = content
+    return add_notification(db, "improvement_submitted", "user", user.user_id, user.line_id, payload)
+
+def queue_confirmation_made(db: Session, defect: Defect, confirmation_status: str, comment: Optional[str]) -> Optional[NotificationOutbox]:
+    """Notify the assigned vendor of the confirmation result"""
+    if not defect.assigned_vendor_id:
+        return None
+    vendor = db.query(Vendor).filter(Vendor.vendor_id == defect.assigned_vendor_id).first()
+    if not vendor or not vendor.line_id:
+        return None
+    payload = _defect_payload(defect)
+    payload["confirmation_status"] = confirmation_status
+    payload["comment"] = comment
+    return add_notification(db, "confirmation_made", "vendor", vendor.vendor_id, vendor.line_id, payload)
+
+def get_pending_notifications(db: Session, limit: int = 100, now: Optional[datetime] = None) -> List[NotificationOutbox]:
+    """Get notifications that are due for sending, oldest first"""
+    now = now or datetime.utcnow()
+    return (
+        db.query(NotificationOutbox)
+        .filter(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+        .order_by(NotificationOutbox.notification_id)
+        .limit(limit)
+        .all()
+    )
+
+def mark_notifications_sent(db: Session, notifications: List[NotificationOutbox]) -> None:
+    """Mark notifications as sent"""
+    now = datetime.utcnow()
+    for notification in notifications:
+        notification.status = "sent"
+        notification.attempts += 1
+        notification.sent_at = now
+        notification.last_error = None
+    db.commit()
+
+def mark_notifications_failed(db: Session, notifications: List[NotificationOutbox], error: str) -> None:
+    """Schedule a retry with exponential backoff, giving up after NOTIFICATION_MAX_ATTEMPTS"""
+    now = datetime.utcnow()
+    for notification in notifications:
+        notification.attempts += 1
+        notification.last_error = error
+        if notification.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            notification.status = "failed"
+        else:
+            delay = NOTIFICATION_BACKOFF_BASE_SECONDS * 2 ** (notification.attempts - 1)
+            notification.next_attempt_at = now + timedelta(seconds=delay)
+    db.commit()
@@ -0,0 +1,95 @@
+"""
+通知 dispatcher，將 notification_outbox 中的通知批次送出。
+
+    python -m app.notification.dispatcher --interval 5
+
+通知在 CRUD 的同一個交易中寫入 outbox，API 不需等待 LINE 回應。
+請只執行一個 dispatcher，避免同一則通知重複送出。
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+from sqlalchemy.orm import Session
+
+import app.main  # noqa: F401  載入所有資料表
+from app.database import SessionLocal
+from app.notification import crud
+from app.notification.models import NotificationOutbox
+from app.notification.transports import NotificationTransport, get_transport
+
+logger = logging.getLogger(__name__)
+
+def render_message(event_type: str, payload: Dict[str, Any]) -> str:
+    """Build the text sent to LINE for an outbox event"""
+    description = payload.get("defect_description") or ""
+    location = f"（{payload['location']}）" if payload.get("location") else ""
+    if event_type == "defect_assigned":
+        return f"您有新的缺失待改善{location}：{description}\n缺失代碼：{payload.get('unique_code')}"
+    if event_type == "improvement_submitted":
+        return f"缺失已提交改善，請確認{location}：{description}\n改善內容：{payload.get('improvement_content') or ''}"
+    if event_type == "confirmation_made":
+        result = payload.get("confirmation_status")
+        comment = f"\n說明：{payload['comment']}" if payload.get("comment") else ""
+        return f"改善結果：{result}{location}：{description}{comment}"
+    return description
+
+def dispatch_pending(db: Session, transport: NotificationTransport, batch_size: int = 100) -> int:
+    """Send due notifications, grouping identical messages into multicast batches; returns rows processed"""
+    notifications = crud.get_pending_notifications(db, limit=batch_size)
+    if not notifications:
+        return 0
+
+    # 相同內容的通知合併成一次 multicast
+    groups: "OrderedDict[str, List[NotificationOutbox]]" = OrderedDict()
+    for notification in notifications:
+        text = render_message(notification.event_type, json.loads(notification.payload or "{}"))
+        groups.setdefault(text, []).append(notification)
+
+    for text, group in groups.items():
+        for start in range(0, len(group), transport.max_recipients):
+            batch = group[start:start + transport.max_recipients]
+            line_ids = list(OrderedDict.fromkeys(n.line_id for n in batch))
+            try:
+                transport.send(line_ids, text)
+            except Exception as e:
+                logger.warning("Sending %d notifications failed: %s", len(batch), e)
+                crud.mark_notifications_failed(db, batch, str(e))
+            else:
+                crud.mark_notifications_sent(db, batch)
+
+    return len(notifications)
+
+def run_dispatcher(transport: NotificationTransport, interval: float, batch_size: int, stop_event: threading.Event) -> None:
+    """Dispatch notifications until stop_event is set"""
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            # 一次處理不完時立即處理下一批
+            while not stop_event.is_set() and dispatch_pending(db, transport, batch_size) >= batch_size:
+                pass
+        except Exception:
+            logger.exception("Notification dispatch failed")
+        finally:
+            db.close()
+        stop_event.wait(interval)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send queued LINE notifications")
+    parser.add_argument("--interval", type=float, default=float(os.getenv("NOTIFICATION_INTERVAL", "5")))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("NOTIFICATION_BATCH_SIZE", "100")))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    run_dispatcher(get_transport(), args.interval, args.batch_size, stop_event)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.database import Base
+from datetime import datetime
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # dispatcher 取待發送通知時使用
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    notification_id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)  # defect_assigned、improvement_submitted、confirmation_made
+    recipient_type = Column(String, nullable=False)  # user、vendor
+    recipient_id = Column(Integer, nullable=False)
+    line_id = Column(String, nullable=False)
+    payload = Column(Text)  # JSON
+    status = Column(String, nullable=False, default="pending")  # pending、sent、failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
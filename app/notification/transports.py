@@ -0,0 +1,65 @@
+import abc
+import logging
+import os
+from typing import List, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class NotificationTransport(abc.ABC):
+    """Sends one text message to a batch of LINE IDs; raise on failure so the batch is retried"""
+
+    # 單次最多可送出的收件人數
+    max_recipients = 500
+
+    @abc.abstractmethod
+    def send(self, line_ids: List[str], text: str) -> None:
+        ...
+
+class LineMessagingTransport(NotificationTransport):
+    """LINE Messaging API multicast"""
+
+    max_recipients = 500
+
+    def __init__(self, access_token: str, endpoint: str = "https://api.line.me/v2/bot/message/multicast", timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.client = httpx.Client(
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    def send(self, line_ids: List[str], text: str) -> None:
+        response = self.client.post(self.endpoint, json={
+            "to": line_ids,
+            "messages": [{"type": "text", "text": text}]
+        })
+        response.raise_for_status()
+
+class LogTransport(NotificationTransport):
+    """Only writes messages to the log, used when no LINE channel is configured"""
+
+    def send(self, line_ids: List[str], text: str) -> None:
+        logger.info("Notification to %s: %s", line_ids, text)
+
+class LocalStubTransport(NotificationTransport):
+    """Keeps sent messages in memory for tests"""
+
+    def __init__(self, fail: bool = False, max_recipients: int = 500):
+        self.fail = fail
+        self.max_recipients = max_recipients
+        self.sent: List[Tuple[List[str], str]] = []
+
+    def send(self, line_ids: List[str], text: str) -> None:
+        if self.fail:
+            raise RuntimeError("stub transport failure")
+        self.sent.append((list(line_ids), text))
+
+def get_transport() -> NotificationTransport:
+    """Build the transport selected by NOTIFICATION_TRANSPORT (line, log or stub)"""
+    name = os.getenv("NOTIFICATION_TRANSPORT", "log")
+    if name == "line":
+        return LineMessagingTransport(os.environ["LINE_CHANNEL_ACCESS_TOKEN"])
+    if name == "stub":
+        return LocalStubTransport()
+    return LogTransport()
@@ -1,11 +1,36 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 
+from app.cache import TTLCache
 from app.permission.models import Permission
 from app.permission.schemas import PermissionCreate, PermissionUpdate
 from app.project.models import Project
 from app.user.models import User
 
+# user_email -> {project_id: role}；其他 worker 的權限異動靠 ttl 限制過期時間
+_role_cache = TTLCache(ttl=60, maxsize=4096)
+
+def get_user_project_roles(db: Session, user_email: Optional[str]) -> Dict[int, str]:
+    """Map every project of a user onto the user's role, cached per process"""
+    if not user_email:
+        return {}
+    roles = _role_cache.get(user_email)
+    if roles is None:
+        rows = (
+            db.query(Permission.project_id, Permission.user_role)
+            .filter(Permission.user_email == user_email)
+            .all()
+        )
+        roles = {project_id: role for project_id, role in rows}
+        _role_cache.set(user_email, roles)
+    return dict(roles)
+
+def invalidate_user_project_roles(*user_emails: Optional[str]) -> None:
+    """Drop cached roles of the given users"""
+    for user_email in user_emails:
+        if user_email:
+            _role_cache.pop(user_email)
+
 def get_permission(db: Session, permission_id: int) -> Optional[Permission]:
     """Get a single permission by ID"""
     return db.query(Permission).filter(Permission.permission_id == permission_id).first()
@@ -38,6 +63,7 @@ def create_permission(db: Session, permission: PermissionCreate) -> Permission:
         # Update existing permission
         existing.user_role = permission.user_role
         db.commit()
+        invalidate_user_project_roles(permission.user_email)
         db.refresh(existing)
         return existing
     
@@ -49,6 +75,7 @@ def create_permission(db: Session, permission: PermissionCreate) -> Permission:
     )
     db.add(db_permission)
     db.commit()
+    invalidate_user_project_roles(permission.user_email)
     db.refresh(db_permission)
     return db_permission
 
@@ -60,6 +87,7 @@ def update_permission(db: Session, permission_id: int, permission: PermissionUpd
     
     # 保存原始 project_id
     original_project_id = db_permission.project_id
+    original_user_email = db_permission.user_email
     
     update_data = permission.model_dump(exclude_unset=True)
     for key, value in update_data.items():
@@ -70,6 +98,7 @@ def update_permission(db: Session, permission_id: int, permission: PermissionUpd
         db_permission.project_id = original_project_id
     
     db.commit()
+    invalidate_user_project_roles(original_user_email, db_permission.user_email)
     db.refresh(db_permission)
     return db_permission
 
@@ -79,8 +108,10 @@ def delete_permission(db: Session, permission_id: int) -> bool:
     if not db_permission:
         return False
     
+    user_email = db_permission.user_email
     db.delete(db_permission)
     db.commit()
+    invalidate_user_project_roles(user_email)
     return True
 
 def get_permissions_with_details(db: Session, project_id: Optional[int] = None, user_email: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -1,14 +1,22 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, DateTime
 from sqlalchemy.orm import relationship
 from app.database import Base
+from datetime import datetime
 
 class Permission(Base):
     __tablename__ = "permissions"
+    __table_args__ = (
+        # 增量同步依專案取得 updated_at 之後的異動
+        Index("ix_permissions_project_id_updated_at", "project_id", "updated_at"),
+        # 依使用者查詢其所有專案角色
+        Index("ix_permissions_user_email_project", "user_email", "project_id"),
+    )
     
     permission_id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"))
     user_email = Column(String)#, ForeignKey("users.email", ondelete="CASCADE"))
     user_role = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     project = relationship("Project", back_populates="permissions")
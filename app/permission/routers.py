@@ -5,6 +5,7 @@ from typing import List, Optional
 from app.database import get_db
 from app.permission import crud, schemas
 from app.utils import check_exists
+from app.responses import trusted_response
 from app.project.models import Project
 from app.user.models import User
 
@@ -50,7 +51,7 @@ def read_permissions(
     # Apply pagination manually since we're using a custom query
     start = skip
     end = skip + limit
-    return permissions[start:end]
+    return trusted_response(permissions[start:end], schemas.PermissionWithDetailsOut)
 
 @router.get("/{permission_id}", response_model=schemas.PermissionOut)
 def read_permission(permission_id: int, db: Session = Depends(get_db)):
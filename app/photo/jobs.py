@@ -0,0 +1,40 @@
+import io
+from typing import Dict, Any
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.job.handlers import register_handler
+from app.photo.models import Photo
+from app.storage import crud as storage_crud
+from app.storage.backends import get_storage, storage_key
+
+THUMBNAIL_JOB_TYPE = "photo.thumbnail"
+THUMBNAIL_SIZE = (320, 320)
+
+def get_thumbnail_url(image_url: str) -> str:
+    """Thumbnail URL of a photo, stored in a thumbs/ folder next to the original"""
+    directory, filename = image_url.rsplit("/", 1)
+    return f"{directory}/thumbs/{filename}"
+
+@register_handler(THUMBNAIL_JOB_TYPE)
+def create_photo_thumbnail(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Render the thumbnail of an uploaded photo"""
+    image_url = payload["image_url"]
+    thumbnail_url = get_thumbnail_url(image_url)
+    storage = get_storage()
+
+    # 原圖與縮圖都經由儲存後端讀寫，本機或物件儲存皆同
+    output = io.BytesIO()
+    with storage.open(storage_key(image_url)) as source, Image.open(source) as image:
+        image_format = image.format
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output, format=image_format)
+    output.seek(0)
+    checksum = storage_crud.save_file(storage, storage_key(thumbnail_url), output, Image.MIME.get(image_format))
+    # 與工作完成狀態一起提交
+    project_id = db.query(Photo.project_id).filter(Photo.photo_id == payload.get("photo_id")).scalar()
+    storage_crud.record_checksums(db, {storage_key(thumbnail_url): checksum}, project_id)
+
+    return {"thumbnail_url": thumbnail_url}
@@ -2,13 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-import os
-import uuid
-from datetime import datetime
 
 from app.database import get_db
-from app.photo import crud, schemas
+from app.photo import crud, schemas, services
 from app.utils import check_exists
 from app.defect.models import Defect
 from app.improvement.models import Improvement
@@ -53,69 +49,79 @@ async def upload_photo(
     db: Session = Depends(get_db)
 ):
     """Upload a new photo file"""
-    # Check if related item exists based on related_type
-    if related_type == "defect":
-        check_exists(db, Defect, related_id, "defect_id")
-    elif related_type == "improvement":
-        check_exists(db, Improvement, related_id, "improvement_id")
-    elif related_type == "confirmation":
-        check_exists(db, Confirmation, related_id, "confirmation_id")
-    else:
+    services.check_related_exists(db, related_type, related_id)
+    file_extension = services.get_photo_extension(file.filename)
+    relative_url = services.new_photo_url(related_type, related_id, file_extension)
+    checksums = await services.save_photo_files([file], [relative_url])
+
+    db_photo = services.create_uploaded_photos(db, related_type, related_id, [relative_url], description, checksums)[0]
+
+    # Generate full URL for response
+    base_url = str(request.base_url).rstrip('/')
+    return schemas.PhotoResponse(
+        **db_photo.__dict__,
+        full_url=services.get_photo_full_url(relative_url, base_url)
+    )
+
+@router.post("/batch", response_model=List[schemas.PhotoResponse], status_code=status.HTTP_201_CREATED)
+async def upload_photos(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    related_type: str = Form(...),
+    related_id: int = Form(...),
+    description: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """Upload several photo files of the same item at once"""
+    if len(files) > services.PHOTO_BATCH_MAX_FILES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid related_type: {related_type}. Must be one of: 'defect', 'improvement', 'confirmation'"
+            detail=f"Too many files. At most {services.PHOTO_BATCH_MAX_FILES} files per request"
         )
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    allowed_extensions = [".jpg", ".jpeg", ".png", ".gif"]
-    
-    if file_extension not in allowed_extensions:
+    # 全部檢查通過才開始存檔，任何一個檔案不合格就整批拒絕
+    services.check_related_exists(db, related_type, related_id)
+    extensions = [services.get_photo_extension(file.filename) for file in files]
+    relative_urls = [services.new_photo_url(related_type, related_id, ext) for ext in extensions]
+    checksums = await services.save_photo_files(files, relative_urls)
+
+    db_photos = services.create_uploaded_photos(db, related_type, related_id, relative_urls, description, checksums)
+
+    base_url = str(request.base_url).rstrip('/')
+    return [
+        schemas.PhotoResponse(**photo.__dict__, full_url=services.get_photo_full_url(photo.image_url, base_url))
+        for photo in db_photos
+    ]
+
+@router.post("/upload-url", response_model=schemas.PhotoUploadUrlOut)
+def create_photo_upload_url(upload: schemas.PhotoUploadUrlRequest, db: Session = Depends(get_db)):
+    """Get a presigned URL to upload a photo straight to object storage
+
+    上傳完成後呼叫 /photos/confirm 建立照片資料
+    """
+    services.check_related_exists(db, upload.related_type, upload.related_id)
+    return services.new_photo_upload(upload.related_type, upload.related_id, upload.filename, upload.content_type)
+
+@router.post("/confirm", response_model=List[schemas.PhotoResponse], status_code=status.HTTP_201_CREATED)
+def confirm_photo_uploads(confirm: schemas.PhotoConfirm, request: Request, db: Session = Depends(get_db)):
+    """Create the photos of files uploaded through presigned URLs"""
+    if len(confirm.image_urls) > services.PHOTO_BATCH_MAX_FILES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"
+            detail=f"Too many files. At most {services.PHOTO_BATCH_MAX_FILES} files per request"
         )
-    
-    # Create organized directory structure based on related_type
-    # 使用專案根目錄，確保在 Docker 容器中也能正確掛載
-    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".."))
-    photos_dir = os.path.join(project_root, "static", "photos", related_type)
-    os.makedirs(photos_dir, exist_ok=True)
-    
-    # Create unique filename with related_type, related_id, timestamp and short UUID
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    short_uuid = uuid.uuid4().hex[:8]  # 使用較短的 UUID 保持檔名簡潔
-    unique_filename = f"{related_type}_{related_id}_{timestamp}_{short_uuid}{file_extension}"
-    
-    # Save file to disk
-    file_path = os.path.join(photos_dir, unique_filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Create relative URL path for database
-    relative_url = f"/static/photos/{related_type}/{unique_filename}"
-    
-    # Create photo record in database
-    photo_data = schemas.PhotoCreate(
-        related_type=related_type,
-        related_id=related_id,
-        description=description,
-        image_url=relative_url
+    services.check_related_exists(db, confirm.related_type, confirm.related_id)
+    for image_url in confirm.image_urls:
+        services.check_uploaded_photo(confirm.related_type, confirm.related_id, image_url)
+
+    db_photos = services.create_uploaded_photos(
+        db, confirm.related_type, confirm.related_id, confirm.image_urls, confirm.description
     )
-    
-    db_photo = crud.create_photo(db=db, photo=photo_data)
-    
-    # Generate full URL for response
+
     base_url = str(request.base_url).rstrip('/')
-    full_url = f"{base_url}{relative_url}"
-    
-    # Create response with full URL
-    response_data = schemas.PhotoResponse(
-        **db_photo.__dict__,
-        full_url=full_url
-    )
-    
-    return response_data
+    return [
+        schemas.PhotoResponse(**photo.__dict__, full_url=services.get_photo_full_url(photo.image_url, base_url))
+        for photo in db_photos
+    ]
 
 @router.get("/", response_model=List[schemas.PhotoResponse])
 def read_photos(
@@ -152,7 +158,7 @@ def read_photos(
     base_url = str(request.base_url).rstrip('/')
     result = []
     for photo in photos:
-        full_url = f"{base_url}{photo.image_url}"
+        full_url = services.get_photo_full_url(photo.image_url, base_url)
         result.append(schemas.PhotoResponse(
             **photo.__dict__,
             full_url=full_url
@@ -169,7 +175,7 @@ def read_photo(photo_id: int, request: Request, db: Session = Depends(get_db)):
     
     # Add full URL to the photo
     base_url = str(request.base_url).rstrip('/')
-    full_url = f"{base_url}{db_photo.image_url}"
+    full_url = services.get_photo_full_url(db_photo.image_url, base_url)
     
     return schemas.PhotoResponse(
         **db_photo.__dict__,
@@ -187,7 +193,7 @@ def update_photo(
     
     # Add full URL to the photo
     base_url = str(request.base_url).rstrip('/')
-    full_url = f"{base_url}{db_photo.image_url}"
+    full_url = services.get_photo_full_url(db_photo.image_url, base_url)
     
     return schemas.PhotoResponse(
         **db_photo.__dict__,
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 class PhotoBase(BaseModel):
     related_type: str  # 'defect', 'improvement', 'confirmation'
@@ -31,3 +31,23 @@ class PhotoResponse(PhotoOut):
     full_url: str = Field(description="Full URL to access the photo")
     
     model_config = {"from_attributes": True}
+
+class PhotoUploadUrlRequest(BaseModel):
+    related_type: str = Field(description="Type of related form ('defect', 'improvement', 'confirmation')")
+    related_id: int
+    filename: str = Field(description="Original file name, only its extension is used")
+    content_type: str = "image/jpeg"
+
+class PhotoUploadUrlOut(BaseModel):
+    """Where the client uploads the file itself before confirming it"""
+    image_url: str = Field(description="Pass back to /photos/confirm after the upload")
+    upload_url: str
+    method: str
+    headers: Dict[str, str] = Field(description="Headers the upload request must send")
+    expires_in: int = Field(description="Seconds until upload_url expires")
+
+class PhotoConfirm(BaseModel):
+    related_type: str
+    related_id: int
+    image_urls: List[str] = Field(min_length=1)
+    description: Optional[str] = None
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+
+from app.confirmation.models import Confirmation
+from app.defect.models import Defect
+from app.improvement.models import Improvement
+from app.job import crud as job_crud
+from app.photo.jobs import THUMBNAIL_JOB_TYPE
+from app.photo.models import Photo
+from app.storage import crud as storage_crud
+from app.storage.backends import get_storage, storage_key
+from app.utils import check_exists
+
+ALLOWED_PHOTO_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif"]
+RELATED_MODELS = {
+    "defect": (Defect, "defect_id"),
+    "improvement": (Improvement, "improvement_id"),
+    "confirmation": (Confirmation, "confirmation_id")
+}
+
+# 一次請求最多上傳的照片數
+PHOTO_BATCH_MAX_FILES = int(os.getenv("PHOTO_BATCH_MAX_FILES", "20"))
+# 所有請求共用的存檔執行緒數，避免大量上傳佔滿預設執行緒池
+PHOTO_UPLOAD_WORKERS = int(os.getenv("PHOTO_UPLOAD_WORKERS", "4"))
+
+_upload_executor = ThreadPoolExecutor(max_workers=PHOTO_UPLOAD_WORKERS, thread_name_prefix="photo-upload")
+
+def check_related_exists(db: Session, related_type: str, related_id: int) -> None:
+    """Raise 400 for an unknown related_type and 404 when the related item does not exist"""
+    if related_type not in RELATED_MODELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid related_type: {related_type}. Must be one of: 'defect', 'improvement', 'confirmation'"
+        )
+    model, id_field = RELATED_MODELS[related_type]
+    check_exists(db, model, related_id, id_field)
+
+def get_photo_extension(filename: Optional[str]) -> str:
+    """Lower-case extension of an uploaded file, 400 when the type is not allowed"""
+    file_extension = os.path.splitext(filename or "")[1].lower()
+    if file_extension not in ALLOWED_PHOTO_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_PHOTO_EXTENSIONS)}"
+        )
+    return file_extension
+
+def new_photo_url(related_type: str, related_id: int, file_extension: str) -> str:
+    """Unique /static URL for a new photo of a related item"""
+    # 檔名包含 related_type、related_id、時間與短 UUID
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    short_uuid = uuid.uuid4().hex[:8]
+    return f"/static/photos/{related_type}/{related_type}_{related_id}_{timestamp}_{short_uuid}{file_extension}"
+
+def get_photo_full_url(image_url: str, base_url: str) -> str:
+    """URL the client loads a photo from, served by the API or the object store"""
+    return get_storage().url(storage_key(image_url), base_url)
+
+def save_photo_file(source: BinaryIO, image_url: str, content_type: Optional[str] = None) -> storage_crud.FileChecksum:
+    """Store an uploaded file under the key of its URL, returns its size and CRC32"""
+    return storage_crud.save_file(get_storage(), storage_key(image_url), source, content_type)
+
+def remove_photo_files(image_urls: List[str]) -> None:
+    storage = get_storage()
+    for image_url in image_urls:
+        storage.delete(storage_key(image_url))
+
+async def save_photo_files(files: List[UploadFile], image_urls: List[str]) -> List[storage_crud.FileChecksum]:
+    """Save uploaded files concurrently on the shared upload pool; nothing is left behind on failure"""
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(_upload_executor, save_photo_file, file.file, image_url, file.content_type)
+            for file, image_url in zip(files, image_urls)
+        ),
+        return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        remove_photo_files(image_urls)
+        raise errors[0]
+    return results  # type: ignore[return-value]
+
+def create_uploaded_photos(
+    db: Session,
+    related_type: str,
+    related_id: int,
+    image_urls: List[str],
+    description: Optional[str] = None,
+    checksums: Optional[List[storage_crud.FileChecksum]] = None
+    ) -> List[Photo]:
+    """
+    Insert the photos of saved files and their thumbnail jobs in one transaction,
+    with the checksums returned when the files were saved
+    """
+    photos = [
+        Photo(related_type=related_type, related_id=related_id, description=description, image_url=image_url)
+        for image_url in image_urls
+    ]
+    try:
+        db.add_all(photos)
+        db.flush()
+        for photo, checksum in zip(photos, checksums or []):
+            storage_crud.record_checksums(db, {storage_key(photo.image_url): checksum}, photo.project_id)
+        for photo in photos:
+            # 縮圖交給背景 worker 產生，上傳可立即回應
+            job_crud.enqueue_job(
+                db, THUMBNAIL_JOB_TYPE, {"photo_id": photo.photo_id, "image_url": photo.image_url}, commit=False
+            )
+        photo_ids = [photo.photo_id for photo in photos]
+        db.commit()
+    except Exception:
+        # 資料沒寫入就不保留檔案
+        db.rollback()
+        remove_photo_files(image_urls)
+        raise
+    # commit 後屬性已失效，以一次查詢重新載入，不逐筆 refresh
+    loaded = {photo.photo_id: photo for photo in db.query(Photo).filter(Photo.photo_id.in_(photo_ids))}
+    return [loaded[photo_id] for photo_id in photo_ids]
+
+def new_photo_upload(related_type: str, related_id: int, filename: str, content_type: str) -> Dict[str, Any]:
+    """Reserve a photo URL and hand out a direct upload URL for it, 400 when the backend cannot"""
+    storage = get_storage()
+    if not storage.supports_presigned_upload:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Direct uploads are not supported by this storage backend, upload through POST /photos/"
+        )
+    image_url = new_photo_url(related_type, related_id, get_photo_extension(filename))
+    return {"image_url": image_url, **storage.presigned_upload(storage_key(image_url), content_type)}
+
+def check_uploaded_photo(related_type: str, related_id: int, image_url: str) -> None:
+    """Make sure a directly uploaded photo belongs to the item and has arrived in storage"""
+    # 只接受本 API 發出的網址格式，避免把別的項目或其他目錄的檔案掛到此項目下
+    prefix = f"/static/photos/{related_type}/{related_type}_{related_id}_"
+    if not image_url.startswith(prefix) or "/" in image_url[len(prefix):] or ".." in image_url:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid image_url for {related_type} {related_id}: {image_url}"
+        )
+    get_photo_extension(image_url)
+    if not get_storage().exists(storage_key(image_url)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File has not been uploaded: {image_url}"
+        )
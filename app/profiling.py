@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# SQL_PROFILING=1 時每個回應會帶上 X-DB-* 標頭
+SQL_PROFILING = os.getenv("SQL_PROFILING", "").lower() in ("1", "true", "yes")
+# 超過此毫秒數的敘述連同參數記錄到 log，未設定則不記錄
+SQL_SLOW_QUERY_MS = float(os.environ["SQL_SLOW_QUERY_MS"]) if os.getenv("SQL_SLOW_QUERY_MS") else None
+# 同一形狀的敘述在一個請求中執行超過此次數視為 N+1
+SQL_REPEATED_QUERY_THRESHOLD = int(os.getenv("SQL_REPEATED_QUERY_THRESHOLD", "5"))
+
+_IN_LIST_PATTERN = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+# 交易控制敘述不算查詢，不列入次數
+_TRANSACTION_CONTROL_PREFIXES = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+def get_statement_shape(statement: str) -> str:
+    """Statement text with whitespace and IN-list lengths normalized"""
+    shape = _WHITESPACE_PATTERN.sub(" ", statement).strip()
+    return _IN_LIST_PATTERN.sub("(?)", shape)
+
+class QueryProfile:
+    """Statements executed while a profile is active, with their durations"""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float) -> None:
+        with self._lock:
+            self.statements.append((statement, duration))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.statements.clear()
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([statement for statement, _ in self.statements])
+
+    def __getitem__(self, index: int) -> str:
+        return self.statements[index][0]
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def repeated_statements(self, threshold: int = SQL_REPEATED_QUERY_THRESHOLD) -> Dict[str, int]:
+        """Statement shapes executed at least threshold times"""
+        counts: Dict[str, int] = {}
+        for statement, _ in self.statements:
+            shape = get_statement_shape(statement)
+            counts[shape] = counts.get(shape, 0) + 1
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+# 以 engine 為單位收集的 profile，不受 contextvar 範圍限制（例如 TestClient 在另一個執行緒處理請求）
+_engine_profiles: Dict[Engine, List[QueryProfile]] = {}
+_installed = False
+_install_lock = threading.Lock()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    if statement.lstrip().upper().startswith(_TRANSACTION_CONTROL_PREFIXES):
+        return
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, duration)
+    for engine_profile in _engine_profiles.get(conn.engine, ()):
+        engine_profile.record(statement, duration)
+
+    if SQL_SLOW_QUERY_MS is not None and duration * 1000 >= SQL_SLOW_QUERY_MS:
+        logger.warning("Slow SQL (%.1f ms): %s; parameters=%r", duration * 1000, statement, parameters)
+
+def _handle_error(exception_context):
+    # 失敗的敘述不會觸發 after_cursor_execute，把起始時間移除
+    connection = exception_context.connection
+    if connection is not None:
+        start_times = connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+def install_query_profiler() -> None:
+    """Register the cursor listeners on every engine, once per process"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _installed = True
+
+@contextmanager
+def profile_queries(bind: Optional[Engine] = None) -> Iterator[QueryProfile]:
+    """
+    Collect the statements executed inside the block.
+
+    Without bind only statements of the current context (request, thread)
+    are recorded; with bind every statement sent through that engine is.
+    """
+    install_query_profiler()
+    profile = QueryProfile()
+    if bind is None:
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+    else:
+        _engine_profiles.setdefault(bind, []).append(profile)
+        try:
+            yield profile
+        finally:
+            _engine_profiles[bind].remove(profile)
+            if not _engine_profiles[bind]:
+                del _engine_profiles[bind]
+
+@contextmanager
+def assert_max_queries(max_queries: int, bind: Optional[Engine] = None) -> Iterator[QueryProfile]:
+    """Fail if the block runs more than max_queries statements"""
+    with profile_queries(bind) as profile:
+        yield profile
+    if len(profile) > max_queries:
+        listing = "\n".join(f"{i + 1}. {statement}" for i, statement in enumerate(profile))
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, {len(profile)} were executed:\n{listing}"
+        )
+
+class QueryProfilingMiddleware:
+    """
+    Pure ASGI middleware reporting per-request statement count, DB time and
+    repeated statement shapes as X-DB-* response headers.
+    """
+
+    def __init__(self, app, repeated_threshold: int = SQL_REPEATED_QUERY_THRESHOLD):
+        self.app = app
+        self.repeated_threshold = repeated_threshold
+        install_query_profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = profile.repeated_statements(self.repeated_threshold)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(len(profile)).encode()))
+                headers.append((b"x-db-time-ms", f"{profile.total_time * 1000:.2f}".encode()))
+                headers.append((b"x-db-repeated-queries", str(len(repeated)).encode()))
+                message = {**message, "headers": headers}
+                for shape, count in repeated.items():
+                    logger.warning(
+                        "Possible N+1 on %s %s: statement ran %d times: %s",
+                        scope["method"], scope["path"], count, shape
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
@@ -1,5 +1,4 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional, Dict, Any
 
 from app.project.models import Project
@@ -7,6 +6,11 @@ from app.project.schemas import ProjectCreate, ProjectUpdate
 from app.permission.models import Permission
 from app.base_map.models import BaseMap
 from app.defect.models import Defect
+from app.user.models import User
+from app.vendor.models import Vendor
+from app.defect_category.models import DefectCategory
+from app.storage.backends import get_storage
+from app.utils import query_with_counts
 
 def get_project(db: Session, project_id: int) -> Optional[Project]:
     """Get a single project by ID"""
@@ -44,7 +48,20 @@ import os
 
 def delete_project(db: Session, project_id: int) -> bool:
     """Delete a project (and its image file if only used by this project)"""
-    db_project = get_project(db, project_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_project = (
+        db.query(Project)
+        .options(
+            selectinload(Project.permissions),
+            selectinload(Project.base_maps),
+            selectinload(Project.defects),
+            selectinload(Project.vendors).selectinload(Vendor.assigned_defects),
+            selectinload(Project.vendors).selectinload(Vendor.responsible_defects),
+            selectinload(Project.defect_categories).selectinload(DefectCategory.defects)
+        )
+        .filter(Project.project_id == project_id)
+        .first()
+    )
     if not db_project:
         return False
 
@@ -54,16 +71,14 @@ def delete_project(db: Session, project_id: int) -> bool:
         image_path
         and image_path != "static/project/default.png"
         and f"project_{project_id}" in os.path.basename(image_path)
-        and os.path.exists(image_path)
     ):
         # 檢查資料庫是否還有其他專案引用這個檔案
-        from app.project.models import Project
         other = db.query(Project).filter(
             Project.image_path == image_path, Project.project_id != project_id
         ).first()
         if not other:
             try:
-                os.remove(image_path)
+                get_storage().delete(image_path)
             except Exception:
                 pass
 
@@ -73,19 +88,26 @@ def delete_project(db: Session, project_id: int) -> bool:
 
 def get_project_with_counts(db: Session, project_id: int) -> Optional[Dict[str, Any]]:
     """Get a project with counts of related entities"""
-    project = get_project(db, project_id)
-    if not project:
+    # 以單一查詢取得專案及所有關聯數量
+    row = (
+        query_with_counts(db, Project, {
+            "base_map_count": BaseMap.project_id,
+            "defect_count": Defect.project_id,
+            "user_count": Permission.project_id
+        })
+        .filter(Project.project_id == project_id)
+        .first()
+    )
+    if not row:
         return None
-    
-    # Count related entities
-    base_map_count = db.query(func.count(BaseMap.base_map_id)).filter(BaseMap.project_id == project_id).scalar()
-    defect_count = db.query(func.count(Defect.defect_id)).filter(Defect.project_id == project_id).scalar()
-    user_count = db.query(func.count(Permission.permission_id)).filter(Permission.project_id == project_id).scalar()
+    project, base_map_count, defect_count, user_count = row
     
     # Create result dictionary
     result = {
         "project_id": project.project_id,
         "project_name": project.project_name,
+        "image_path": project.image_path,
+        "unique_code": project.unique_code,
         "created_at": project.created_at,
         "base_map_count": base_map_count,
         "defect_count": defect_count,
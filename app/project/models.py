@@ -10,6 +10,7 @@ class Project(Base):
     project_id = Column(Integer, primary_key=True, index=True)
     project_name = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     image_path = Column(String, default="static/project/default.png")
     unique_code = Column(String, default=lambda: str(uuid.uuid4()), unique=True, nullable=False)
     
@@ -4,11 +4,11 @@ from typing import List, Optional
 
 from app.database import get_db
 from app.project import crud, schemas
+from app.storage import crud as storage_crud
+from app.storage.backends import get_storage
 from app.utils import paginate_query
 from fastapi import UploadFile, File
-import shutil
 import os
-from pathlib import Path
 
 router = APIRouter()
 
@@ -50,18 +50,15 @@ def upload_project_image(project_id: int, file: UploadFile = File(...), db: Sess
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 確保目錄存在
-    image_dir = Path("static/project")
-    image_dir.mkdir(parents=True, exist_ok=True)
-
     # 建立檔案名稱 (使用 project_id)
     file_extension = os.path.splitext(file.filename)[1] if file.filename else ".png"
     image_filename = f"project_{project_id}{file_extension}"
     image_path = f"static/project/{image_filename}"
 
     # 儲存檔案
-    with open(image_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    checksum = storage_crud.save_file(get_storage(), image_path, file.file, file.content_type)
+    # 與圖片路徑一起提交
+    storage_crud.record_checksums(db, {image_path: checksum}, project_id)
 
     # 更新專案的圖片路徑
     update_data = schemas.ProjectUpdate(image_path=image_path)
@@ -1,7 +1,7 @@
-import os
 from sqlalchemy.orm import Session
 from app.project import crud
 from app.base_map.models import BaseMap
+from app.storage.backends import get_storage
 
 def delete_project_with_files(db: Session, project_id: int) -> bool:
     """
@@ -11,9 +11,9 @@ def delete_project_with_files(db: Session, project_id: int) -> bool:
     base_maps = db.query(BaseMap).filter(BaseMap.project_id == project_id).all()
     for base_map in base_maps:
         file_path = base_map.file_path
-        if file_path and os.path.exists(file_path):
+        if file_path:
             try:
-                os.remove(file_path)
+                get_storage().delete(file_path)
             except Exception as e:
                 # 可以根據需求記錄 log 或忽略
                 pass
@@ -0,0 +1,177 @@
+import hashlib
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.defect import crud as defect_crud
+from app.defect_mark.models import DefectMark
+from app.job import crud as job_crud
+from app.job.models import Job
+from app.photo.models import Photo
+from app.project.models import Project
+from app.report import renderer
+from app.report.models import ProjectReport
+from app.snapshot import crud as snapshot_crud
+from app.storage.backends import get_storage
+from app.vendor.models import Vendor
+
+RENDER_REPORT_JOB_TYPE = "report.render"
+
+def get_report_version(db: Session, project_id: int) -> Optional[str]:
+    """
+    Data version of a project's report, None when the project does not exist.
+    Covers the snapshot tables plus the photos and marks drawn in the report.
+    """
+    snapshot_version = snapshot_crud.get_snapshot_version(db, project_id)
+    if snapshot_version is None:
+        return None
+    row = db.execute(select(
+        select(func.max(Photo.updated_at)).where(Photo.project_id == project_id).scalar_subquery(),
+        select(func.max(DefectMark.updated_at)).where(DefectMark.project_id == project_id).scalar_subquery()
+    )).first()
+    key = "|".join(str(value) for value in (snapshot_version, *row))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+def get_vendor(db: Session, project_id: int, vendor_id: int) -> Optional[Vendor]:
+    return db.query(Vendor).filter(Vendor.vendor_id == vendor_id, Vendor.project_id == project_id).first()
+
+def get_report_data(
+    db: Session,
+    project_id: int,
+    vendor_id: Optional[int],
+    version: str
+    ) -> Optional[Dict[str, Any]]:
+    """Everything drawn in a report: defects with their photos and base map marks"""
+    project = db.query(Project).filter(Project.project_id == project_id).first()
+    if project is None:
+        return None
+    vendor = None
+    if vendor_id is not None:
+        vendor = get_vendor(db, project_id, vendor_id)
+        if vendor is None:
+            return None
+
+    # 廠商報告只列出指派給該廠商的缺失
+    defects: List[Dict[str, Any]] = defect_crud.get_defects_with_details(
+        db, limit=None, project_id=project_id, assigned_vendor_id=vendor_id
+    )
+    defect_ids = [defect["defect_id"] for defect in defects]
+    photos: Dict[int, List[str]] = {defect_id: [] for defect_id in defect_ids}
+    marks: Dict[int, List[Dict[str, Any]]] = {defect_id: [] for defect_id in defect_ids}
+    if defect_ids:
+        # 照片與標記各一次查詢，不逐筆載入
+        rows = (
+            db.query(Photo.related_id, Photo.image_url)
+            .filter(Photo.related_type == "defect", Photo.related_id.in_(defect_ids))
+            .order_by(Photo.photo_id)
+        )
+        for defect_id, image_url in rows:
+            photos[defect_id].append(image_url)
+        rows = (
+            db.query(DefectMark)
+            .options(joinedload(DefectMark.base_map))
+            .filter(DefectMark.defect_id.in_(defect_ids))
+            .order_by(DefectMark.defect_mark_id)
+        )
+        for mark in rows:
+            marks[mark.defect_id].append({
+                "base_map_id": mark.base_map_id,
+                "map_name": mark.base_map.map_name if mark.base_map else None,
+                "file_path": mark.base_map.file_path if mark.base_map else None,
+                "coordinate_x": mark.coordinate_x,
+                "coordinate_y": mark.coordinate_y
+            })
+    for defect in defects:
+        defect["photos"] = photos[defect["defect_id"]]
+        defect["marks"] = marks[defect["defect_id"]]
+
+    return {
+        "version": version,
+        "project_id": project_id,
+        "project_name": project.project_name,
+        "vendor_id": vendor_id,
+        "vendor_name": vendor.vendor_name if vendor else None,
+        "stats": defect_crud.summarize_defect_stats(defects),
+        "defects": defects
+    }
+
+def _vendor_filter(vendor_id: Optional[int]) -> Any:
+    # 整個專案的報告 vendor_id 為 NULL，不能用等號比對
+    return ProjectReport.vendor_id.is_(None) if vendor_id is None else ProjectReport.vendor_id == vendor_id
+
+def get_cached_report(
+    db: Session,
+    project_id: int,
+    vendor_id: Optional[int],
+    version: str
+    ) -> Optional[ProjectReport]:
+    """The stored report of exactly this data version, if it was rendered"""
+    return (
+        db.query(ProjectReport)
+        .filter(
+            ProjectReport.project_id == project_id,
+            _vendor_filter(vendor_id),
+            ProjectReport.version == version
+        )
+        .first()
+    )
+
+def request_report_render(db: Session, project_id: int, vendor_id: Optional[int]) -> Job:
+    """Queue a render of the report, reusing a render that is already queued or running"""
+    payload = {"project_id": project_id, "vendor_id": vendor_id}
+    # 重複下載時共用同一個工作；工作會以執行當下的資料版本產生
+    pending = (
+        db.query(Job)
+        .filter(
+            Job.job_type == RENDER_REPORT_JOB_TYPE,
+            Job.status.in_(["queued", "running"]),
+            Job.payload == json.dumps(payload)
+        )
+        .first()
+    )
+    if pending is not None:
+        return pending
+    return job_crud.enqueue_job(db, RENDER_REPORT_JOB_TYPE, payload, max_attempts=2)
+
+def render_project_report(db: Session, project_id: int, vendor_id: Optional[int]) -> Optional[ProjectReport]:
+    """Render and store the report of the current data, replacing older versions"""
+    # 版本在讀取資料之前取得，報告只會比版本新
+    version = get_report_version(db, project_id)
+    if version is None:
+        return None
+    cached = get_cached_report(db, project_id, vendor_id, version)
+    if cached is not None:
+        return cached
+    data = get_report_data(db, project_id, vendor_id, version)
+    if data is None:
+        return None
+
+    storage = get_storage()
+    pdf = renderer.render_report_pdf(data, storage)
+    # 報告放在 static/ 之外，只能經由 API 下載
+    file_key = f"reports/project_{project_id}/{vendor_id or 'all'}_{version}.pdf"
+    storage.save(file_key, io.BytesIO(pdf), "application/pdf")
+
+    old_reports = (
+        db.query(ProjectReport)
+        .filter(
+            ProjectReport.project_id == project_id,
+            _vendor_filter(vendor_id)
+        )
+        .all()
+    )
+    report = ProjectReport(
+        project_id=project_id, vendor_id=vendor_id, version=version, file_key=file_key, file_size=len(pdf)
+    )
+    old_keys = [old.file_key for old in old_reports if old.file_key != file_key]
+    for old in old_reports:
+        db.delete(old)
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    for old_key in old_keys:
+        storage.delete(old_key)
+    return report
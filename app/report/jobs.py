@@ -0,0 +1,16 @@
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from app.job.handlers import register_handler
+from app.report import crud
+
+RENDER_REPORT_JOB_TYPE = crud.RENDER_REPORT_JOB_TYPE
+
+@register_handler(RENDER_REPORT_JOB_TYPE)
+def render_report(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Render a project's PDF report and keep it for later downloads"""
+    report = crud.render_project_report(db, payload["project_id"], payload.get("vendor_id"))
+    if report is None:
+        return {"skipped": "project or vendor no longer exists"}
+    return {"report_id": report.report_id, "version": report.version, "file_size": report.file_size}
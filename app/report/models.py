@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.database import Base
+from datetime import datetime
+
+class ProjectReport(Base):
+    __tablename__ = "project_reports"
+    __table_args__ = (
+        Index("ix_project_reports_project_vendor", "project_id", "vendor_id"),
+    )
+
+    report_id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
+    vendor_id = Column(Integer)  # NULL 為整個專案的報告
+    version = Column(String, nullable=False)  # 產生時的資料版本
+    file_key = Column(String, nullable=False)  # 儲存後端中的 PDF
+    file_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
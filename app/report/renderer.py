@@ -0,0 +1,212 @@
+"""
+缺失報告 PDF 排版。資料由 app.report.crud.get_report_data 準備，這裡只負責畫面。
+"""
+import io
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.platypus import (
+        Image as PdfImage, KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    )
+except ImportError:  # pragma: no cover - reportlab 為選用依賴，未安裝時報告端點回應 503
+    A4 = None
+
+from app.photo.jobs import get_thumbnail_url
+from app.storage.backends import StorageBackend, storage_key
+
+# reportlab 內建的繁體中文字型，不需要另外安裝字型檔
+REPORT_FONT = "MSung-Light"
+# 每筆缺失最多放幾張照片縮圖
+REPORT_PHOTOS_PER_DEFECT = int(os.getenv("REPORT_PHOTOS_PER_DEFECT", "4"))
+# 底圖裁切範圍（以標記為中心的正方形邊長，底圖像素）
+REPORT_MAP_CROP_SIZE = int(os.getenv("REPORT_MAP_CROP_SIZE", "600"))
+
+def is_available() -> bool:
+    """Whether reportlab is installed and reports can be rendered"""
+    return A4 is not None
+
+def _styles() -> Dict[str, "ParagraphStyle"]:
+    if REPORT_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(REPORT_FONT))
+    return {
+        "title": ParagraphStyle("title", fontName=REPORT_FONT, fontSize=18, leading=24, spaceAfter=6),
+        "heading": ParagraphStyle("heading", fontName=REPORT_FONT, fontSize=13, leading=18, spaceBefore=8, spaceAfter=4),
+        "body": ParagraphStyle("body", fontName=REPORT_FONT, fontSize=9, leading=12),
+        "cell": ParagraphStyle("cell", fontName=REPORT_FONT, fontSize=8, leading=10)
+    }
+
+def _value(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+def _text(value: Any) -> str:
+    # Paragraph 會解析 XML 標籤
+    return _value(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _table(rows: List[List[Any]], col_widths: List[float]) -> "Table":
+    table = Table(rows, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.4, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8e8e8")),
+        ("VALIGN", (0, 0), (-1, -1), "TOP")
+    ]))
+    return table
+
+def _load_image(storage: StorageBackend, path: Optional[str]) -> Optional[Image.Image]:
+    if not path:
+        return None
+    try:
+        with storage.open(storage_key(path)) as f:
+            image = Image.open(f)
+            image.load()
+    except Exception:
+        # 檔案遺失或無法解析時略過該圖，不讓整份報告失敗
+        return None
+    return image
+
+def _pdf_image(image: Image.Image, max_width: float, max_height: float) -> "PdfImage":
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=80)
+    buffer.seek(0)
+    ratio = min(max_width / image.width, max_height / image.height)
+    return PdfImage(buffer, width=image.width * ratio, height=image.height * ratio)
+
+def crop_marked_base_map(image: Image.Image, x: float, y: float, size: int = REPORT_MAP_CROP_SIZE) -> Image.Image:
+    """Square crop of a base map centred on a mark, with the mark circled"""
+    half = size // 2
+    # 靠近邊緣時平移裁切框，維持固定大小
+    left = int(min(max(x - half, 0), max(image.width - size, 0)))
+    top = int(min(max(y - half, 0), max(image.height - size, 0)))
+    # 先裁切再轉換色彩，只轉換裁切後的小圖
+    crop = image.crop((left, top, left + size, top + size)).convert("RGB")
+    draw = ImageDraw.Draw(crop)
+    radius = max(size // 30, 6)
+    cx, cy = x - left, y - top
+    for offset in range(3):
+        r = radius + offset
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=(220, 0, 0))
+    return crop
+
+def _marked_map_images(defects: List[Dict[str, Any]], storage: StorageBackend) -> Dict[Tuple[int, int], "PdfImage"]:
+    """Cropped base map of every mark, keyed by (defect_id, mark index)"""
+    marks_by_path: Dict[str, List[Tuple[Tuple[int, int], Dict[str, Any]]]] = {}
+    for defect in defects:
+        for index, mark in enumerate(defect["marks"]):
+            marks_by_path.setdefault(mark["file_path"], []).append(((defect["defect_id"], index), mark))
+
+    images: Dict[Tuple[int, int], "PdfImage"] = {}
+    # 一次只解碼一張底圖，裁切完所有標記後即釋放，只保留壓縮後的小圖
+    for path, marks in marks_by_path.items():
+        base_map = _load_image(storage, path)
+        if base_map is None:
+            continue
+        try:
+            for key, mark in marks:
+                crop = crop_marked_base_map(base_map, mark["coordinate_x"], mark["coordinate_y"])
+                images[key] = _pdf_image(crop, 60 * mm, 60 * mm)
+        finally:
+            base_map.close()
+    return images
+
+def _defect_section(
+    defect: Dict[str, Any],
+    styles: Dict[str, "ParagraphStyle"],
+    storage: StorageBackend,
+    map_images: Dict[Tuple[int, int], "PdfImage"],
+    width: float
+    ) -> List[Any]:
+    story: List[Any] = [Paragraph(f"#{defect['defect_id']} {_text(defect['location'])}", styles["heading"])]
+    details = [
+        ["類別", _value(defect["category_name"]), "狀態", _value(defect["status"])],
+        ["指派廠商", _value(defect["assigned_vendor_name"]), "預計完成", _value(defect["expected_completion_day"])],
+        ["缺失描述", Paragraph(_text(defect["defect_description"]), styles["cell"]), "", ""],
+        ["修繕說明", Paragraph(_text(defect["repair_description"]), styles["cell"]), "", ""]
+    ]
+    table = Table(details, colWidths=[22 * mm, width / 2 - 22 * mm, 22 * mm, width / 2 - 22 * mm])
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), REPORT_FONT),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.4, colors.grey),
+        ("SPAN", (1, 2), (3, 2)),
+        ("SPAN", (1, 3), (3, 3)),
+        ("VALIGN", (0, 0), (-1, -1), "TOP")
+    ]))
+    story.append(table)
+
+    images: List[Any] = [
+        map_images[(defect["defect_id"], index)]
+        for index in range(len(defect["marks"]))
+        if (defect["defect_id"], index) in map_images
+    ]
+    for image_url in defect["photos"][:REPORT_PHOTOS_PER_DEFECT]:
+        # 優先用縮圖，尚未產生時退回原圖
+        photo = _load_image(storage, get_thumbnail_url(image_url)) or _load_image(storage, image_url)
+        if photo is not None:
+            photo.thumbnail((640, 640))
+            images.append(_pdf_image(photo, 40 * mm, 40 * mm))
+    if images:
+        per_row = max(int(width // (45 * mm)), 1)
+        rows = [images[i:i + per_row] for i in range(0, len(images), per_row)]
+        story.append(Spacer(1, 2 * mm))
+        story.append(Table(rows, hAlign="LEFT"))
+    story.append(Spacer(1, 4 * mm))
+    return [KeepTogether(story)]
+
+def render_report_pdf(data: Dict[str, Any], storage: StorageBackend) -> bytes:
+    """Render the defect report of get_report_data as PDF bytes"""
+    if not is_available():
+        raise RuntimeError("reportlab is required to render reports")
+    styles = _styles()
+    buffer = io.BytesIO()
+    margin = 15 * mm
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, leftMargin=margin, rightMargin=margin, topMargin=margin, bottomMargin=margin,
+        title=f"{data['project_name']} 缺失報告", creator="Backend Defect API"
+    )
+    width = A4[0] - 2 * margin
+
+    title = f"{_text(data['project_name'])} 缺失報告"
+    if data["vendor_name"]:
+        title += f" - {_text(data['vendor_name'])}"
+    story: List[Any] = [
+        Paragraph(title, styles["title"]),
+        Paragraph(f"產生時間：{datetime.now():%Y-%m-%d %H:%M}　資料版本：{data['version']}", styles["body"]),
+        Spacer(1, 4 * mm)
+    ]
+
+    stats = data["stats"]
+    summary = [["總數", "等待中", "改善中", "待確認", "已完成", "退件"], [
+        stats["total_count"], stats["waiting_count"], stats["improving_count"],
+        stats["pending_confirmation_count"], stats["completed_count"], stats["rejected_count"]
+    ]]
+    summary_table = _table(summary, [width / 6] * 6)
+    summary_table.setStyle(TableStyle([("FONTNAME", (0, 0), (-1, -1), REPORT_FONT), ("ALIGN", (0, 0), (-1, -1), "CENTER")]))
+    story += [summary_table, Spacer(1, 6 * mm)]
+
+    rows: List[List[Any]] = [[Paragraph(h, styles["cell"]) for h in ("編號", "位置", "類別", "廠商", "狀態", "預計完成", "描述")]]
+    for defect in data["defects"]:
+        rows.append([Paragraph(_text(value), styles["cell"]) for value in (
+            defect["defect_id"], defect["location"], defect["category_name"], defect["assigned_vendor_name"],
+            defect["status"], defect["expected_completion_day"], defect["defect_description"]
+        )])
+    col_widths: List[float] = [12 * mm, 28 * mm, 22 * mm, 26 * mm, 16 * mm, 20 * mm]
+    story.append(_table(rows, col_widths + [width - sum(col_widths)]))
+
+    if data["defects"]:
+        story.append(PageBreak())
+    # 同一張底圖只讀取一次
+    map_images = _marked_map_images(data["defects"], storage)
+    for defect in data["defects"]:
+        story += _defect_section(defect, styles, storage, map_images, width)
+
+    doc.build(story)
+    return buffer.getvalue()
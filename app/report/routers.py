@@ -0,0 +1,71 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.report import crud, renderer, schemas
+from app.report import jobs  # noqa: F401  註冊報告產生工作
+from app.responses import etag_matches
+from app.storage.backends import LocalStorage, get_storage
+
+router = APIRouter()
+
+# 產生報告通常需要數秒，建議客戶端輪詢的間隔
+REPORT_RETRY_AFTER_SECONDS = 3
+
+@router.get(
+    "/{project_id}/report.pdf",
+    response_class=Response,
+    responses={
+        200: {"content": {"application/pdf": {}}},
+        202: {"model": schemas.ReportPendingOut}
+    }
+)
+def download_project_report(
+    project_id: int,
+    request: Request,
+    vendor_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Download the printable defect report of a project, or of one vendor's defects
+
+    報告由背景工作產生並依資料版本保存；尚未產生時回傳 202 與工作編號，
+    工作完成後再次請求即可下載，資料沒有異動前重複下載不會重新產生
+    """
+    if not renderer.is_available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="PDF reports are not available")
+    version = crud.get_report_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if vendor_id is not None and crud.get_vendor(db, project_id, vendor_id) is None:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    report = crud.get_cached_report(db, project_id, vendor_id, version)
+    if report is not None:
+        storage = get_storage()
+        if storage.exists(report.file_key):
+            filename = f"project_{project_id}_report.pdf"
+            if vendor_id is not None:
+                filename = f"project_{project_id}_vendor_{vendor_id}_report.pdf"
+            # 不把整份 PDF 讀進記憶體：本機檔案直接串流，遠端儲存轉址到儲存端
+            if isinstance(storage, LocalStorage):
+                return FileResponse(
+                    storage.path(report.file_key), media_type="application/pdf", filename=filename, headers=headers
+                )
+            return RedirectResponse(storage.url(report.file_key, str(request.base_url)), headers=headers)
+        # 檔案已不在儲存端，移除紀錄後重新產生
+        db.delete(report)
+        db.commit()
+
+    job = crud.request_report_render(db, project_id, vendor_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job.job_id, "status": job.status, "version": version},
+        headers={"Location": f"/jobs/{job.job_id}", "Retry-After": str(REPORT_RETRY_AFTER_SECONDS)}
+    )
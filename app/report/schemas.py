@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+class ReportPendingOut(BaseModel):
+    """The report is being rendered, poll the job and download again when it succeeded"""
+    job_id: int
+    status: str
+    version: str = Field(description="Data version the report will be rendered for")
@@ -0,0 +1,123 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 為選用依賴
+    orjson = None
+
+# 設定後每個 trusted 回應仍以 response model 驗證一次，測試環境用來偵測 CRUD dict 與 schema 走鐘
+TRUSTED_RESPONSE_VALIDATION = os.getenv("TRUSTED_RESPONSE_VALIDATION", "").lower() in ("1", "true", "yes")
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON, the way FastAPI would"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class TrustedJSONResponse(JSONResponse):
+    """JSON response for content that already matches its schema, encoded with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+@lru_cache(maxsize=None)
+def _model_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(model.model_fields.items())
+
+@lru_cache(maxsize=None)
+def _type_adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def _conform(item: dict, fields: Tuple[Tuple[str, Any], ...]) -> dict:
+    # 只補上 schema 有但 dict 缺少的欄位預設值並依 schema 排序，值本身不再驗證
+    return {
+        name: item[name] if name in item else _default(field)
+        for name, field in fields
+    }
+
+def _default(field: Any) -> Any:
+    # 必填欄位缺值時輸出 null，交給啟用驗證的測試去發現
+    return None if field.is_required() else field.get_default(call_default_factory=True)
+
+def trusted_response(
+    content: Any,
+    model: Type[BaseModel],
+    status_code: int = 200,
+    validate: Optional[bool] = None
+) -> TrustedJSONResponse:
+    """
+    Serialize CRUD dicts (or a list of them) shaped like model without
+    running response-model validation on every request.
+    """
+    fields = _model_fields(model)
+    if isinstance(content, list):
+        shaped: Any = [_conform(item, fields) for item in content]
+        response_type: Any = List[model]
+    else:
+        shaped = _conform(content, fields)
+        response_type = model
+    if TRUSTED_RESPONSE_VALIDATION if validate is None else validate:
+        _type_adapter(response_type).validate_python(shaped)
+    return TrustedJSONResponse(shaped, status_code=status_code)
+
+def validated_content(content: Any, model: Type[BaseModel]) -> Any:
+    """What FastAPI's response-model path would send for content"""
+    response_type: Any = List[model] if isinstance(content, list) else model
+    adapter = _type_adapter(response_type)
+    return adapter.dump_python(adapter.validate_python(content), mode="json")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag, using weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 壓縮後的回應內容不同，比對時忽略弱驗證前綴 W/
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the resource"""
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single bytes range, None when the header is
+    missing or not something we serve partially (the full body is sent).
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    # 多段範圍需要 multipart/byteranges，直接回傳完整內容
+    if "," in spec or "-" not in spec:
+        return None
+    first, _, last = spec.partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(range_header)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(range_header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,356 @@
+"""
+產生大量測試資料，用於在本機重現正式環境規模的效能問題。
+
+    python -m app.seed --defects 1000000 --seed 42
+
+以 SQLAlchemy Core 的 insert() 分批寫入，不經過 ORM。
+相同的 --seed 與 --as-of 在空資料庫上會產生完全相同的資料。
+"""
+import argparse
+import logging
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Connection
+
+from app.base_map.models import BaseMap
+from app.confirmation.models import Confirmation
+from app.defect.models import Defect
+from app.defect_category.models import DefectCategory
+from app.defect_mark.models import DefectMark
+from app.improvement.models import Improvement
+from app.permission.models import Permission
+from app.photo.models import Photo
+from app.project.models import Project
+from app.trend.crud import rebuild_rollup_rows
+from app.user.models import User
+from app.vendor.models import Vendor
+
+logger = logging.getLogger(__name__)
+
+# 缺失狀態與出現比例
+DEFECT_STATUS_WEIGHTS = {
+    "等待中": 0.15,
+    "改善中": 0.15,
+    "待確認": 0.10,
+    "已完成": 0.50,
+    "退件": 0.10
+}
+ROLES = ["admin", "manager", "inspector", "viewer"]
+CATEGORY_NAMES = ["混凝土裂縫", "滲漏水", "油漆剝落", "磁磚空心", "門窗異常", "水電異常", "防水層破損", "鋼筋外露"]
+LOCATIONS = ["1F", "2F", "3F", "4F", "5F", "B1", "B2", "RF"]
+ROOMS = ["客廳", "廚房", "浴室", "主臥", "次臥", "陽台", "走道", "樓梯間"]
+
+class _Seeder:
+    def __init__(self, connection: Connection, rng: random.Random, as_of: datetime, batch_size: int):
+        self.connection = connection
+        self.rng = rng
+        self.as_of = as_of
+        self.batch_size = batch_size
+        self.counts: Dict[str, int] = {}
+        self._next_ids: Dict[str, int] = {}
+
+    def next_id(self, model) -> int:
+        # 自行配置主鍵，子資料可直接引用而不需回讀新增的 ID
+        table = model.__table__
+        if table.name not in self._next_ids:
+            pk = list(table.primary_key.columns)[0]
+            current = self.connection.execute(select(func.max(pk))).scalar()
+            self._next_ids[table.name] = (current or 0) + 1
+        value = self._next_ids[table.name]
+        self._next_ids[table.name] = value + 1
+        return value
+
+    def insert(self, model, rows: List[Dict[str, Any]]) -> None:
+        table = model.__table__
+        if "updated_at" in table.c:
+            # 不使用欄位預設的現在時間，讓同一個 seed 產生完全相同的資料
+            for row in rows:
+                row.setdefault("updated_at", row.get("created_at", self.as_of))
+        # executemany 形式的 insert：SQLAlchemy 會快取編譯結果，
+        # 比每批產生新的 insert().values(rows) 重新編譯快得多
+        statement = insert(table)
+        for start in range(0, len(rows), self.batch_size):
+            self.connection.execute(statement, rows[start:start + self.batch_size])
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self, max_days_ago: int) -> datetime:
+        return self.as_of - timedelta(seconds=self.rng.randint(0, max_days_ago * 86400))
+
+    def later(self, after: datetime) -> datetime:
+        value = after + timedelta(seconds=self.rng.randint(3600, 14 * 86400))
+        return min(value, self.as_of)
+
+def seed_database(
+    connection: Connection,
+    projects: int = 10,
+    users: int = 200,
+    base_maps_per_project: int = 5,
+    vendors_per_project: int = 20,
+    categories_per_project: int = 8,
+    defects: int = 1000000,
+    chain_ratio: float = 0.5,
+    mark_ratio: float = 0.9,
+    photos_per_defect: int = 2,
+    seed: int = 42,
+    as_of: Optional[datetime] = None,
+    batch_size: int = 500
+) -> Dict[str, int]:
+    """
+    Bulk insert a synthetic dataset and return the number of rows per table.
+
+    Defects are written in chunks of batch_size together with their marks,
+    improvements, confirmations and photos, so memory stays flat.
+    A share of rejected (退件) defects is re-issued as a new defect that
+    points back to it through previous_defect_id, forming chains.
+    The daily rollup of the seeded projects is rebuilt at the end.
+    """
+    rng = random.Random(seed)
+    seeder = _Seeder(connection, rng, as_of or datetime.utcnow().replace(microsecond=0), batch_size)
+
+    # 使用者
+    user_rows = []
+    for i in range(users):
+        user_id = seeder.next_id(User)
+        user_rows.append({
+            "user_id": user_id,
+            "line_id": f"seed-line-{user_id}",
+            "name": f"使用者 {i + 1}",
+            "email": f"seed.user{user_id}@example.com",
+            "company_name": f"營造公司 {i % 20 + 1}",
+            "avatar_path": "static/avatar/default.png",
+            "created_at": seeder.timestamp(720)
+        })
+    seeder.insert(User, user_rows)
+    user_ids = [row["user_id"] for row in user_rows]
+
+    # 專案與專案內的底圖、廠商、缺失分類、權限
+    project_rows, base_map_rows, vendor_rows, category_rows, permission_rows = [], [], [], [], []
+    project_data: Dict[int, Dict[str, List[int]]] = {}
+    for p in range(projects):
+        project_id = seeder.next_id(Project)
+        project_rows.append({
+            "project_id": project_id,
+            "project_name": f"測試建案 {p + 1}",
+            "created_at": seeder.timestamp(720),
+            "image_path": "static/project/default.png",
+            "unique_code": seeder.uuid()
+        })
+        data = {"base_maps": [], "vendors": [], "categories": [], "users": []}
+        for b in range(base_maps_per_project):
+            base_map_id = seeder.next_id(BaseMap)
+            base_map_rows.append({
+                "base_map_id": base_map_id,
+                "project_id": project_id,
+                "map_name": f"{LOCATIONS[b % len(LOCATIONS)]} 平面圖",
+                "file_path": "static/base_map/default.png"
+            })
+            data["base_maps"].append(base_map_id)
+        for v in range(vendors_per_project):
+            vendor_id = seeder.next_id(Vendor)
+            vendor_rows.append({
+                "vendor_id": vendor_id,
+                "project_id": project_id,
+                "vendor_name": f"協力廠商 {p + 1}-{v + 1}",
+                "contact_person": f"聯絡人 {v + 1}",
+                "phone": f"09{rng.randint(10000000, 99999999)}",
+                "responsibilities": rng.choice(CATEGORY_NAMES),
+                "email": f"seed.vendor{vendor_id}@example.com",
+                "line_id": None,
+                "unique_code": seeder.uuid()
+            })
+            data["vendors"].append(vendor_id)
+        for c in range(categories_per_project):
+            category_id = seeder.next_id(DefectCategory)
+            category_rows.append({
+                "defect_category_id": category_id,
+                "project_id": project_id,
+                "category_name": CATEGORY_NAMES[c % len(CATEGORY_NAMES)],
+                "description": None
+            })
+            data["categories"].append(category_id)
+        members = rng.sample(user_rows, min(len(user_rows), max(1, len(user_rows) // 3)))
+        for user in members:
+            permission_rows.append({
+                "permission_id": seeder.next_id(Permission),
+                "project_id": project_id,
+                "user_email": user["email"],
+                "user_role": rng.choice(ROLES)
+            })
+            data["users"].append(user["user_id"])
+        project_data[project_id] = data
+    seeder.insert(Project, project_rows)
+    seeder.insert(BaseMap, base_map_rows)
+    seeder.insert(Vendor, vendor_rows)
+    seeder.insert(DefectCategory, category_rows)
+    seeder.insert(Permission, permission_rows)
+
+    if not project_rows:
+        return seeder.counts
+
+    statuses = list(DEFECT_STATUS_WEIGHTS)
+    weights = list(DEFECT_STATUS_WEIGHTS.values())
+    project_ids = [row["project_id"] for row in project_rows]
+    # 各專案尚未被重新開單的退件缺失，用來串接 previous_defect_id
+    rejected: Dict[int, List[int]] = {project_id: [] for project_id in project_ids}
+
+    started = time.monotonic()
+    for chunk_start in range(0, defects, batch_size):
+        defect_rows, mark_rows, improvement_rows, confirmation_rows, photo_rows = [], [], [], [], []
+        for _ in range(min(batch_size, defects - chunk_start)):
+            project_id = rng.choice(project_ids)
+            data = project_data[project_id]
+            submitters = data["users"] or user_ids
+            defect_id = seeder.next_id(Defect)
+            status = rng.choices(statuses, weights)[0]
+            created_at = seeder.timestamp(365)
+
+            previous_defect_id = None
+            if rejected[project_id] and rng.random() < chain_ratio:
+                previous_defect_id = rejected[project_id].pop(rng.randrange(len(rejected[project_id])))
+            if status == "退件":
+                rejected[project_id].append(defect_id)
+
+            vendor_id = rng.choice(data["vendors"]) if data["vendors"] else None
+            confirmer_id = rng.choice(submitters) if status == "已完成" else None
+            defect_rows.append({
+                "defect_id": defect_id,
+                "unique_code": seeder.uuid(),
+                "project_id": project_id,
+                "submitted_id": rng.choice(submitters),
+                "location": f"{rng.choice(LOCATIONS)} {rng.choice(ROOMS)}",
+                "defect_category_id": rng.choice(data["categories"]) if data["categories"] else None,
+                "defect_description": f"{rng.choice(CATEGORY_NAMES)}，請儘速改善",
+                "assigned_vendor_id": vendor_id,
+                "repair_description": None,
+                "expected_completion_day": (created_at + timedelta(days=rng.randint(3, 45))).date(),
+                "responsible_vendor_id": vendor_id if rng.random() < 0.7 else None,
+                "previous_defect_id": previous_defect_id,
+                "created_at": created_at,
+                "status": status,
+                "confirmer_id": confirmer_id
+            })
+
+            if data["base_maps"] and rng.random() < mark_ratio:
+                mark_rows.append({
+                    "defect_mark_id": seeder.next_id(DefectMark),
+                    "defect_id": defect_id,
+                    "base_map_id": rng.choice(data["base_maps"]),
+                    "coordinate_x": round(rng.uniform(0, 4000), 1),
+                    "coordinate_y": round(rng.uniform(0, 3000), 1),
+                    "scale": 1.0,
+                    "project_id": project_id
+                })
+
+            for n in range(photos_per_defect):
+                photo_rows.append({
+                    "photo_id": seeder.next_id(Photo),
+                    "related_type": "defect",
+                    "related_id": defect_id,
+                    "description": None,
+                    "image_url": f"/static/photos/defect/seed_{defect_id}_{n + 1}.jpg",
+                    "created_at": created_at,
+                    "project_id": project_id
+                })
+
+            # 待確認以後的缺失都有改善紀錄，已完成與退件另有確認紀錄
+            if status in ("待確認", "已完成", "退件") or (status == "改善中" and rng.random() < 0.3):
+                improvement_id = seeder.next_id(Improvement)
+                improved_at = seeder.later(created_at)
+                improvement_rows.append({
+                    "improvement_id": improvement_id,
+                    "defect_id": defect_id,
+                    "submitter_id": rng.choice(submitters),
+                    "content": "已完成修繕，請確認",
+                    "improvement_date": improved_at.date().isoformat(),
+                    "created_at": improved_at,
+                    "project_id": project_id
+                })
+                photo_rows.append({
+                    "photo_id": seeder.next_id(Photo),
+                    "related_type": "improvement",
+                    "related_id": improvement_id,
+                    "description": None,
+                    "image_url": f"/static/photos/improvement/seed_{improvement_id}.jpg",
+                    "created_at": improved_at,
+                    "project_id": project_id
+                })
+                if status in ("已完成", "退件"):
+                    confirmed_at = seeder.later(improved_at)
+                    confirmation_rows.append({
+                        "confirmation_id": seeder.next_id(Confirmation),
+                        "improvement_id": improvement_id,
+                        "confirmer_id": confirmer_id or rng.choice(submitters),
+                        "comment": "符合要求" if status == "已完成" else "尚未改善完全",
+                        "confirmation_date": confirmed_at.date().isoformat(),
+                        "status": "接受" if status == "已完成" else "退回",
+                        "created_at": confirmed_at,
+                        "project_id": project_id
+                    })
+
+        seeder.insert(Defect, defect_rows)
+        seeder.insert(DefectMark, mark_rows)
+        seeder.insert(Improvement, improvement_rows)
+        seeder.insert(Confirmation, confirmation_rows)
+        seeder.insert(Photo, photo_rows)
+
+        done = chunk_start + len(defect_rows)
+        if done % (batch_size * 100) == 0 or done == defects:
+            logger.info("Seeded %d/%d defects (%.0fs)", done, defects, time.monotonic() - started)
+
+    # Core 寫入不會觸發彙總的 flush 事件，依產生的專案重新計算趨勢彙總
+    rollup_rows = sum(rebuild_rollup_rows(connection, project_id) for project_id in project_data)
+    seeder.counts["defect_daily_rollup"] = rollup_rows
+    return seeder.counts
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk insert a synthetic dataset for load testing")
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--base-maps-per-project", type=int, default=5)
+    parser.add_argument("--vendors-per-project", type=int, default=20)
+    parser.add_argument("--categories-per-project", type=int, default=8)
+    parser.add_argument("--defects", type=int, default=1000000)
+    parser.add_argument("--chain-ratio", type=float, default=0.5,
+                        help="probability that a new defect re-issues an earlier rejected one")
+    parser.add_argument("--mark-ratio", type=float, default=0.9)
+    parser.add_argument("--photos-per-defect", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", type=lambda value: datetime.combine(date.fromisoformat(value), datetime.min.time()),
+                        default=None, help="anchor date (YYYY-MM-DD) for generated timestamps, defaults to now")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    import app.main  # noqa: F401  建立資料表
+    from app.database import engine
+
+    with engine.begin() as connection:
+        counts = seed_database(
+            connection,
+            projects=args.projects,
+            users=args.users,
+            base_maps_per_project=args.base_maps_per_project,
+            vendors_per_project=args.vendors_per_project,
+            categories_per_project=args.categories_per_project,
+            defects=args.defects,
+            chain_ratio=args.chain_ratio,
+            mark_ratio=args.mark_ratio,
+            photos_per_defect=args.photos_per_defect,
+            seed=args.seed,
+            as_of=args.as_of,
+            batch_size=args.batch_size
+        )
+    for table_name, count in counts.items():
+        logger.info("%s: %d rows", table_name, count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.base_map.models import BaseMap
+from app.cache import TTLCache
+from app.defect import crud as defect_crud
+from app.defect.models import Defect
+from app.defect_category.models import DefectCategory
+from app.permission import crud as permission_crud
+from app.permission.models import Permission
+from app.project.models import Project
+from app.responses import dumps
+from app.snapshot.schemas import ProjectSnapshotOut
+from app.sync.models import Tombstone
+from app.user.models import User
+from app.vendor.models import Vendor
+
+# 快照內含的專案資料表；刪除由 sync 的刪除紀錄涵蓋
+SNAPSHOT_MODELS = (BaseMap, Vendor, DefectCategory, Permission, Defect)
+
+# project_id -> (版本, 序列化後的快照)；每個專案只保留最新版本，版本改變時整筆取代，不需要 ttl
+_snapshot_cache = TTLCache(maxsize=int(os.getenv("SNAPSHOT_CACHE_SIZE", "32")))
+
+def get_snapshot_version(db: Session, project_id: int) -> Optional[str]:
+    """
+    Version of a project's snapshot in a single query, None when the project
+    does not exist. It changes whenever any row in the snapshot changes.
+    """
+    columns = [Project.updated_at]
+    for model in SNAPSHOT_MODELS:
+        # 走 (project_id, updated_at) 索引
+        columns.append(
+            select(func.max(model.updated_at))
+            .where(model.project_id == project_id)
+            .scalar_subquery()
+        )
+    columns.append(
+        select(func.max(Tombstone.deleted_at))
+        .where(Tombstone.project_id == project_id)
+        .scalar_subquery()
+    )
+    # 權限與缺失列表帶有使用者名稱與頭像
+    columns.append(select(func.max(User.updated_at)).scalar_subquery())
+
+    row = db.execute(select(*columns).where(Project.project_id == project_id)).first()
+    if row is None:
+        return None
+    key = "|".join(str(value) for value in (project_id, *row))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+def get_project_snapshot(db: Session, project_id: int, version: str) -> Optional[Dict[str, Any]]:
+    """Everything the app loads when opening a project, as one dict"""
+    project = db.query(Project).filter(Project.project_id == project_id).first()
+    if project is None:
+        return None
+    defects = defect_crud.get_defects_with_details(db, limit=None, project_id=project_id)
+    snapshot = ProjectSnapshotOut.model_validate({
+        "version": version,
+        "project": project,
+        "base_maps": db.query(BaseMap).filter(BaseMap.project_id == project_id).all(),
+        "vendors": db.query(Vendor).filter(Vendor.project_id == project_id).all(),
+        "defect_categories": (
+            db.query(DefectCategory).filter(DefectCategory.project_id == project_id).all()
+        ),
+        "permissions": permission_crud.get_permissions_with_details(db, project_id=project_id),
+        "defects": defects,
+        # 統計由已載入的缺失計算，不再逐一計數查詢
+        "defect_stats": defect_crud.summarize_defect_stats(defects)
+    })
+    return snapshot.model_dump()
+
+def get_snapshot_body(db: Session, project_id: int, version: str) -> Optional[bytes]:
+    """Serialized snapshot of a version, built once per worker and version"""
+    cached = _snapshot_cache.get(project_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    # 版本在讀取資料之前取得，快照只會比版本新；下次請求版本不同時重新產生即可
+    snapshot = get_project_snapshot(db, project_id, version)
+    if snapshot is None:
+        _snapshot_cache.pop(project_id)
+        return None
+    body = dumps(snapshot)
+    _snapshot_cache.set(project_id, (version, body))
+    return body
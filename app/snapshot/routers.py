@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.responses import etag_matches
+from app.snapshot import crud, schemas
+
+router = APIRouter()
+
+@router.get("/{project_id}/snapshot", response_model=schemas.ProjectSnapshotOut)
+def read_project_snapshot(project_id: int, request: Request, db: Session = Depends(get_db)):
+    """Get the project, its base maps, vendors, categories, permissions, defects and stats at once
+
+    回應帶有 ETag，帶 If-None-Match 重新請求時，資料沒有異動會回傳 304
+    """
+    version = crud.get_snapshot_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # 回應可能被壓縮，使用弱驗證 ETag
+    headers = {"ETag": f'W/"{version}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = crud.get_snapshot_body(db, project_id, version)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return Response(content=body, media_type="application/json", headers=headers)
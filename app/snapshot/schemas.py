@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Dict, List, Any
+
+from app.project.schemas import ProjectOut
+from app.base_map.schemas import BaseMapOut
+from app.vendor.schemas import VendorOut
+from app.defect_category.schemas import DefectCategoryOut
+from app.permission.schemas import PermissionWithDetailsOut
+from app.defect.schemas import DefectDetailOut
+
+class ProjectSnapshotOut(BaseModel):
+    version: str  # 與 ETag 相同，專案資料有異動時才會改變
+    project: ProjectOut
+    base_maps: List[BaseMapOut]
+    vendors: List[VendorOut]
+    defect_categories: List[DefectCategoryOut]
+    permissions: List[PermissionWithDetailsOut]
+    defects: List[DefectDetailOut]
+    defect_stats: Dict[str, Any]  # 同 /defects/stats?project_id=
@@ -0,0 +1,235 @@
+import abc
+import io
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Dict, List, Optional
+
+# 專案根目錄，本機儲存的 key（static/...）相對於此
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".."))
+
+# 欄位預設值指向的共用圖片，隨程式部署在本機 static/
+DEFAULT_IMAGE_KEYS = (
+    "static/avatar/default.png",
+    "static/base_map/default.png",
+    "static/project/default.png"
+)
+
+class StorageError(Exception):
+    """The storage backend cannot perform the operation"""
+
+def storage_key(path: str) -> str:
+    """Storage key of a path stored in the database, e.g. /static/photos/x.jpg -> static/photos/x.jpg"""
+    return path.lstrip("/")
+
+def guess_content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+class StorageBackend(abc.ABC):
+    """
+    Where uploaded files live. Keys are the relative paths kept in the
+    database (static/...), so switching backends needs no data migration.
+    """
+
+    # 是否能發給客戶端直接上傳的 URL
+    supports_presigned_upload = False
+
+    @abc.abstractmethod
+    def save(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Readable, seekable file object with the content of key"""
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key; missing keys are ignored"""
+        ...
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def url(self, key: str, base_url: str) -> str:
+        """URL clients use to GET key; base_url is the API's own URL"""
+        ...
+
+    def presigned_upload(self, key: str, content_type: str) -> Dict[str, Any]:
+        """URL, method and headers for the client to upload key directly"""
+        raise StorageError(f"{type(self).__name__} does not support direct uploads")
+
+class LocalStorage(StorageBackend):
+    """Files under the project directory, served by the API's /static mount"""
+
+    def __init__(self, root: str = project_root):
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        """Absolute path of key, refusing keys that escape the root"""
+        path = os.path.abspath(os.path.join(self.root, storage_key(key)))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先寫到暫存檔再換名，讀取端不會看到寫到一半的檔案
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                shutil.copyfileobj(source, buffer)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def url(self, key: str, base_url: str) -> str:
+        return f"{base_url.rstrip('/')}/{storage_key(key)}"
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible object storage (AWS S3, MinIO, ...). Clients read and
+    upload through presigned URLs, so image bytes bypass the API.
+    """
+
+    supports_presigned_upload = True
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        public_base_url: Optional[str] = None,
+        expires: int = 3600,
+        client: Any = None
+    ):
+        if client is None:
+            # 只有使用 S3 時才需要 boto3，在此才匯入
+            try:
+                import boto3
+            except ImportError:
+                raise StorageError("boto3 is required for STORAGE_BACKEND=s3")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        # 設定時（公開 bucket 或 CDN）回傳固定網址，客戶端才能快取圖片
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.expires = expires
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{storage_key(key)}"
+
+    def save(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        self.client.upload_fileobj(
+            source, self.bucket, self.object_key(key),
+            ExtraArgs={"ContentType": content_type or guess_content_type(key)}
+        )
+
+    def open(self, key: str) -> BinaryIO:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        return io.BytesIO(response["Body"].read())
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def url(self, key: str, base_url: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self.object_key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.object_key(key)},
+            ExpiresIn=self.expires
+        )
+
+    def presigned_upload(self, key: str, content_type: str) -> Dict[str, Any]:
+        upload_url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": self.object_key(key), "ContentType": content_type},
+            ExpiresIn=self.expires
+        )
+        return {
+            "upload_url": upload_url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "expires_in": self.expires
+        }
+
+def upload_default_images(storage: StorageBackend, root: str = project_root) -> List[str]:
+    """
+    Copy the bundled default images to a remote backend when they are missing
+    there, so rows pointing at them resolve. Returns the uploaded keys.
+    """
+    if isinstance(storage, LocalStorage):
+        return []
+    uploaded = []
+    for key in DEFAULT_IMAGE_KEYS:
+        path = os.path.join(root, key)
+        if not os.path.isfile(path):
+            logging.getLogger(__name__).warning("Default image %s is missing locally", key)
+            continue
+        if storage.exists(key):
+            continue
+        with open(path, "rb") as f:
+            storage.save(key, f, guess_content_type(key))
+        uploaded.append(key)
+    return uploaded
+
+def build_storage() -> StorageBackend:
+    """Build the backend selected by STORAGE_BACKEND (local or s3)"""
+    name = os.getenv("STORAGE_BACKEND", "local")
+    if name == "s3":
+        return S3Storage(
+            bucket=os.environ["S3_BUCKET"],
+            prefix=os.getenv("S3_PREFIX", ""),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            region=os.getenv("S3_REGION"),
+            public_base_url=os.getenv("S3_PUBLIC_BASE_URL"),
+            expires=int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+        )
+    return LocalStorage()
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Backend shared by the API and the job worker"""
+    global _storage
+    if _storage is None:
+        _storage = build_storage()
+    return _storage
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """Replace the shared backend, None rebuilds it from the environment"""
+    global _storage
+    _storage = storage
@@ -0,0 +1,91 @@
+import zlib
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.storage.backends import StorageBackend
+from app.storage.models import StoredFile
+from app.utils import dialect_insert
+
+CHECKSUM_CHUNK_SIZE = 256 * 1024
+
+class FileChecksum(NamedTuple):
+    size: int
+    crc32: int
+
+class ChecksumReader:
+    """Read-only wrapper that computes the size and CRC32 of everything read through it"""
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.size = 0
+        self.crc32 = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.size += len(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+        return data
+
+    @property
+    def checksum(self) -> FileChecksum:
+        return FileChecksum(self.size, self.crc32)
+
+def save_file(storage: StorageBackend, key: str, source: BinaryIO, content_type: Optional[str] = None) -> FileChecksum:
+    """Store a file and return its size and CRC32, computed while it is written"""
+    reader = ChecksumReader(source)
+    storage.save(key, reader, content_type)  # type: ignore[arg-type]
+    return reader.checksum
+
+def read_checksum(source: BinaryIO) -> FileChecksum:
+    """Size and CRC32 of the rest of a file object"""
+    reader = ChecksumReader(source)
+    while reader.read(CHECKSUM_CHUNK_SIZE):
+        pass
+    return reader.checksum
+
+def record_checksums(
+    db: Session,
+    checksums: Dict[str, FileChecksum],
+    project_id: Optional[int] = None,
+    written: bool = True
+    ) -> None:
+    """
+    Remember the checksums of stored files, without committing. written=False
+    marks checksums computed from files that already existed and keeps the
+    time a file was last written.
+    """
+    if not checksums:
+        return
+    written_at = datetime.utcnow() if written else None
+    rows = [
+        {"key": key, "size": checksum.size, "crc32": checksum.crc32, "project_id": project_id, "written_at": written_at}
+        for key, checksum in sorted(checksums.items())
+    ]
+    statement = dialect_insert(db, StoredFile).values(rows)
+    # 同一個 key 重新寫入時（底圖、專案圖片）覆蓋舊的紀錄
+    statement = statement.on_conflict_do_update(
+        index_elements=[StoredFile.key],
+        set_={
+            "size": statement.excluded.size,
+            "crc32": statement.excluded.crc32,
+            "project_id": func.coalesce(statement.excluded.project_id, StoredFile.project_id),
+            "written_at": func.coalesce(statement.excluded.written_at, StoredFile.written_at)
+        }
+    )
+    db.execute(statement)
+
+def get_checksums(db: Session, keys: Iterable[str]) -> Dict[str, FileChecksum]:
+    """Recorded checksums of the given keys; keys without a record are left out"""
+    keys = list(keys)
+    checksums: Dict[str, FileChecksum] = {}
+    # 分批查詢，避免 IN 的參數過多
+    for start in range(0, len(keys), 500):
+        rows = db.execute(
+            select(StoredFile.key, StoredFile.size, StoredFile.crc32).where(StoredFile.key.in_(keys[start:start + 500]))
+        )
+        for key, size, crc32 in rows:
+            checksums[key] = FileChecksum(size, crc32)
+    return checksums
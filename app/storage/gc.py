@@ -0,0 +1,254 @@
+"""
+清除 static/ 下已無資料引用的檔案（照片、縮圖、頭像、底圖、專案圖片）。
+
+    python -m app.storage.gc                 # 只列出，不動檔案
+    python -m app.storage.gc --quarantine    # 移到 STORAGE_QUARANTINE_DIR，可再搬回
+    python -m app.storage.gc --delete
+
+檔案樹與資料庫引用都依路徑排序後逐筆合併比對，不需要把任何一邊整個載入記憶體。
+"""
+import argparse
+import heapq
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.orm import Session
+
+from app.base_map.models import BaseMap
+from app.photo.jobs import get_thumbnail_url
+from app.photo.models import Photo
+from app.photo.services import RELATED_MODELS
+from app.project.models import Project
+from app.storage.backends import DEFAULT_IMAGE_KEYS
+from app.user.models import User
+
+GC_MODES = ("dry-run", "quarantine", "delete")
+# 比這更新的檔案不處理：上傳時檔案先寫入，資料列稍後才 commit
+STORAGE_GC_MIN_AGE_HOURS = float(os.getenv("STORAGE_GC_MIN_AGE_HOURS", "24"))
+# 報告中列出的孤兒檔案數上限，總數與大小不受限
+STORAGE_GC_REPORT_LIMIT = 100
+
+# 專案根目錄，資料庫內的路徑形如 static/... 或 /static/...
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".."))
+# 隔離區放在 static/ 之外，不會再被公開存取
+quarantine_root = os.getenv("STORAGE_QUARANTINE_DIR", os.path.join(project_root, "quarantine"))
+
+# 會檢查的目錄，其他 static/ 內容不處理
+MANAGED_DIRS = ("static/avatar", "static/base_map", "static/photos", "static/project")
+# 欄位預設值指向的共用圖片，沒有資料列引用也要保留
+PROTECTED_FILES = frozenset(DEFAULT_IMAGE_KEYS)
+
+class UnsortedReferencesError(RuntimeError):
+    """The database did not return references in byte order, merging them would be wrong"""
+
+def _normalize(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    path = path.lstrip("/")
+    return path if path.startswith("static/") else None
+
+def _byte_order(column: Any, dialect_name: str) -> Any:
+    # 合併比對需要與 Python 字串相同的排序，不能用依語系的定序
+    if dialect_name == "postgresql":
+        return column.collate("C")
+    if dialect_name == "mysql":
+        return column.collate("utf8mb4_bin")
+    return column
+
+def _column_references(
+    db: Session,
+    column: Any,
+    transform: Optional[Callable[[str], str]] = None,
+    where: Any = None
+    ) -> Iterator[str]:
+    ordered = _byte_order(column, db.get_bind().dialect.name)
+    statement = select(column).where(column.isnot(None))
+    if where is not None:
+        statement = statement.where(where)
+    rows = db.execute(statement.order_by(ordered).execution_options(yield_per=1000)).scalars()
+    previous = None
+    for value in rows:
+        path = _normalize(transform(value) if transform else value)
+        if path is None:
+            continue
+        if previous is not None and path < previous:
+            raise UnsortedReferencesError(f"{column} is not sorted: {previous!r} before {path!r}")
+        previous = path
+        yield path
+
+def _thumbnail_path(image_url: str) -> str:
+    return get_thumbnail_url(image_url) if "/" in image_url else image_url
+
+def _photo_has_parent() -> Any:
+    # 刪除缺失或專案時照片資料列不會一併刪除，所屬資料已不存在的照片不算引用
+    return or_(*(
+        and_(Photo.related_type == related_type, exists().where(getattr(model, id_field) == Photo.related_id))
+        for related_type, (model, id_field) in RELATED_MODELS.items()
+    ))
+
+def iter_references(db: Session) -> Iterator[str]:
+    """Every static path referenced by the database, sorted, possibly with duplicates"""
+    return heapq.merge(
+        _column_references(db, Photo.image_url, where=_photo_has_parent()),
+        # 縮圖沒有自己的欄位，跟著原圖保留
+        _column_references(db, Photo.image_url, _thumbnail_path, where=_photo_has_parent()),
+        _column_references(db, User.avatar_path),
+        _column_references(db, BaseMap.file_path),
+        _column_references(db, Project.image_path)
+    )
+
+def _walk_sorted(root: str, relative: str) -> Iterator[Tuple[str, os.stat_result]]:
+    try:
+        entries = list(os.scandir(os.path.join(root, relative)))
+    except FileNotFoundError:
+        return
+    # 目錄以 "名稱/" 排序，輸出的完整路徑才會是字串順序
+    entries.sort(key=lambda entry: entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name)
+    for entry in entries:
+        path = f"{relative}/{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_sorted(root, path)
+        elif entry.is_file(follow_symlinks=False):
+            yield path, entry.stat(follow_symlinks=False)
+
+def iter_stored_files(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """Files under the managed static directories, sorted by relative path"""
+    for directory in sorted(MANAGED_DIRS, key=lambda d: d + "/"):
+        yield from _walk_sorted(root, directory)
+
+def iter_orphans(
+    files: Iterable[Tuple[str, os.stat_result]],
+    references: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[os.stat_result]]]:
+    """
+    Merge-join sorted files with sorted references. Yields (path, stat) for
+    files nobody references and (path, None) for references without a file.
+    """
+    references = iter(references)
+    reference = next(references, None)
+    for path, stat in files:
+        while reference is not None and reference < path:
+            if reference.startswith(MANAGED_DIRS):
+                yield reference, None
+            reference = _next_distinct(references, reference)
+        if reference == path:
+            reference = _next_distinct(references, reference)
+            continue
+        yield path, stat
+    while reference is not None:
+        if reference.startswith(MANAGED_DIRS):
+            yield reference, None
+        reference = _next_distinct(references, reference)
+
+def _next_distinct(references: Iterator[str], current: str) -> Optional[str]:
+    for reference in references:
+        if reference != current:
+            return reference
+    return None
+
+def _quarantine(root: str, path: str, target_root: str) -> None:
+    target = os.path.join(target_root, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(os.path.join(root, path), target)
+
+def collect_garbage(
+    db: Session,
+    mode: str = "dry-run",
+    root: Optional[str] = None,
+    min_age_hours: float = STORAGE_GC_MIN_AGE_HOURS,
+    on_orphan: Optional[Callable[[str, int], None]] = None
+    ) -> Dict[str, Any]:
+    """Find unreferenced static files and report, quarantine or delete them"""
+    if mode not in GC_MODES:
+        raise ValueError(f"Unknown mode: {mode}. Must be one of: {', '.join(GC_MODES)}")
+    root = root or project_root
+    cutoff = time.time() - min_age_hours * 3600
+    target_root = os.path.join(quarantine_root, datetime.utcnow().strftime("%Y%m%d%H%M%S"))
+
+    report: Dict[str, Any] = {
+        "mode": mode,
+        "scanned": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "skipped_recent": 0,
+        "missing_files": 0,
+        "sample_orphans": [],
+        "sample_missing_files": []
+    }
+
+    if mode != "dry-run":
+        # 合併時才發現排序錯誤，之前的檔案可能已被誤刪；先完整掃過一次引用確認排序
+        for _ in iter_references(db):
+            pass
+
+    def counted(files: Iterator[Tuple[str, os.stat_result]]) -> Iterator[Tuple[str, os.stat_result]]:
+        for item in files:
+            report["scanned"] += 1
+            yield item
+
+    for path, stat in iter_orphans(counted(iter_stored_files(root)), iter_references(db)):
+        if stat is None:
+            # 縮圖由背景工作產生，尚未產生或失敗的不算遺失
+            if "/thumbs/" in path:
+                continue
+            report["missing_files"] += 1
+            if len(report["sample_missing_files"]) < STORAGE_GC_REPORT_LIMIT:
+                report["sample_missing_files"].append(path)
+            continue
+        if path in PROTECTED_FILES:
+            continue
+        if stat.st_mtime > cutoff:
+            report["skipped_recent"] += 1
+            continue
+        report["orphans"] += 1
+        report["orphan_bytes"] += stat.st_size
+        if len(report["sample_orphans"]) < STORAGE_GC_REPORT_LIMIT:
+            report["sample_orphans"].append(path)
+        if on_orphan is not None:
+            on_orphan(path, stat.st_size)
+        try:
+            if mode == "quarantine":
+                _quarantine(root, path, target_root)
+            elif mode == "delete":
+                os.remove(os.path.join(root, path))
+        except FileNotFoundError:
+            pass
+    if mode == "quarantine" and report["orphans"]:
+        report["quarantine_dir"] = target_root
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Remove static files no longer referenced by the database")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--quarantine", action="store_true", help="move orphans to STORAGE_QUARANTINE_DIR")
+    action.add_argument("--delete", action="store_true", help="delete orphans")
+    parser.add_argument("--min-age-hours", type=float, default=STORAGE_GC_MIN_AGE_HOURS,
+                        help="ignore files modified more recently than this")
+    args = parser.parse_args()
+    mode = "quarantine" if args.quarantine else "delete" if args.delete else "dry-run"
+
+    from app.database import SessionLocal
+    import app.main  # noqa: F401  載入所有資料表
+
+    db = SessionLocal()
+    try:
+        report = collect_garbage(
+            db, mode=mode, min_age_hours=args.min_age_hours,
+            on_orphan=lambda path, size: print(f"{size:>12}  {path}")
+        )
+    finally:
+        db.close()
+    print(
+        f"{mode}: {report['orphans']} orphaned files ({report['orphan_bytes']} bytes) "
+        f"of {report['scanned']} scanned, {report['skipped_recent']} too recent, "
+        f"{report['missing_files']} references without a file"
+    )
+    if report.get("quarantine_dir"):
+        print(f"quarantined to {report['quarantine_dir']}")
+
+if __name__ == "__main__":
+    main()
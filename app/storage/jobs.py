@@ -0,0 +1,21 @@
+import os
+from datetime import timedelta
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from app.job.handlers import register_periodic_handler
+from app.storage import gc
+from app.storage.backends import LocalStorage, get_storage
+
+STORAGE_GC_JOB_TYPE = "storage.gc"
+# 預設只產生報告（存於 Job.result），確認無誤後再設為 quarantine 或 delete
+STORAGE_GC_MODE = os.getenv("STORAGE_GC_MODE", "dry-run")
+
+@register_periodic_handler(STORAGE_GC_JOB_TYPE, timedelta(days=1))
+def collect_storage_garbage(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Find static files no longer referenced by the database"""
+    if not isinstance(get_storage(), LocalStorage):
+        # 物件儲存以 bucket 的生命週期規則清理，這裡只掃描本機檔案
+        return {"skipped": "storage backend is not local"}
+    return gc.collect_garbage(db, mode=payload.get("mode", STORAGE_GC_MODE))
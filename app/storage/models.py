@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from app.database import Base
+
+class StoredFile(Base):
+    """Size and CRC32 of a stored file, so ZIP bundles never read files just to checksum them"""
+    __tablename__ = "stored_files"
+    __table_args__ = (
+        # 離線包的版本依專案取得最後寫入檔案的時間
+        Index("ix_stored_files_project_id_written_at", "project_id", "written_at"),
+    )
+
+    key = Column(String, primary_key=True)  # 儲存 key，形如 static/photos/...
+    size = Column(BigInteger, nullable=False)
+    crc32 = Column(BigInteger, nullable=False)
+    project_id = Column(Integer)
+    # 程式寫入檔案的時間；由既有檔案補算的紀錄為 NULL，檔案內容並未改變
+    written_at = Column(DateTime)
@@ -0,0 +1,24 @@
+"""
+補上 updated_at 與 project_id 欄位新增前寫入的資料列。升級後執行一次，補上前這些資料列
+不會出現在 /changes 與離線包中：
+
+    python -m app.sync.backfill
+
+只更新仍為 NULL 的欄位，重複執行沒有影響。
+"""
+import argparse
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill updated_at and project_id of rows written before the sync columns")
+    parser.parse_args()
+
+    from app.database import engine
+    import app.main  # noqa: F401  載入所有資料表
+    from app.sync.crud import backfill_sync_columns
+
+    with engine.begin() as connection:
+        backfill_sync_columns(connection)
+    print("sync columns filled")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.base_map.models import BaseMap
+from app.confirmation.models import Confirmation
+from app.defect.models import Defect
+from app.defect_category.models import DefectCategory
+from app.defect_mark.models import DefectMark
+from app.improvement.models import Improvement
+from app.permission.models import Permission
+from app.photo.models import Photo
+from app.project.models import Project
+from app.sync.models import Tombstone
+from app.vendor.models import Vendor
+
+# 交易從取得時間戳到 commit 之間可能有延遲，多個 worker 的時鐘也可能有誤差；
+# 查詢時往前多取這段時間，重複的資料由客戶端以主鍵覆蓋
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+# 刪除紀錄保留天數，比這更舊的 token 必須重新完整同步
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+# 每頁回傳的資料列數（含刪除紀錄）上限
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+SYNC_MAX_PAGE_SIZE = 5000
+
+# 依相依順序排列，客戶端照順序套用即可滿足外鍵
+SYNCED_MODELS = (
+    Project,
+    BaseMap,
+    Vendor,
+    DefectCategory,
+    Permission,
+    Defect,
+    DefectMark,
+    Improvement,
+    Confirmation,
+    Photo,
+)
+_SYNCED_TABLES = {model: model.__table__.name for model in SYNCED_MODELS}
+
+PHOTO_RELATED_MODELS = {"defect": Defect, "improvement": Improvement, "confirmation": Confirmation}
+
+# 沒有 project_id 外鍵的子資料表：(上層 model, relationship 名稱, 外鍵欄位)
+_PARENTS = {
+    DefectMark: (Defect, "defect", "defect_id"),
+    Improvement: (Defect, "defect", "defect_id"),
+    Confirmation: (Improvement, "improvement", "improvement_id"),
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+class SyncTokenError(ValueError):
+    """The sync token is malformed"""
+
+class SyncTokenExpired(Exception):
+    """The sync token is older than the kept tombstones"""
+
+class ChangesCursor(NamedTuple):
+    """Position of a paginated /changes request"""
+    since: Optional[datetime]
+    token_at: datetime  # 第一頁開始查詢的時間，所有頁面回傳相同的 next_token
+    stage: int  # SYNCED_MODELS 的索引，最後一段為刪除紀錄
+    last_id: int  # 該段已回傳的最大主鍵
+
+def encode_sync_token(value: datetime) -> str:
+    """Opaque token for a UTC timestamp, in microseconds since the epoch"""
+    return str((value - _EPOCH) // timedelta(microseconds=1))
+
+def decode_sync_token(token: str) -> datetime:
+    """Timestamp of a token produced by encode_sync_token"""
+    try:
+        return _EPOCH + timedelta(microseconds=int(token))
+    except (ValueError, OverflowError):
+        raise SyncTokenError(f"Invalid sync token: {token}")
+
+def encode_changes_cursor(cursor: ChangesCursor) -> str:
+    """Opaque continuation token of a /changes page"""
+    since = encode_sync_token(cursor.since) if cursor.since is not None else ""
+    return f"{since}.{encode_sync_token(cursor.token_at)}.{cursor.stage}.{cursor.last_id}"
+
+def decode_changes_cursor(value: str) -> ChangesCursor:
+    """Cursor of a token produced by encode_changes_cursor"""
+    parts = value.split(".")
+    if len(parts) != 4 or not parts[2].isdigit() or not parts[3].isdigit():
+        raise SyncTokenError(f"Invalid cursor: {value}")
+    since = decode_sync_token(parts[0]) if parts[0] else None
+    return ChangesCursor(since, decode_sync_token(parts[1]), int(parts[2]), int(parts[3]))
+
+def _get_parent(session: Session, obj: Any) -> Any:
+    if isinstance(obj, Photo):
+        parent_model = PHOTO_RELATED_MODELS.get(obj.related_type)
+        parent_id = obj.related_id
+        relationship_name = None
+    elif type(obj) in _PARENTS:
+        parent_model, relationship_name, foreign_key = _PARENTS[type(obj)]
+        parent_id = getattr(obj, foreign_key)
+    else:
+        return None
+    # 上層資料可能跟子資料在同一次 flush 新增、還沒有 ID，先看已指定的 relationship（不觸發 lazy load）
+    if relationship_name is not None:
+        parent = obj.__dict__.get(relationship_name)
+        if parent is not None:
+            return parent
+    if parent_model is None or parent_id is None:
+        return None
+    return session.get(parent_model, parent_id)
+
+def resolve_project_id(session: Session, obj: Any) -> Optional[int]:
+    """Project an instance belongs to, following its parents when it has no project_id"""
+    project_id = getattr(obj, "project_id", None)
+    if project_id is not None:
+        return project_id
+    parent = _get_parent(session, obj)
+    return resolve_project_id(session, parent) if parent is not None else None
+
+def _parent_changed(obj: Any) -> bool:
+    state = inspect(obj)
+    if isinstance(obj, Photo):
+        names: Tuple[str, ...] = ("related_type", "related_id")
+    else:
+        names = (_PARENTS[type(obj)][2],)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+# commit 後屬性已過期，需在設定新值前載入舊的 project_id，flush 時才知道資料從哪個專案移出
+for _model in SYNCED_MODELS:
+    if _model is not Project:
+        event.listen(_model.project_id, "set", _keep_old_value, active_history=True, retval=True)
+
+@event.listens_for(Session, "before_flush")
+def _track_sync_changes(session, flush_context, instances):
+    """
+    Fill the denormalized project_id of child rows and record tombstones for
+    deletes and for rows moved to another project
+    """
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, (Photo, *_PARENTS)):
+            continue
+        if obj in session.new:
+            if obj.project_id is None:
+                obj.project_id = resolve_project_id(session, obj)
+        elif _parent_changed(obj):
+            # 換了上層資料才重新計算；上層被刪除（外鍵設為 NULL）時保留原專案
+            parent = _get_parent(session, obj)
+            project_id = resolve_project_id(session, parent) if parent is not None else None
+            if project_id is not None:
+                obj.project_id = project_id
+
+    deleted_at = datetime.utcnow()
+    for obj in session.dirty:
+        entity = _SYNCED_TABLES.get(type(obj))
+        if entity is None or isinstance(obj, Project):
+            continue
+        old_project_ids = inspect(obj).attrs.project_id.history.deleted
+        if not old_project_ids or old_project_ids[0] is None or old_project_ids[0] == obj.project_id:
+            continue
+        entity_id = inspect(obj).identity[0]
+        # 移到其他專案：舊專案視為刪除，新專案由 updated_at 取得，不需要留下先前的刪除紀錄
+        session.add(Tombstone(
+            entity=entity, entity_id=entity_id, project_id=old_project_ids[0], deleted_at=deleted_at
+        ))
+        if obj.project_id is not None:
+            session.connection().execute(
+                delete(Tombstone.__table__).where(
+                    Tombstone.entity == entity,
+                    Tombstone.entity_id == entity_id,
+                    Tombstone.project_id == obj.project_id
+                )
+            )
+
+    for obj in list(session.deleted):
+        entity = _SYNCED_TABLES.get(type(obj))
+        if entity is None:
+            continue
+        session.add(Tombstone(
+            entity=entity,
+            entity_id=inspect(obj).identity[0],
+            project_id=resolve_project_id(session, obj),
+            deleted_at=deleted_at
+        ))
+
+def _primary_key(table: Any) -> Any:
+    return list(table.primary_key.columns)[0]
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_deletes(orm_execute_state):
+    """Record tombstones for bulk deletes of synced rows executed through a Session"""
+    if not orm_execute_state.is_delete:
+        return
+    mapper = orm_execute_state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    if model not in _SYNCED_TABLES:
+        return
+    table = model.__table__
+    key = _primary_key(table)
+    statement = select(key, table.c.project_id)
+    if orm_execute_state.statement.whereclause is not None:
+        statement = statement.where(orm_execute_state.statement.whereclause)
+    # 刪除前先取得會被刪除的主鍵，與刪除在同一個交易
+    rows = orm_execute_state.session.execute(statement).all()
+    if rows:
+        deleted_at = datetime.utcnow()
+        orm_execute_state.session.execute(insert(Tombstone), [
+            {"entity": table.name, "entity_id": entity_id, "project_id": project_id, "deleted_at": deleted_at}
+            for entity_id, project_id in rows
+        ])
+
+def get_changes(
+    db: Session,
+    project_id: int,
+    since: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+    """
+    Rows of a project changed after since, and ids deleted after it.
+    Without since every row of the project is returned.
+
+    With limit at most that many rows and deleted ids are returned, walking the
+    tables in SYNCED_MODELS order by primary key and the tombstones last.
+    next_position is the (stage, last_id) to pass as after for the next page,
+    None once everything was returned.
+
+    Deletes are recorded by the ORM session: Session.delete() and bulk
+    deletes executed through a Session. Rows removed on a raw Connection or
+    by ON DELETE CASCADE in the database never reach clients.
+    """
+    now = now or datetime.utcnow()
+    if since is not None and since < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise SyncTokenExpired()
+    window_start = since - timedelta(seconds=SYNC_OVERLAP_SECONDS) if since is not None else None
+    start_stage, last_id = after or (0, 0)
+    remaining = limit
+
+    changes: Dict[str, List[Dict[str, Any]]] = {model.__table__.name: [] for model in SYNCED_MODELS}
+    deleted: Dict[str, List[int]] = {}
+    stages = len(SYNCED_MODELS) + (1 if window_start is not None else 0)
+    for stage in range(start_stage, stages):
+        if remaining == 0:
+            # 剛好用完這一頁，下一頁從下一段開始
+            return _changes_page(project_id, since, changes, deleted, (stage, 0))
+        after_id = last_id if stage == start_stage else 0
+        if stage < len(SYNCED_MODELS):
+            table = SYNCED_MODELS[stage].__table__
+            key = _primary_key(table)
+            # 直接查詢資料表欄位，不建立 ORM 物件；以主鍵分頁，不受期間的修改影響
+            statement = select(table).where(table.c.project_id == project_id, key > after_id).order_by(key)
+            if window_start is not None:
+                statement = statement.where(table.c.updated_at > window_start)
+        else:
+            key = Tombstone.tombstone_id
+            statement = (
+                select(Tombstone.tombstone_id, Tombstone.entity, Tombstone.entity_id)
+                .where(
+                    Tombstone.project_id == project_id,
+                    Tombstone.deleted_at > window_start,
+                    Tombstone.tombstone_id > after_id
+                )
+                .order_by(Tombstone.tombstone_id)
+            )
+        if remaining is not None:
+            # 多取一筆判斷是否還有下一頁
+            statement = statement.limit(remaining + 1)
+        rows = db.execute(statement).mappings().all()
+        more = remaining is not None and len(rows) > remaining
+        if more:
+            rows = rows[:remaining]
+        if stage < len(SYNCED_MODELS):
+            changes[table.name] = [dict(row) for row in rows]
+        else:
+            for row in rows:
+                deleted.setdefault(row["entity"], []).append(row["entity_id"])
+        if remaining is not None:
+            remaining -= len(rows)
+        if more:
+            return _changes_page(project_id, since, changes, deleted, (stage, rows[-1][key.name]))
+    return _changes_page(project_id, since, changes, deleted, None)
+
+def _changes_page(
+    project_id: int,
+    since: Optional[datetime],
+    changes: Dict[str, List[Dict[str, Any]]],
+    deleted: Dict[str, List[int]],
+    next_position: Optional[Tuple[int, int]]
+    ) -> Dict[str, Any]:
+    return {
+        "project_id": project_id,
+        "full": since is None,
+        "changes": changes,
+        "deleted": deleted,
+        "next_position": next_position
+    }
+
+def prune_tombstones(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete tombstones older than the retention period, returns how many were removed"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS, seconds=SYNC_OVERLAP_SECONDS)
+    result = db.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+def backfill_sync_columns(connection: Connection) -> None:
+    """
+    Fill updated_at and the denormalized project_id of rows written before
+    those columns existed.
+    """
+    for model in SYNCED_MODELS:
+        table = model.__table__
+        fallback: Any = datetime.utcnow()
+        if "created_at" in table.c:
+            fallback = func.coalesce(table.c.created_at, fallback)
+        connection.execute(
+            update(table).where(table.c.updated_at.is_(None)).values(updated_at=fallback)
+        )
+
+    defects = Defect.__table__
+    improvements = Improvement.__table__
+    # 依相依順序：改善單先取得專案，確認單才能沿用；
+    # 明確帶入原本的 updated_at，補欄位不算資料異動
+    for child, parent, foreign_key, parent_key in (
+        (DefectMark.__table__, defects, "defect_id", "defect_id"),
+        (improvements, defects, "defect_id", "defect_id"),
+        (Confirmation.__table__, improvements, "improvement_id", "improvement_id"),
+    ):
+        connection.execute(
+            update(child)
+            .where(child.c.project_id.is_(None), child.c[foreign_key].isnot(None))
+            .values(
+                project_id=(
+                    select(parent.c.project_id)
+                    .where(parent.c[parent_key] == child.c[foreign_key])
+                    .scalar_subquery()
+                ),
+                updated_at=child.c.updated_at
+            )
+        )
+
+    photos = Photo.__table__
+    for related_type, model in PHOTO_RELATED_MODELS.items():
+        parent = model.__table__
+        parent_key = list(parent.primary_key.columns)[0]
+        connection.execute(
+            update(photos)
+            .where(photos.c.project_id.is_(None), photos.c.related_type == related_type)
+            .values(
+                project_id=(
+                    select(parent.c.project_id)
+                    .where(parent_key == photos.c.related_id)
+                    .scalar_subquery()
+                ),
+                updated_at=photos.c.updated_at
+            )
+        )
@@ -0,0 +1,14 @@
+from datetime import timedelta
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from app.job.handlers import register_periodic_handler
+from app.sync import crud
+
+PRUNE_TOMBSTONES_JOB_TYPE = "sync.prune_tombstones"
+
+@register_periodic_handler(PRUNE_TOMBSTONES_JOB_TYPE, timedelta(days=1))
+def prune_tombstones(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove tombstones older than the sync retention period"""
+    return {"removed": crud.prune_tombstones(db)}
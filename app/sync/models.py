@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.database import Base
+from datetime import datetime
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        # 增量同步依專案取得某時間之後刪除的資料
+        Index("ix_tombstones_project_id_deleted_at", "project_id", "deleted_at"),
+    )
+    
+    tombstone_id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False)  # 資料表名稱，例如 defects
+    entity_id = Column(Integer, nullable=False)
+    project_id = Column(Integer)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
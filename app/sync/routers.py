@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from app.database import get_db
+from app.project.models import Project
+from app.responses import trusted_response
+from app.sync import crud, schemas
+from app.sync import jobs  # noqa: F401  註冊刪除紀錄清理工作
+from app.utils import check_exists
+
+router = APIRouter()
+
+@router.get("/{project_id}/changes", response_model=schemas.ChangesOut)
+def read_project_changes(
+    project_id: int,
+    since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(crud.SYNC_PAGE_SIZE, ge=1, le=crud.SYNC_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Get rows of a project changed or deleted after a sync token
+
+    - since: 上次回應的 next_token，省略時回傳專案全部資料
+    - cursor: 上一頁回應的 next_cursor，帶入時忽略 since
+    - limit: 每頁最多回傳的資料列數
+    """
+    check_exists(db, Project, project_id, "project_id")
+    after = None
+    try:
+        if cursor:
+            position = crud.decode_changes_cursor(cursor)
+            since_at, token_at, after = position.since, position.token_at, (position.stage, position.last_id)
+        else:
+            since_at = crud.decode_sync_token(since) if since else None
+            # token 取查詢開始前的時間，查詢期間寫入的資料下次一定會再取到
+            token_at = datetime.utcnow()
+    except crud.SyncTokenError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        result = crud.get_changes(db, project_id, since=since_at, limit=limit, after=after)
+    except crud.SyncTokenExpired:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Sync token expired, sync again without since"
+        )
+    next_position = result.pop("next_position")
+    result["since"] = crud.encode_sync_token(since_at) if since_at is not None else None
+    # 分頁期間的異動由下次以 next_token 同步取得
+    result["next_token"] = crud.encode_sync_token(token_at)
+    result["next_cursor"] = (
+        crud.encode_changes_cursor(crud.ChangesCursor(since_at, token_at, *next_position))
+        if next_position is not None else None
+    )
+    return trusted_response(result, schemas.ChangesOut)
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, List, Any
+
+class ChangesOut(BaseModel):
+    project_id: int
+    since: Optional[str] = None
+    next_token: str  # 取完所有頁面後保存，下次同步時帶入 since
+    next_cursor: Optional[str] = None  # 還有下一頁時帶入 cursor 繼續取得，最後一頁為 null
+    full: bool  # true 表示沒有帶 since，回傳的是專案全部資料，客戶端取完所有頁面後應取代本地資料
+    changes: Dict[str, List[Dict[str, Any]]]  # 資料表名稱 -> 新增或修改過的資料列
+    deleted: Dict[str, List[int]]  # 資料表名稱 -> 已刪除的主鍵
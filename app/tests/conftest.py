@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 import os
@@ -10,8 +10,16 @@ from datetime import timedelta
 # Add the parent directory to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+# 測試時開啟嚴格載入，未宣告 eager loading 的 relationship 存取會直接失敗
+os.environ.setdefault("STRICT_LOADING", "1")
+# trusted 回應仍以 response model 驗證，CRUD dict 與 schema 不一致時測試會失敗
+os.environ.setdefault("TRUSTED_RESPONSE_VALIDATION", "1")
+
 from app.database import Base, get_db
 from app.main import app
+from app.cache import clear_all_caches
+from app.profiling import profile_queries
+from app.storage.backends import LocalStorage, set_storage
 
 # Use an in-memory SQLite database for testing
 # 使用 SQLite 記憶體資料庫，速度極快
@@ -22,9 +30,33 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# pysqlite 預設不會正確處理 SAVEPOINT，改由 SQLAlchemy 自行發出 BEGIN
+@event.listens_for(engine, "connect")
+def do_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def do_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
 # 創建資料表 - 在測試開始前執行一次
 Base.metadata.create_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # 每個測試都會回滾資料庫，ID 會被重複使用，因此行程內快取也要一併清空
+    clear_all_caches()
+    yield
+    clear_all_caches()
+
+@pytest.fixture
+def local_storage(tmp_path):
+    # 上傳的檔案寫到暫存目錄，不留在專案的 static/ 中
+    storage = LocalStorage(str(tmp_path))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
 @pytest.fixture(scope="function")
 def db():
     # 每個測試使用獨立的資料庫連線
@@ -33,7 +65,8 @@ def db():
     transaction = connection.begin()
     
     # 創建一個綁定到當前連線的 session
-    session = TestingSessionLocal(bind=connection)
+    # 使用 savepoint，程式中的 session.rollback() 不會清掉整個測試交易
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
     
     try:
         yield session
@@ -43,6 +76,12 @@ def db():
         transaction.rollback()
         connection.close()
 
+@pytest.fixture
+def query_counter():
+    # 記錄測試期間送到資料庫的 SQL 敘述，用來偵測 N+1 查詢
+    with profile_queries(engine) as profile:
+        yield profile
+
 @pytest.fixture(scope="function")
 def client(db):
     # Override the get_db dependency to use the test database
@@ -236,3 +236,83 @@ def test_api_delete_base_map_not_found(client):
     
     # Check response
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_base_map_clusters(db, test_base_map, test_defect, test_defect_mark):
+    from app.defect_mark.models import DefectMark
+
+    # 同一格子再加一個標記，另一個標記放在遠處
+    db.add(DefectMark(defect_id=test_defect.defect_id, base_map_id=test_base_map.base_map_id,
+                      coordinate_x=110.0, coordinate_y=210.0, scale=1.0))
+    db.add(DefectMark(defect_id=test_defect.defect_id, base_map_id=test_base_map.base_map_id,
+                      coordinate_x=2000.0, coordinate_y=2000.0, scale=1.0))
+    db.commit()
+
+    data = crud.get_base_map_clusters(db, test_base_map.base_map_id, zoom=0)
+
+    assert data["total_count"] == 3
+    assert len(data["clusters"]) == 2
+    near = next(c for c in data["clusters"] if c["count"] == 2)
+    assert near["status_counts"] == {"等待中": 2}
+    assert near["category_counts"] == {"Test Category": 2}
+    assert near["center_x"] == pytest.approx(105.0)
+    assert near["defect_mark_id"] is None
+    far = next(c for c in data["clusters"] if c["count"] == 1)
+    assert far["defect_mark_id"] is not None
+
+    # 放大後格子變小，原本同一格的兩個標記會被拆開
+    zoomed = crud.get_base_map_clusters(db, test_base_map.base_map_id, zoom=6)
+    assert len(zoomed["clusters"]) == 3
+
+def test_get_base_map_clusters_cache_invalidated(db, test_base_map, test_defect, test_defect_mark):
+    from app.defect_mark.models import DefectMark
+
+    first = crud.get_base_map_clusters(db, test_base_map.base_map_id, zoom=0)
+    assert first["total_count"] == 1
+
+    # 新增標記後快取應失效
+    db.add(DefectMark(defect_id=test_defect.defect_id, base_map_id=test_base_map.base_map_id,
+                      coordinate_x=300.0, coordinate_y=300.0, scale=1.0))
+    db.commit()
+    assert crud.get_base_map_clusters(db, test_base_map.base_map_id, zoom=0)["total_count"] == 2
+
+    # 缺失狀態改變後快取也應失效
+    test_defect.status = "已完成"
+    db.commit()
+    clusters = crud.get_base_map_clusters(db, test_base_map.base_map_id, zoom=0)["clusters"]
+    assert clusters[0]["status_counts"] == {"已完成": 2}
+
+def test_api_read_base_map_clusters(client, test_base_map, test_defect_mark):
+    response = client.get(f"/base-maps/{test_base_map.base_map_id}/clusters?zoom=2")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["base_map_id"] == test_base_map.base_map_id
+    assert data["zoom"] == 2
+    assert data["cell_size"] == 128.0
+    assert data["total_count"] == 1
+
+def test_api_read_base_map_clusters_not_found(client):
+    response = client.get("/base-maps/999/clusters")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_base_maps_with_defect_counts_single_query(db, test_project, test_defect, query_counter):
+    from app.base_map.models import BaseMap
+    from app.defect_mark.models import DefectMark
+
+    for i in range(5):
+        base_map = BaseMap(project_id=test_project.project_id, map_name=f"Map {i}", file_path=f"/path/{i}.jpg")
+        db.add(base_map)
+        db.flush()
+        for _ in range(i):
+            db.add(DefectMark(defect_id=test_defect.defect_id, base_map_id=base_map.base_map_id,
+                              coordinate_x=1.0, coordinate_y=1.0, scale=1.0))
+    db.commit()
+    project_id = test_project.project_id
+    query_counter.clear()
+
+    base_maps_data = crud.get_base_maps_with_defect_counts(db, project_id)
+
+    # 不論底圖數量多少都只送出一次查詢
+    assert len(query_counter) == 1
+    assert sorted(m["defect_count"] for m in base_maps_data) == [0, 1, 2, 3, 4]
@@ -0,0 +1,35 @@
+from benchmarks.http_load import Recorder, compare_to_baseline, percentile, summarize
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+def test_summarize_per_endpoint():
+    recorder = Recorder()
+    recorder.samples = {"GET /defects/": [0.010, 0.020, 0.030, 0.040]}
+    recorder.errors = {"GET /defects/": 1}
+    
+    summary = summarize(recorder, elapsed=2.0)
+    
+    endpoint = summary["endpoints"]["GET /defects/"]
+    assert endpoint["count"] == 4
+    assert endpoint["errors"] == 1
+    assert endpoint["throughput_rps"] == 2.0
+    assert endpoint["p50_ms"] == 20.0
+    assert endpoint["max_ms"] == 40.0
+    assert summary["requests"] == 4
+
+def test_compare_to_baseline_flags_regressions():
+    def run(p95_stats, p95_list):
+        return {"mixes": {"manager": {"endpoints": {
+            "GET /defects/stats": {"p95_ms": p95_stats, "throughput_rps": 10.0},
+            "GET /defects/": {"p95_ms": p95_list, "throughput_rps": 10.0}
+        }}}}
+    
+    rows = compare_to_baseline(run(130.0, 101.0), run(100.0, 100.0), threshold=0.10)
+    
+    flagged = {row["endpoint"]: row["regression"] for row in rows}
+    assert flagged == {"GET /defects/stats": True, "GET /defects/": False}
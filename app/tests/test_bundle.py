@@ -0,0 +1,274 @@
+import io
+import json
+import zipfile
+import zlib
+
+import pytest
+from fastapi import status
+
+from app import zipstream
+from app.base_map.models import BaseMap
+from app.bundle import crud
+from app.defect.models import Defect
+from app.photo.models import Photo
+from app.responses import dumps
+from app.storage import crud as storage_crud
+from app.storage.backends import set_storage
+from app.storage.models import StoredFile
+from app.sync import crud as sync_crud
+from app.tests.test_storage_backends import MemoryStorage
+
+@pytest.fixture
+def static_files(tmp_path, local_storage):
+    def write(path, data):
+        target = tmp_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        return path
+
+    return write
+
+@pytest.fixture
+def bundle_project(db, test_project, test_defect, static_files):
+    static_files("static/photos/defect/a.jpg", b"photo" * 1000)
+    static_files("static/photos/defect/thumbs/a.jpg", b"thumb")
+    static_files("static/base_map/map.png", b"map")
+    # 不在 static/ 之下的檔案不會被打包
+    static_files("secret.txt", b"secret")
+    db.add_all([
+        Photo(related_type="defect", related_id=test_defect.defect_id, image_url="/static/photos/defect/a.jpg"),
+        Photo(related_type="defect", related_id=test_defect.defect_id, image_url="/static/../secret.txt"),
+        BaseMap(project_id=test_project.project_id, map_name="m", file_path="static/base_map/map.png")
+    ])
+    db.commit()
+    return test_project
+
+def _layout_bytes(layout, start=0, end=None):
+    return b"".join(zipstream.iter_zip_range(layout, start, end))
+
+def _bundle_bytes(db, bundle, start=0, end=None):
+    end = bundle.layout.size - 1 if end is None else end
+    return b"".join(crud.iter_bundle_range(db, bundle, start, end))
+
+@pytest.fixture
+def count_pages(monkeypatch):
+    calls = []
+    get_changes = sync_crud.get_changes
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs.get("after"))
+        return get_changes(*args, **kwargs)
+
+    monkeypatch.setattr(crud.sync_crud, "get_changes", counted)
+    return calls
+
+def test_zip_layout_is_valid_zip(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(range(256)) * 100)
+    layout = zipstream.build_zip_layout([
+        zipstream.bytes_entry("資料.json", b'{"a": 1}'),
+        zipstream.file_entry("files/file.bin", str(path))
+    ])
+    data = _layout_bytes(layout)
+    assert len(data) == layout.size
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read("資料.json") == b'{"a": 1}'
+        assert archive.read("files/file.bin") == path.read_bytes()
+
+def test_zip_layout_ranges_concatenate_to_full_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipstream, "ZIP_CHUNK_SIZE", 7)
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"x" * 1000)
+    layout = zipstream.build_zip_layout([
+        zipstream.bytes_entry("a.txt", b"hello"),
+        zipstream.file_entry("b.bin", str(path))
+    ])
+    full = _layout_bytes(layout)
+    parts = [_layout_bytes(layout, start, min(start + 99, layout.size - 1)) for start in range(0, layout.size, 100)]
+    assert b"".join(parts) == full
+
+def test_zip64_records(tmp_path, monkeypatch):
+    # 降低門檻，讓小檔案也寫成 ZIP64 格式
+    monkeypatch.setattr(zipstream, "ZIP64_LIMIT", 0)
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"y" * 100)
+    layout = zipstream.build_zip_layout([
+        zipstream.bytes_entry("a.txt", b"hello"),
+        zipstream.file_entry("b.bin", str(path))
+    ])
+    with zipfile.ZipFile(io.BytesIO(_layout_bytes(layout))) as archive:
+        assert archive.testzip() is None
+        assert archive.read("b.bin") == b"y" * 100
+
+def test_build_project_bundle(db, bundle_project):
+    bundle = crud.build_project_bundle(db, bundle_project.project_id)
+    names = [entry.name for entry in bundle.layout.entries]
+    assert names == [
+        "data.json",
+        "static/base_map/map.png",
+        "static/photos/defect/a.jpg",
+        "static/photos/defect/thumbs/a.jpg"
+    ]
+    # 內容不變時版面與 ETag 相同，續傳才能拼出同一個檔案
+    again = crud.build_project_bundle(db, bundle_project.project_id)
+    assert again.etag == bundle.etag
+    assert _bundle_bytes(db, again) == _bundle_bytes(db, bundle)
+    assert crud.build_project_bundle(db, 999999) is None
+
+def test_bundle_data_written_page_by_page(db, bundle_project, test_user, monkeypatch):
+    monkeypatch.setattr(crud.sync_crud, "SYNC_PAGE_SIZE", 2)
+    for index in range(3):
+        db.add(Defect(project_id=bundle_project.project_id, submitted_id=test_user.user_id, status="等待中"))
+    db.commit()
+    bundle = crud.build_project_bundle(db, bundle_project.project_id)
+    assert len(bundle.data.checkpoints) > 1
+    with zipfile.ZipFile(io.BytesIO(_bundle_bytes(db, bundle))) as archive:
+        assert archive.testzip() is None
+        data = json.loads(archive.read("data.json"))
+    # 與一次取得全部資料的完整同步內容相同
+    expected = json.loads(dumps(sync_crud.get_changes(db, bundle_project.project_id)["changes"]))
+    assert data["changes"] == expected
+    assert list(data["changes"]) == [model.__table__.name for model in sync_crud.SYNCED_MODELS]
+    assert len(data["changes"]["defects"]) == 4
+    assert data["deleted"] == {} and data["since"] is None
+
+def test_bundle_ranges_regenerate_only_needed_pages(db, bundle_project, test_user, monkeypatch, count_pages):
+    monkeypatch.setattr(crud.sync_crud, "SYNC_PAGE_SIZE", 2)
+    for index in range(5):
+        db.add(Defect(project_id=bundle_project.project_id, submitted_id=test_user.user_id, status="等待中"))
+    db.commit()
+    bundle = crud.get_project_bundle(db, bundle_project.project_id)
+    full = _bundle_bytes(db, bundle)
+    # 每個範圍（包含從 data.json 中間開始的）都與完整檔案的同一段相同
+    for start in range(0, bundle.layout.size, 97):
+        end = min(start + 96, bundle.layout.size - 1)
+        assert _bundle_bytes(db, bundle, start, end) == full[start:end + 1]
+
+    # data.json 之後的續傳不需要重新查詢資料
+    data_end = bundle.layout.size - sum(entry.size for entry in bundle.layout.entries[1:])
+    del count_pages[:]
+    assert _bundle_bytes(db, bundle, data_end) == full[data_end:]
+    assert count_pages == []
+
+    # 從最後一頁中間續傳只產生最後一頁
+    last = bundle.data.checkpoints[-1]
+    _bundle_bytes(db, bundle, last.offset + 40 + 1, last.offset + 41)
+    assert count_pages == [last.after]
+
+def test_get_project_bundle_cached_per_version(db, bundle_project, test_defect, count_pages):
+    bundle = crud.get_project_bundle(db, bundle_project.project_id)
+    pages = len(count_pages)
+    assert crud.get_project_bundle(db, bundle_project.project_id) is bundle
+    assert len(count_pages) == pages
+
+    test_defect.status = "改善中"
+    db.commit()
+    rebuilt = crud.get_project_bundle(db, bundle_project.project_id)
+    assert rebuilt.version != bundle.version
+    assert crud.get_project_bundle(db, bundle_project.project_id) is rebuilt
+    # 已建立的版面在資料改變後不再輸出，避免拼出錯誤的壓縮檔
+    with pytest.raises(IOError):
+        _bundle_bytes(db, bundle)
+    assert crud.get_project_bundle(db, 999999) is None
+
+def test_bundle_uses_recorded_checksums(db, bundle_project, static_files, monkeypatch):
+    crud.build_project_bundle(db, bundle_project.project_id)
+    # 沒有紀錄的既有檔案讀一次後記錄，之後不再讀取檔案計算
+    stored = {row.key: row for row in db.query(StoredFile).all()}
+    assert set(stored) == {"static/base_map/map.png", "static/photos/defect/a.jpg", "static/photos/defect/thumbs/a.jpg"}
+    assert all(row.written_at is None for row in stored.values())
+
+    def fail(*args, **kwargs):
+        raise AssertionError("checksum computed again")
+
+    monkeypatch.setattr(crud.storage_crud, "read_checksum", fail)
+    bundle = crud.build_project_bundle(db, bundle_project.project_id)
+    assert zipfile.ZipFile(io.BytesIO(_bundle_bytes(db, bundle))).testzip() is None
+
+    # 寫入時記錄的大小與 CRC 直接使用；寫入時間讓版本改變
+    version = crud.get_bundle_version(db, bundle_project.project_id).version
+    static_files("static/base_map/map.png", b"new map")
+    checksum = storage_crud.FileChecksum(len(b"new map"), zlib.crc32(b"new map"))
+    storage_crud.record_checksums(db, {"static/base_map/map.png": checksum}, bundle_project.project_id)
+    db.commit()
+    assert crud.get_bundle_version(db, bundle_project.project_id).version != version
+    bundle = crud.get_project_bundle(db, bundle_project.project_id)
+    with zipfile.ZipFile(io.BytesIO(_bundle_bytes(db, bundle))) as archive:
+        assert archive.testzip() is None
+        assert archive.read("static/base_map/map.png") == b"new map"
+
+def test_bundle_reads_files_through_storage(client, db, bundle_project, tmp_path):
+    # 遠端儲存：檔案不在本機，仍由儲存端讀取後打包
+    remote = MemoryStorage()
+    for path in ("static/photos/defect/a.jpg", "static/photos/defect/thumbs/a.jpg", "static/base_map/map.png"):
+        remote.files[path] = (tmp_path / path).read_bytes()
+        (tmp_path / path).unlink()
+    set_storage(remote)
+    response = client.get(f"/projects/{bundle_project.project_id}/bundle.zip")
+    assert response.status_code == status.HTTP_200_OK
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.read("static/photos/defect/a.jpg") == b"photo" * 1000
+        assert archive.read("static/base_map/map.png") == b"map"
+
+    full, etag = response.content, response.headers["etag"]
+    response = client.get(
+        f"/projects/{bundle_project.project_id}/bundle.zip",
+        headers={"Range": "bytes=1000-", "If-Range": etag}
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == full[1000:]
+
+def test_api_bundle_download(client, db, bundle_project, test_defect):
+    response = client.get(f"/projects/{bundle_project.project_id}/bundle.zip")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert int(response.headers["content-length"]) == len(response.content)
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        data = json.loads(archive.read("data.json"))
+        assert archive.read("static/photos/defect/a.jpg") == b"photo" * 1000
+    assert data["full"] is True
+    assert [row["defect_id"] for row in data["changes"]["defects"]] == [test_defect.defect_id]
+    assert len(data["changes"]["photos"]) == 2
+    # 下載後可直接用 next_token 增量同步
+    changes = client.get(f"/projects/{bundle_project.project_id}/changes", params={"since": data["next_token"]})
+    assert changes.status_code == status.HTTP_200_OK
+
+def test_api_bundle_resume(client, db, bundle_project, test_defect):
+    full = client.get(f"/projects/{bundle_project.project_id}/bundle.zip")
+    etag = full.headers["etag"]
+    size = len(full.content)
+
+    response = client.get(
+        f"/projects/{bundle_project.project_id}/bundle.zip",
+        headers={"Range": "bytes=100-", "If-Range": etag}
+    )
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-range"] == f"bytes 100-{size - 1}/{size}"
+    assert full.content[:100] + response.content == full.content
+
+    response = client.get(f"/projects/{bundle_project.project_id}/bundle.zip", headers={"Range": f"bytes={size}-"})
+    assert response.status_code == status.HTTP_416_RANGE_NOT_SATISFIABLE
+    assert response.headers["content-range"] == f"bytes */{size}"
+
+    # 內容改變後 If-Range 不符，回傳完整的新檔案
+    test_defect.status = "改善中"
+    db.commit()
+    response = client.get(
+        f"/projects/{bundle_project.project_id}/bundle.zip",
+        headers={"Range": "bytes=100-", "If-Range": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert zipfile.ZipFile(io.BytesIO(response.content)).testzip() is None
+
+def test_api_bundle_not_modified(client, bundle_project):
+    etag = client.get(f"/projects/{bundle_project.project_id}/bundle.zip").headers["etag"]
+    response = client.get(f"/projects/{bundle_project.project_id}/bundle.zip", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+def test_api_bundle_project_not_found(client):
+    response = client.get("/projects/999999/bundle.zip")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,142 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI, status
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, parse_accept_encoding, select_encoding
+
+LARGE_TEXT = "缺失描述 " * 1000
+
+def make_app(**options):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **options)
+
+    @app.get("/large")
+    def large():
+        return {"text": LARGE_TEXT}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/image")
+    def image():
+        return Response(b"\x89PNG" + b"\x00" * 5000, media_type="image/png")
+
+    @app.get("/encoded")
+    def encoded():
+        return PlainTextResponse(LARGE_TEXT, headers={"Content-Encoding": "identity"})
+
+    @app.get("/stream")
+    def stream():
+        def chunks():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+@pytest.fixture
+def compression_client():
+    return TestClient(make_app())
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, *;q=0") == {"gzip": 1.0, "br": 0.5, "*": 0.0}
+    assert parse_accept_encoding("") == {}
+
+def test_select_encoding():
+    supported = ("br", "gzip")
+    assert select_encoding("gzip, br", supported) == "br"
+    assert select_encoding("gzip, br;q=0.5", supported) == "gzip"
+    assert select_encoding("gzip;q=0", supported) is None
+    assert select_encoding("*", supported) == "br"
+    assert select_encoding("identity", supported) is None
+    assert select_encoding("br", ("gzip",)) is None
+
+def test_large_json_is_gzipped(compression_client):
+    response = compression_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(LARGE_TEXT.encode("utf-8")) / 10
+    assert response.json() == {"text": LARGE_TEXT}
+
+def test_identity_when_not_accepted(compression_client):
+    response = compression_client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    # 未壓縮的回應也要帶 Vary，快取才會區分
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == {"text": LARGE_TEXT}
+
+def test_small_response_not_compressed(compression_client):
+    response = compression_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+def test_incompressible_types_untouched(compression_client):
+    response = compression_client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    response = compression_client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "identity"
+
+def test_head_request_untouched(compression_client):
+    response = compression_client.head("/large", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_brotli_when_available(compression_client):
+    pytest.importorskip("brotli")
+    response = compression_client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == {"text": LARGE_TEXT}
+
+def test_stream_chunks_are_flushed():
+    messages = []
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")]
+        })
+        await send({"type": "http.response.body", "body": b"data: first\n\n", "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: second\n\n", "more_body": False})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, receive, send))
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # 第一段不需等到串流結束即可解壓
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(messages[1]["body"]) == b"data: first\n\n"
+    assert messages[1]["more_body"] is True
+    assert decompressor.decompress(messages[2]["body"]) == b"data: second\n\n"
+    assert messages[2]["more_body"] is False
+
+def test_streaming_response_round_trip(compression_client):
+    response = compression_client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+def test_compress_helper():
+    data = LARGE_TEXT.encode("utf-8")
+    assert gzip.decompress(compression.compress(data, "gzip")) == data
+
+def test_api_defect_list_compressed(client, test_defect):
+    response = client.get("/defects/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()[0]["defect_id"] == test_defect.defect_id
@@ -1,6 +1,8 @@
 import pytest
 from fastapi import status
 from datetime import datetime, date, timedelta
+from sqlalchemy.exc import InvalidRequestError
+from app import database
 from app.defect import crud
 from app.defect.schemas import DefectCreate, DefectUpdate
 
@@ -134,6 +136,27 @@ def test_delete_defect(db, test_defect):
     defect = crud.get_defect(db, test_defect.defect_id)
     assert defect is None
 
+def test_strict_loading_rejects_lazy_loads(db, test_defect, monkeypatch):
+    defect_id = test_defect.defect_id
+    db.expunge_all()
+    defect = crud.get_defect(db, defect_id)
+    
+    # 測試環境開啟嚴格載入，未宣告載入方式的集合不可 lazy load
+    with pytest.raises(InvalidRequestError, match="strict loading"):
+        defect.improvements
+    
+    monkeypatch.setattr(database, "STRICT_LOADING", False)
+    assert defect.improvements == []
+
+def test_get_defect_details_loads_collections_explicitly(db, test_defect):
+    defect_id = test_defect.defect_id
+    db.expunge_all()
+    
+    defect_data = crud.get_defect_details(db, defect_id, with_marks=True, with_photos=True, with_improvements=True)
+    
+    assert defect_data["defect_marks"] == []
+    assert defect_data["improvements"] == []
+
 def test_get_defect_details(db, test_defect, test_project, test_user, test_defect_category, test_vendor):
     # Get defect with details
     defect_data = crud.get_defect_details(db, test_defect.defect_id, with_marks=True, with_photos=True, with_improvements=True, with_full_related=True)
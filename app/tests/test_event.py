@@ -0,0 +1,164 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from sqlalchemy.orm import Session
+
+from app.event import crud, routers
+from app.event.broker import EventBroker, get_event_broker
+from app.event.models import ProjectEvent
+from app.improvement import crud as improvement_crud
+from app.main import app
+
+@pytest.fixture
+def test_broker(db):
+    # broker 在自己的執行緒查詢，沿用測試交易所在的連線
+    connection = db.connection()
+    broker = EventBroker(session_factory=lambda: Session(bind=connection), poll_interval=0.01)
+    app.dependency_overrides[get_event_broker] = lambda: broker
+    yield broker
+    app.dependency_overrides.pop(get_event_broker, None)
+
+def _events(db):
+    return [
+        (e.entity, e.action)
+        for e in db.query(ProjectEvent).order_by(ProjectEvent.event_id).all()
+    ]
+
+def _parse_stream(text):
+    messages = []
+    for block in text.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            if line.startswith(":"):
+                fields.setdefault("comment", line)
+                continue
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        if fields:
+            messages.append(fields)
+    return messages
+
+def test_changes_recorded_as_events(db, test_project, test_defect, test_improvement):
+    assert _events(db) == [("defects", "created"), ("improvements", "created")]
+    test_defect.status = "改善中"
+    db.commit()
+    improvement_crud.delete_improvement(db, test_improvement.improvement_id)
+    events = db.query(ProjectEvent).order_by(ProjectEvent.event_id).all()
+    assert [(e.entity, e.action) for e in events][2:] == [("defects", "updated"), ("improvements", "deleted")]
+    assert {e.project_id for e in events} == {test_project.project_id}
+
+def test_unmodified_flush_records_nothing(db, test_defect):
+    before = len(_events(db))
+    test_defect.status = test_defect.status
+    db.commit()
+    assert len(_events(db)) == before
+
+def test_get_project_events(db, test_project, test_defect, test_photo):
+    events = crud.get_project_events(db, test_project.project_id, 0)
+    assert [e["entity"] for e in events] == ["defects", "photos"]
+    assert crud.get_project_events(db, test_project.project_id, events[0]["event_id"]) == events[1:]
+    assert crud.get_latest_event_id(db, test_project.project_id) == events[-1]["event_id"]
+    assert crud.get_project_events(db, test_project.project_id + 1, 0) == []
+
+def test_prune_keeps_latest_event_per_project(db, test_project, test_defect, test_photo):
+    db.query(ProjectEvent).update({ProjectEvent.created_at: datetime.utcnow() - timedelta(days=2)})
+    db.commit()
+    latest = crud.get_latest_event_id(db, test_project.project_id)
+    assert crud.prune_project_events(db) == 1
+    assert [e.event_id for e in db.query(ProjectEvent).all()] == [latest]
+
+def test_broker_fans_out_by_project(db, test_project, test_defect, test_broker):
+    async def scenario():
+        queue = await test_broker.subscribe(test_project.project_id)
+        other = await test_broker.subscribe(test_project.project_id + 1)
+        test_defect.status = "改善中"
+        db.commit()
+        events = await test_broker.poll_once()
+        assert [e["action"] for e in events] == ["updated"]
+        item = queue.get_nowait()
+        assert item["entity"] == "defects" and item["entity_id"] == test_defect.defect_id
+        assert other.empty()
+        test_broker.unsubscribe(test_project.project_id, queue)
+        test_broker.unsubscribe(test_project.project_id + 1, other)
+
+    asyncio.run(scenario())
+
+def test_broker_rechecks_missing_event_ids(test_broker):
+    test_broker.last_event_id = 10
+    test_broker._track_missing([{"event_id": 11}, {"event_id": 14}])
+    # 12、13 可能屬於尚未 commit 的交易，之後的輪詢會再查
+    assert set(test_broker._missing) == {12, 13}
+    assert test_broker.last_event_id == 14
+    test_broker._track_missing([{"event_id": 12}])
+    assert set(test_broker._missing) == {13}
+    assert test_broker.last_event_id == 14
+
+def test_broker_drops_slow_subscriber(test_broker):
+    async def scenario():
+        queue = await test_broker.subscribe(1)
+        for i in range(queue.maxsize + 1):
+            test_broker.publish([{"event_id": i, "project_id": 1}])
+        assert queue.get_nowait() is None
+        assert 1 not in test_broker._subscribers
+
+    asyncio.run(scenario())
+
+def test_stream_replays_and_delivers_live_events(db, test_project, test_defect, test_broker):
+    async def scenario():
+        first_id = crud.get_latest_event_id(db, test_project.project_id)
+        test_defect.status = "改善中"
+        db.commit()
+
+        stream = routers.stream_project_events(
+            test_broker, test_project.project_id, last_event_id=first_id,
+            max_seconds=1, heartbeat_seconds=0.05
+        )
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        # 補送的事件
+        assert chunks[0].startswith("retry:")
+        assert "event: defects.updated" in chunks[1]
+
+        test_defect.status = "待確認"
+        db.commit()
+        await test_broker.poll_once()
+        live = await stream.__anext__()
+        # 機器較慢時 heartbeat 可能先送出
+        while live.startswith(":"):
+            live = await stream.__anext__()
+        assert "event: defects.updated" in live
+        payload = json.loads(live.split("data: ", 1)[1])
+        assert payload["entity_id"] == test_defect.defect_id
+
+        heartbeat = await stream.__anext__()
+        assert heartbeat == ": keep-alive\n\n"
+        await stream.aclose()
+        assert not test_broker._subscribers
+
+    asyncio.run(scenario())
+
+def test_api_stream_events(client, test_project, test_defect, test_broker, monkeypatch):
+    monkeypatch.setattr(routers, "EVENTS_STREAM_MAX_SECONDS", 0.2)
+    monkeypatch.setattr(routers, "EVENTS_HEARTBEAT_SECONDS", 0.05)
+    response = client.get(
+        f"/projects/{test_project.project_id}/events", headers={"Last-Event-ID": "0"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = _parse_stream(response.text)
+    assert messages[0] == {"retry": "3000"}
+    assert messages[1]["event"] == "defects.created"
+    assert json.loads(messages[1]["data"])["entity_id"] == test_defect.defect_id
+
+def test_api_stream_resets_when_too_far_behind(client, test_project, test_defect, test_broker, monkeypatch):
+    monkeypatch.setattr(routers, "EVENTS_STREAM_MAX_SECONDS", 0.1)
+    monkeypatch.setattr(routers, "EVENTS_REPLAY_LIMIT", 0)
+    response = client.get(f"/projects/{test_project.project_id}/events", params={"last_event_id": 0})
+    messages = _parse_stream(response.text)
+    assert messages[1]["event"] == "reset"
+
+def test_api_stream_events_project_not_found(client, test_broker):
+    response = client.get("/projects/999999/events")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
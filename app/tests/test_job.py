@@ -0,0 +1,137 @@
+import pytest
+import io
+import os
+from datetime import datetime, timedelta
+from fastapi import status
+from PIL import Image
+
+from app.job import crud
+from app.job.handlers import register_handler
+from app.job.worker import process_next_job
+
+calls = []
+
+@register_handler("test.echo")
+def echo_handler(db, payload):
+    calls.append(payload)
+    return {"echo": payload["value"]}
+
+@register_handler("test.fail")
+def fail_handler(db, payload):
+    raise RuntimeError("boom")
+
+# CRUD Tests
+def test_enqueue_job(db):
+    job = crud.enqueue_job(db, "test.echo", {"value": 1})
+    assert job.job_id is not None
+    assert job.status == "queued"
+    assert job.attempts == 0
+    assert crud.get_job_payload(job) == {"value": 1}
+
+def test_claim_next_job_skips_future_jobs(db):
+    crud.enqueue_job(db, "test.echo", {"value": 1}, run_after=datetime.utcnow() + timedelta(hours=1))
+    assert crud.claim_next_job(db, "worker-1") is None
+
+    due = crud.enqueue_job(db, "test.echo", {"value": 2})
+    claimed = crud.claim_next_job(db, "worker-1")
+    assert claimed.job_id == due.job_id
+    assert claimed.status == "running"
+    assert claimed.attempts == 1
+    assert claimed.locked_by == "worker-1"
+
+    # 已被領取的工作不會再被其他 worker 領取
+    assert crud.claim_next_job(db, "worker-2") is None
+
+def test_process_next_job_success(db):
+    calls.clear()
+    job = crud.enqueue_job(db, "test.echo", {"value": 42})
+
+    assert process_next_job(db, "worker-1") is True
+    assert calls == [{"value": 42}]
+
+    job = crud.get_job(db, job.job_id)
+    assert job.status == "succeeded"
+    assert job.result == '{"echo": 42}'
+    assert job.finished_at is not None
+
+    # 佇列已空
+    assert process_next_job(db, "worker-1") is False
+
+def test_process_next_job_retries_with_backoff(db):
+    job = crud.enqueue_job(db, "test.fail", max_attempts=2)
+
+    assert process_next_job(db, "worker-1") is True
+    job = crud.get_job(db, job.job_id)
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert "boom" in job.last_error
+    assert job.run_after > datetime.utcnow()
+
+    # 等待時間到之前不會重試
+    assert process_next_job(db, "worker-1") is False
+
+    job.run_after = datetime.utcnow()
+    db.commit()
+    assert process_next_job(db, "worker-1") is True
+    job = crud.get_job(db, job.job_id)
+    assert job.status == "failed"
+    assert job.attempts == 2
+
+def test_get_backoff_seconds():
+    assert crud.get_backoff_seconds(1) == crud.JOB_BACKOFF_BASE_SECONDS
+    assert crud.get_backoff_seconds(3) == crud.JOB_BACKOFF_BASE_SECONDS * 4
+    assert crud.get_backoff_seconds(100) == crud.JOB_BACKOFF_MAX_SECONDS
+
+def test_requeue_stale_jobs(db):
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    job = crud.enqueue_job(db, "test.echo", {"value": 1}, run_after=an_hour_ago)
+    crud.claim_next_job(db, "worker-1", now=an_hour_ago)
+
+    assert crud.requeue_stale_jobs(db, timeout_seconds=600) == 1
+    job = crud.get_job(db, job.job_id)
+    assert job.status == "queued"
+    assert job.locked_by is None
+
+def test_photo_thumbnail_job(client, db, test_defect, local_storage):
+    image = Image.new("RGB", (1200, 800), color="red")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    buffer.seek(0)
+
+    response = client.post(
+        "/photos/",
+        files={"file": ("thumb.jpg", buffer, "image/jpeg")},
+        data={"related_type": "defect", "related_id": str(test_defect.defect_id)}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # 上傳只排入工作，由 worker 產生縮圖
+    assert process_next_job(db, "worker-1") is True
+    from app.job.models import Job
+    job = db.query(Job).filter(Job.job_type == "photo.thumbnail").first()
+    assert job.status == "succeeded"
+
+    from app.photo.jobs import get_thumbnail_url
+    image_url = response.json()["image_url"]
+    with Image.open(local_storage.path(get_thumbnail_url(image_url))) as thumbnail:
+        assert max(thumbnail.size) <= 320
+
+# API Tests
+def test_api_read_job(client, db):
+    job = crud.enqueue_job(db, "test.echo", {"value": 1})
+
+    response = client.get(f"/jobs/{job.job_id}")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["job_id"] == job.job_id
+    assert data["status"] == "queued"
+    assert data["result"] is None
+
+    process_next_job(db, "worker-1")
+    response = client.get(f"/jobs/{job.job_id}")
+    assert response.json()["status"] == "succeeded"
+    assert response.json()["result"] == {"echo": 1}
+
+def test_api_read_job_not_found(client):
+    response = client.get("/jobs/999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
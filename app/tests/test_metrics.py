@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app import metrics
+
+METRICS_HEADERS = {"Authorization": "Bearer test-metrics-token"}
+
+@pytest.fixture(autouse=True)
+def reset_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "test-metrics-token")
+    metrics.registry.reset()
+    yield
+    metrics.flusher.stop()
+    metrics.registry.reset()
+
+def _sample(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def test_metrics_use_route_template(client, test_project):
+    client.get(f"/projects/{test_project.project_id}")
+    client.get("/projects/999999")
+    
+    response = client.get("/metrics", headers=METRICS_HEADERS)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    
+    assert _sample(text, 'http_requests_total{method="GET",route="/projects/{project_id}",status="200"}') == 1
+    assert _sample(text, 'http_requests_total{method="GET",route="/projects/{project_id}",status="404"}') == 1
+    assert _sample(text, 'http_request_duration_seconds_count{method="GET",route="/projects/{project_id}"}') == 2
+    assert _sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/projects/{project_id}",le="+Inf"}') == 2
+    assert _sample(text, 'http_response_size_bytes_sum{method="GET",route="/projects/{project_id}"}') > 0
+    assert f"/projects/{test_project.project_id}\"" not in text
+    # /metrics 本身仍在處理中
+    assert _sample(text, "http_requests_in_flight") == 1
+
+def test_metrics_unmatched_route(client):
+    client.get("/no-such-path/123")
+    
+    text = client.get("/metrics", headers=METRICS_HEADERS).text
+    assert _sample(text, 'http_requests_total{method="GET",route="<unmatched>",status="404"}') == 1
+
+def test_metrics_count_errors():
+    metrics.registry.request_started()
+    metrics.registry.request_finished("GET", "/boom", 500, 0.2, 10)
+    metrics.registry.request_started()
+    metrics.registry.request_finished("GET", "/boom", 200, 20.0, 10, error=True)
+    
+    text = metrics.render_prometheus(metrics.merge_snapshots([metrics.registry.snapshot()]))
+    assert _sample(text, 'http_request_errors_total{method="GET",route="/boom"}') == 2
+    assert _sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/boom",le="0.25"}') == 1
+    assert _sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/boom",le="10.0"}') == 1
+    assert _sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/boom",le="+Inf"}') == 2
+    assert _sample(text, "http_requests_in_flight") == 0
+
+def test_metrics_aggregate_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.registry.request_started()
+    metrics.registry.request_finished("GET", "/defects/{defect_id}", 200, 0.001, 100)
+    
+    # 另一個 worker 的檔案：pid 不存在代表已結束，計數保留但 in-flight 不計
+    other = _exited_snapshot(4)
+    with open(os.path.join(tmp_path, "metrics-other.json"), "w") as f:
+        json.dump(other, f)
+    
+    metrics.write_snapshot()
+    merged = metrics.merge_snapshots(metrics.read_snapshots())
+    
+    assert merged["requests"][("GET", "/defects/{defect_id}", "200")] == 5
+    assert merged["durations"][("GET", "/defects/{defect_id}")]["counts"][0] == 5
+    assert merged["sizes"][("GET", "/defects/{defect_id}")]["sum"] == 500.0
+    assert merged["in_flight"] == 0
+
+def _exited_snapshot(count):
+    return {
+        "pid": 2 ** 22 + 1,
+        "requests": [["GET", "/defects/{defect_id}", "200", count]],
+        "errors": [],
+        "durations": [["GET", "/defects/{defect_id}", [count] + [0] * len(metrics.DURATION_BUCKETS), 0.005 * count]],
+        "sizes": [["GET", "/defects/{defect_id}", [0, count] + [0] * (len(metrics.SIZE_BUCKETS) - 1), 100.0 * count]],
+        "in_flight": 3
+    }
+
+def test_metrics_compact_exited_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.write_snapshot()
+    for index in range(3):
+        with open(os.path.join(tmp_path, f"metrics-old-{index}.json"), "w") as f:
+            json.dump(_exited_snapshot(index + 1), f)
+    
+    assert metrics.compact_snapshots() == 3
+    # 已結束的 worker 合併成一個檔案，計數不變；合併檔不會再被合併
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".json")) == sorted([
+        os.path.basename(metrics._snapshot_path(str(tmp_path))), metrics.EXITED_SNAPSHOT_NAME
+    ])
+    merged = metrics.merge_snapshots(metrics.read_snapshots())
+    assert merged["requests"][("GET", "/defects/{defect_id}", "200")] == 6
+    assert merged["in_flight"] == 0
+    
+    with open(os.path.join(tmp_path, "metrics-old-3.json"), "w") as f:
+        json.dump(_exited_snapshot(4), f)
+    assert metrics.compact_snapshots() == 1
+    assert metrics.compact_snapshots() == 0
+    merged = metrics.merge_snapshots(metrics.read_snapshots())
+    assert merged["requests"][("GET", "/defects/{defect_id}", "200")] == 10
+
+def _flushed_count(metrics_dir, route):
+    try:
+        with open(metrics._snapshot_path(metrics_dir)) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return 0
+    return sum(value for method, path, _, value in snapshot["requests"] if path == route)
+
+def test_metrics_flushed_in_background(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics.flusher, "interval", 0.05)
+    for index in range(5):
+        client.get("/no-such-path/1")
+    # 之後沒有新的請求，最後幾個請求仍由背景執行緒寫出
+    deadline = time.monotonic() + 5
+    while _flushed_count(str(tmp_path), metrics.UNMATCHED_ROUTE) < 5 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _flushed_count(str(tmp_path), metrics.UNMATCHED_ROUTE) == 5
+
+def test_metrics_flushed_on_shutdown(db, tmp_path, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics.flusher, "interval", 3600)
+    with TestClient(app) as c:
+        for index in range(5):
+            c.get("/no-such-path/1")
+        assert _flushed_count(str(tmp_path), metrics.UNMATCHED_ROUTE) == 0
+    # lifespan shutdown 時寫出全部的計數
+    assert _flushed_count(str(tmp_path), metrics.UNMATCHED_ROUTE) == 5
+
+def test_metrics_require_token(client, monkeypatch):
+    assert client.get("/metrics").status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == status.HTTP_401_UNAUTHORIZED
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert client.get("/metrics", headers=METRICS_HEADERS).status_code == status.HTTP_404_NOT_FOUND
+
+def test_metrics_label_escaping():
+    assert metrics._labels(route='a"b\\c\nd') == 'route="a\\"b\\\\c\\nd"'
@@ -0,0 +1,114 @@
+import pytest
+import json
+from datetime import datetime
+
+from app.notification import crud
+from app.notification.models import NotificationOutbox
+from app.notification.transports import LocalStubTransport
+from app.notification.dispatcher import dispatch_pending, render_message
+from app.defect import crud as defect_crud
+from app.defect.schemas import DefectUpdate
+from app.improvement import crud as improvement_crud
+from app.improvement.schemas import ImprovementCreate
+from app.confirmation import crud as confirmation_crud
+from app.confirmation.schemas import ConfirmationCreate
+
+@pytest.fixture
+def vendor_with_line(db, test_project):
+    from app.vendor.models import Vendor
+
+    vendor = Vendor(project_id=test_project.project_id, vendor_name="LINE Vendor", line_id="vendor_line_id")
+    db.add(vendor)
+    db.commit()
+    db.refresh(vendor)
+    return vendor
+
+def outbox_rows(db, event_type):
+    return db.query(NotificationOutbox).filter(NotificationOutbox.event_type == event_type).all()
+
+def test_update_defect_assigned_vendor_queues_notification(db, test_defect, vendor_with_line):
+    defect_crud.update_defect(db, test_defect.defect_id, DefectUpdate(assigned_vendor_id=vendor_with_line.vendor_id))
+
+    rows = outbox_rows(db, "defect_assigned")
+    assert len(rows) == 1
+    assert rows[0].recipient_type == "vendor"
+    assert rows[0].recipient_id == vendor_with_line.vendor_id
+    assert rows[0].line_id == "vendor_line_id"
+    assert json.loads(rows[0].payload)["defect_id"] == test_defect.defect_id
+
+    # 指派廠商未變更時不再通知
+    defect_crud.update_defect(db, test_defect.defect_id, DefectUpdate(location="B1"))
+    assert len(outbox_rows(db, "defect_assigned")) == 1
+
+def test_update_defect_vendor_without_line_id_skipped(db, test_defect, test_project):
+    from app.vendor.models import Vendor
+
+    vendor = Vendor(project_id=test_project.project_id, vendor_name="No LINE")
+    db.add(vendor)
+    db.commit()
+
+    defect_crud.update_defect(db, test_defect.defect_id, DefectUpdate(assigned_vendor_id=vendor.vendor_id))
+    assert outbox_rows(db, "defect_assigned") == []
+
+def test_create_improvement_queues_notification(db, test_defect, test_user):
+    improvement_crud.create_improvement(db, ImprovementCreate(
+        defect_id=test_defect.defect_id,
+        submitter_id=test_user.user_id,
+        content="已修補",
+        improvement_date="2024-01-01"
+    ))
+
+    rows = outbox_rows(db, "improvement_submitted")
+    assert len(rows) == 1
+    assert rows[0].recipient_type == "user"
+    assert rows[0].line_id == test_user.line_id
+
+def test_create_confirmation_queues_notification(db, test_defect, test_improvement, test_user, vendor_with_line):
+    test_defect.assigned_vendor_id = vendor_with_line.vendor_id
+    db.commit()
+
+    confirmation_crud.create_confirmation(db, ConfirmationCreate(
+        improvement_id=test_improvement.improvement_id,
+        confirmer_id=test_user.user_id,
+        status="退回",
+        comment="請重做",
+        confirmation_date="2024-01-02"
+    ))
+
+    rows = outbox_rows(db, "confirmation_made")
+    assert len(rows) == 1
+    assert rows[0].line_id == "vendor_line_id"
+    assert json.loads(rows[0].payload)["confirmation_status"] == "退回"
+
+def test_dispatch_pending_batches_identical_messages(db):
+    payload = {"defect_description": "牆面裂縫", "unique_code": "abc"}
+    for i in range(3):
+        crud.add_notification(db, "defect_assigned", "vendor", i + 1, f"line_{i}", payload)
+    crud.add_notification(db, "confirmation_made", "vendor", 9, "line_9", {"confirmation_status": "接受"})
+    db.commit()
+
+    transport = LocalStubTransport(max_recipients=2)
+    assert dispatch_pending(db, transport) == 4
+
+    # 相同訊息合併為 multicast，並依 max_recipients 分批
+    assert [line_ids for line_ids, _ in transport.sent] == [["line_0", "line_1"], ["line_2"], ["line_9"]]
+    assert all(n.status == "sent" for n in db.query(NotificationOutbox).all())
+    assert dispatch_pending(db, transport) == 0
+
+def test_dispatch_pending_failure_schedules_retry(db):
+    crud.add_notification(db, "defect_assigned", "vendor", 1, "line_1", {})
+    db.commit()
+
+    assert dispatch_pending(db, LocalStubTransport(fail=True)) == 1
+
+    notification = db.query(NotificationOutbox).first()
+    assert notification.status == "pending"
+    assert notification.attempts == 1
+    assert notification.next_attempt_at > datetime.utcnow()
+    assert "stub transport failure" in notification.last_error
+
+def test_render_message():
+    text = render_message("defect_assigned", {"defect_description": "漏水", "location": "2F", "unique_code": "xyz"})
+    assert "漏水" in text
+    assert "2F" in text
+    assert "xyz" in text
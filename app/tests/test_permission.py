@@ -284,3 +284,37 @@ def test_api_delete_permission_not_found(client):
     
     # Check response
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_user_project_roles_cached(db, test_permission, query_counter):
+    user_email, project_id = test_permission.user_email, test_permission.project_id
+    query_counter.clear()
+
+    assert crud.get_user_project_roles(db, user_email) == {project_id: "admin"}
+    assert len(query_counter) == 1
+
+    # 第二次由快取取得，不再查詢資料庫
+    assert crud.get_user_project_roles(db, user_email) == {project_id: "admin"}
+    assert len(query_counter) == 1
+
+def test_get_user_project_roles_invalidated_on_write(db, test_permission, test_project):
+    user_email = test_permission.user_email
+    assert crud.get_user_project_roles(db, user_email) == {test_project.project_id: "admin"}
+
+    # 更新角色
+    crud.update_permission(db, test_permission.permission_id, PermissionUpdate(
+        project_id=test_project.project_id, user_email=user_email, user_role="viewer"
+    ))
+    assert crud.get_user_project_roles(db, user_email) == {test_project.project_id: "viewer"}
+
+    # 刪除權限
+    crud.delete_permission(db, test_permission.permission_id)
+    assert crud.get_user_project_roles(db, user_email) == {}
+
+    # 新增權限
+    crud.create_permission(db, PermissionCreate(
+        project_id=test_project.project_id, user_email=user_email, user_role="editor"
+    ))
+    assert crud.get_user_project_roles(db, user_email) == {test_project.project_id: "editor"}
+
+def test_get_user_project_roles_without_email(db):
+    assert crud.get_user_project_roles(db, None) == {}
@@ -1,6 +1,7 @@
 import pytest
 import os
 import io
+import json
 from fastapi import status
 from PIL import Image
 from app.photo import crud, schemas
@@ -230,3 +231,50 @@ def test_api_upload_photo(client, test_defect):
     # 清理測試檔案
     if os.path.exists(file_path):
         os.remove(file_path)
+
+def _batch_files(count, extension=".jpg"):
+    return [("files", (f"test{i}{extension}", create_test_image(), "image/jpeg")) for i in range(count)]
+
+def test_api_upload_photos_batch(client, db, test_defect, tmp_path, local_storage, query_counter):
+    """測試一次上傳多張照片"""
+    from app.job.models import Job
+
+    data = {"related_type": "defect", "related_id": str(test_defect.defect_id), "description": "batch"}
+    query_counter.clear()
+    response = client.post("/photos/batch", files=_batch_files(3), data=data)
+    assert response.status_code == status.HTTP_201_CREATED
+    photos = response.json()
+    assert len(photos) == 3
+    assert len({p["image_url"] for p in photos}) == 3
+    assert all(p["description"] == "batch" and p["full_url"].startswith("http") for p in photos)
+    for photo in photos:
+        assert (tmp_path / photo["image_url"].lstrip("/")).exists()
+    # 關聯只檢查一次，寫入後以一次查詢載入，不逐筆 refresh
+    assert sum(1 for statement in query_counter if statement.startswith("SELECT")) == 2
+
+    jobs = db.query(Job).filter(Job.job_type == "photo.thumbnail").all()
+    assert sorted(json.loads(job.payload)["photo_id"] for job in jobs) == sorted(p["photo_id"] for p in photos)
+
+    # 寫入檔案時一併記錄大小與 CRC32，離線包不需再讀檔計算
+    from app.storage import crud as storage_crud
+    checksums = storage_crud.get_checksums(db, [p["image_url"].lstrip("/") for p in photos])
+    for photo in photos:
+        with open(tmp_path / photo["image_url"].lstrip("/"), "rb") as f:
+            assert checksums[photo["image_url"].lstrip("/")] == storage_crud.read_checksum(f)
+
+def test_api_upload_photos_batch_rejects_whole_batch(client, test_defect, tmp_path, local_storage, monkeypatch):
+    """測試任何一個檔案不合格時整批拒絕"""
+    from app.photo import services
+
+    data = {"related_type": "defect", "related_id": str(test_defect.defect_id)}
+    files = _batch_files(2) + [("files", ("notes.txt", io.BytesIO(b"x"), "text/plain"))]
+    response = client.post("/photos/batch", files=files, data=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not (tmp_path / "static").exists()
+
+    monkeypatch.setattr(services, "PHOTO_BATCH_MAX_FILES", 2)
+    response = client.post("/photos/batch", files=_batch_files(3), data=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.post("/photos/batch", files=_batch_files(1), data={"related_type": "defect", "related_id": "999999"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import profiling
+from app.main import app
+from app.profiling import QueryProfilingMiddleware, assert_max_queries, get_statement_shape, profile_queries
+from app.vendor.models import Vendor
+from app.tests.conftest import engine
+
+def test_statement_shape_normalizes_in_lists():
+    first = get_statement_shape("SELECT *\n  FROM vendors WHERE vendor_id IN (?, ?, ?)")
+    second = get_statement_shape("SELECT * FROM vendors WHERE vendor_id IN (?)")
+    assert first == second == "SELECT * FROM vendors WHERE vendor_id IN (?)"
+
+def test_profile_queries_records_current_context(db):
+    with profile_queries() as profile:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT 2"))
+    db.execute(text("SELECT 3"))
+    
+    assert list(profile) == ["SELECT 1", "SELECT 2"]
+    assert profile.total_time >= 0
+
+def test_repeated_statements_flag_n_plus_one(db, test_vendor, test_project):
+    with profile_queries() as profile:
+        for _ in range(5):
+            db.execute(text("SELECT * FROM vendors WHERE vendor_id = :id"), {"id": test_vendor.vendor_id})
+        db.execute(text("SELECT * FROM projects"))
+    
+    repeated = profile.repeated_statements(threshold=5)
+    assert list(repeated.values()) == [5]
+    assert "FROM vendors" in next(iter(repeated))
+
+def test_assert_max_queries(db):
+    with assert_max_queries(1, bind=engine):
+        db.query(Vendor).all()
+    
+    with pytest.raises(AssertionError, match="at most 1 queries, 2 were executed"):
+        with assert_max_queries(1, bind=engine):
+            db.query(Vendor).all()
+            db.query(Vendor).all()
+
+def test_slow_statements_are_logged(db, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "SQL_SLOW_QUERY_MS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        with profile_queries():
+            db.execute(text("SELECT :value"), {"value": 42})
+    
+    assert "Slow SQL" in caplog.text
+    assert "42" in caplog.text
+
+def test_profiling_middleware_headers(client, test_vendor):
+    profiled_client = TestClient(QueryProfilingMiddleware(app, repeated_threshold=2))
+    
+    response = profiled_client.get(f"/vendors/{test_vendor.vendor_id}")
+    
+    assert response.status_code == 200
+    assert int(response.headers["x-db-query-count"]) >= 1
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert response.headers["x-db-repeated-queries"] == "0"
@@ -198,3 +198,27 @@ def test_api_delete_project(client, test_project):
     # Check project no longer exists
     get_response = client.get(f"/projects/{test_project.project_id}")
     assert get_response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_project_with_counts(db, test_project, test_base_map, test_defect, test_permission, query_counter):
+    project_id = test_project.project_id
+    query_counter.clear()
+
+    project_data = crud.get_project_with_counts(db, project_id)
+
+    # 三種數量在同一個查詢中取得
+    assert len(query_counter) == 1
+    assert project_data["base_map_count"] == 1
+    assert project_data["defect_count"] == 1
+    assert project_data["user_count"] == 1
+
+def test_api_read_project_with_counts(client, test_project, test_defect):
+    response = client.get(f"/projects/{test_project.project_id}/with-counts")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["unique_code"] == test_project.unique_code
+    assert data["defect_count"] == 1
+    assert data["base_map_count"] == 0
+
+def test_api_read_project_with_counts_not_found(client):
+    response = client.get("/projects/999/with-counts")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,148 @@
+import io
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.job.models import Job
+from app.job.worker import process_next_job
+from app.report import crud, renderer
+from app.report.models import ProjectReport
+
+def _image(size, color, image_format):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format=image_format)
+    buffer.seek(0)
+    return buffer
+
+@pytest.fixture
+def report_files(db, local_storage, test_base_map, test_defect_mark, test_photo):
+    test_base_map.file_path = "static/base_map/map.png"
+    test_photo.image_url = "/static/photos/defect/p.jpg"
+    db.commit()
+    local_storage.save("static/base_map/map.png", _image((800, 600), "white", "PNG"))
+    local_storage.save("static/photos/defect/p.jpg", _image((400, 300), "red", "JPEG"))
+    return local_storage
+
+@pytest.fixture
+def reportlab():
+    return pytest.importorskip("reportlab")
+
+def test_report_data(db, report_files, test_project, test_defect, test_vendor, query_counter):
+    version = crud.get_report_version(db, test_project.project_id)
+    query_counter.clear()
+    data = crud.get_report_data(db, test_project.project_id, None, version)
+    # 專案、缺失、照片、標記各一次查詢
+    assert len(list(query_counter)) == 4
+    assert data["version"] == version
+    assert data["stats"]["total_count"] == 1
+    defect = data["defects"][0]
+    assert defect["photos"] == ["/static/photos/defect/p.jpg"]
+    assert defect["marks"][0]["file_path"] == "static/base_map/map.png"
+    assert defect["marks"][0]["coordinate_x"] == 100.0
+
+    vendor_data = crud.get_report_data(db, test_project.project_id, test_vendor.vendor_id, version)
+    assert vendor_data["vendor_name"] == test_vendor.vendor_name
+    assert len(vendor_data["defects"]) == 1
+    assert crud.get_report_data(db, test_project.project_id, 999999, version) is None
+
+def test_report_version_follows_photos(db, test_project, test_photo):
+    version = crud.get_report_version(db, test_project.project_id)
+    assert crud.get_report_version(db, test_project.project_id) == version
+    test_photo.description = "changed"
+    db.commit()
+    assert crud.get_report_version(db, test_project.project_id) != version
+    assert crud.get_report_version(db, 999999) is None
+
+def test_crop_marked_base_map():
+    base_map = Image.new("RGB", (1000, 800), color="white")
+    crop = renderer.crop_marked_base_map(base_map, 980, 10, size=200)
+    # 靠邊時裁切框內移，大小不變，標記畫在對應位置
+    assert crop.size == (200, 200)
+    assert crop.getpixel((180 + 6, 10)) == (220, 0, 0)
+
+def test_marked_map_images_load_each_map_once(reportlab, local_storage, monkeypatch):
+    local_storage.save("static/base_map/a.png", _image((800, 600), "white", "PNG"))
+    local_storage.save("static/base_map/b.png", _image((800, 600), "white", "PNG"))
+    loaded = []
+    load_image = renderer._load_image
+    monkeypatch.setattr(renderer, "_load_image", lambda storage, path: loaded.append(path) or load_image(storage, path))
+    mark = {"coordinate_x": 100.0, "coordinate_y": 100.0}
+    defects = [
+        {"defect_id": 1, "marks": [{**mark, "file_path": "static/base_map/a.png"}, {**mark, "file_path": "static/base_map/b.png"}]},
+        {"defect_id": 2, "marks": [{**mark, "file_path": "static/base_map/a.png"}, {**mark, "file_path": "static/base_map/missing.png"}]}
+    ]
+    images = renderer._marked_map_images(defects, local_storage)
+    assert sorted(loaded) == ["static/base_map/a.png", "static/base_map/b.png", "static/base_map/missing.png"]
+    # 找不到的底圖略過，其餘標記各一張裁切圖
+    assert sorted(images) == [(1, 0), (1, 1), (2, 0)]
+
+def test_report_rendered_in_background_and_cached(client, db, reportlab, report_files, test_project, test_defect):
+    url = f"/projects/{test_project.project_id}/report.pdf"
+    response = client.get(url)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    # 產生中重複請求共用同一個工作
+    assert client.get(url).json()["job_id"] == job_id
+
+    assert process_next_job(db, "worker-1") is True
+    assert db.query(Job).filter(Job.job_id == job_id).first().status == "succeeded"
+
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # 資料異動後重新產生，並移除舊版本的檔案
+    old_key = db.query(ProjectReport).one().file_key
+    test_defect.status = "改善中"
+    db.commit()
+    assert client.get(url).status_code == status.HTTP_202_ACCEPTED
+    assert process_next_job(db, "worker-1") is True
+    assert client.get(url).status_code == status.HTTP_200_OK
+    report = db.query(ProjectReport).one()
+    assert report.file_key != old_key
+    assert not report_files.exists(old_key)
+
+def test_vendor_report(client, db, reportlab, report_files, test_project, test_vendor):
+    url = f"/projects/{test_project.project_id}/report.pdf"
+    assert client.get(url, params={"vendor_id": 999999}).status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/projects/999999/report.pdf").status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.get(url, params={"vendor_id": test_vendor.vendor_id})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    process_next_job(db, "worker-1")
+    response = client.get(url, params={"vendor_id": test_vendor.vendor_id})
+    assert response.status_code == status.HTTP_200_OK
+    assert f"vendor_{test_vendor.vendor_id}" in response.headers["content-disposition"]
+    # 專案報告與廠商報告分開保存
+    assert client.get(url).status_code == status.HTTP_202_ACCEPTED
+
+def test_report_served_from_storage(client, db, reportlab, report_files, test_project):
+    from app.storage.backends import set_storage
+    from app.tests.test_storage_backends import MemoryStorage
+
+    url = f"/projects/{test_project.project_id}/report.pdf"
+    client.get(url)
+    process_next_job(db, "worker-1")
+    file_key = db.query(ProjectReport).one().file_key
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert "attachment" in response.headers["content-disposition"]
+
+    # 遠端儲存時轉址到儲存端，不經由 API 讀取整份 PDF
+    remote = MemoryStorage()
+    with report_files.open(file_key) as f:
+        remote.files[file_key] = f.read()
+    set_storage(remote)
+    response = client.get(url, follow_redirects=False)
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert response.headers["location"] == f"https://bucket.test/{file_key}"
+
+    # 檔案已不在儲存端時重新產生
+    remote.files.clear()
+    assert client.get(url).status_code == status.HTTP_202_ACCEPTED
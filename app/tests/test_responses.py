@@ -0,0 +1,126 @@
+import itertools
+import json
+from datetime import datetime, timezone
+from typing import Union
+
+import pytest
+from fastapi import status
+from pydantic import TypeAdapter
+
+from app import responses
+from app.defect import crud as defect_crud, schemas as defect_schemas
+from app.permission import crud as permission_crud, schemas as permission_schemas
+
+def test_dumps_matches_fastapi_encoding():
+    content = {
+        "name": "缺失",
+        "naive": datetime(2025, 1, 2, 3, 4, 5, 123456),
+        "aware": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "ratio": 0.5,
+        "empty": None
+    }
+    encoded = responses.dumps(content)
+    assert "缺失".encode("utf-8") in encoded
+    assert json.loads(encoded) == {
+        "name": "缺失",
+        "naive": "2025-01-02T03:04:05.123456",
+        "aware": "2025-01-02T03:04:05Z",
+        "ratio": 0.5,
+        "empty": None
+    }
+
+def test_trusted_response_fills_defaults_and_drops_unknown_keys():
+    content = {
+        "permission_id": 1,
+        "project_id": 2,
+        "user_email": "a@example.com",
+        "user_role": "管理員",
+        "project_name": "P",
+        "internal": "not in schema"
+    }
+    response = responses.trusted_response(content, permission_schemas.PermissionWithDetailsOut)
+    body = json.loads(response.body)
+    assert "internal" not in body
+    assert body["avatar_path"] == "static/avatar/default.png"
+    assert body == responses.validated_content(content, permission_schemas.PermissionWithDetailsOut)
+
+def test_trusted_response_validation_catches_schema_drift():
+    with pytest.raises(Exception):
+        responses.trusted_response(
+            [{"permission_id": "x"}], permission_schemas.PermissionWithDetailsOut, validate=True
+        )
+    # 關閉驗證時不檢查內容
+    response = responses.trusted_response(
+        [{"permission_id": "x"}], permission_schemas.PermissionWithDetailsOut, validate=False
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+def test_defect_list_matches_response_model(client, db, test_defect, test_improvement):
+    response = client.get("/defects/")
+    assert response.status_code == status.HTTP_200_OK
+    expected = responses.validated_content(
+        defect_crud.get_defects_with_details(db), defect_schemas.DefectDetailOut
+    )
+    assert response.json() == expected
+
+@pytest.mark.parametrize("flags", list(itertools.product([False, True], repeat=4)))
+def test_defect_detail_matches_response_model(
+    client, db, test_defect, test_defect_mark, test_photo, test_improvement, flags
+):
+    with_marks, with_photos, with_improvements, with_full_related = flags
+    response = client.get(
+        f"/defects/{test_defect.defect_id}",
+        params={
+            "with_marks": with_marks,
+            "with_photos": with_photos,
+            "with_improvements": with_improvements,
+            "with_full_related": with_full_related
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+    details = defect_crud.get_defect_details(
+        db, test_defect.defect_id, with_marks, with_photos, with_improvements, with_full_related
+    )
+    # 與原本 Union response model 挑選出的 schema 輸出相同
+    models = (
+        defect_schemas.DefectDetailOut,
+        defect_schemas.DefectWithMarksAndPhotosOut,
+        defect_schemas.DefectFullDetailOut
+    )
+    adapter = TypeAdapter(Union[models])
+    expected = adapter.dump_python(adapter.validate_python(details), mode="json")
+    assert response.json() == expected
+
+def test_defect_full_matches_response_model(client, db, test_defect, test_defect_mark, test_photo):
+    response = client.get(f"/defects/{test_defect.defect_id}/full")
+    assert response.status_code == status.HTTP_200_OK
+    details = defect_crud.get_defect_details(db, test_defect.defect_id, True, True, True, True)
+    assert response.json() == responses.validated_content(details, defect_schemas.DefectFullDetailOut)
+
+def test_permission_list_matches_response_model(client, db, test_permission):
+    response = client.get("/permissions/")
+    assert response.status_code == status.HTTP_200_OK
+    expected = responses.validated_content(
+        permission_crud.get_permissions_with_details(db), permission_schemas.PermissionWithDetailsOut
+    )
+    assert response.json() == expected
+
+def test_etag_matches():
+    assert responses.etag_matches('W/"abc"', 'W/"abc"')
+    assert responses.etag_matches('"x", "abc"', 'W/"abc"')
+    assert responses.etag_matches("*", '"abc"')
+    assert not responses.etag_matches('"abd"', '"abc"')
+    assert not responses.etag_matches(None, '"abc"')
+
+def test_parse_range():
+    assert responses.parse_range("bytes=0-9", 100) == (0, 9)
+    assert responses.parse_range("bytes=90-", 100) == (90, 99)
+    assert responses.parse_range("bytes=-10", 100) == (90, 99)
+    assert responses.parse_range("bytes=50-500", 100) == (50, 99)
+    # 無法處理或格式錯誤的範圍改回傳完整內容
+    assert responses.parse_range(None, 100) is None
+    assert responses.parse_range("bytes=0-1,5-6", 100) is None
+    assert responses.parse_range("items=0-1", 100) is None
+    assert responses.parse_range("bytes=9-1", 100) is None
+    with pytest.raises(responses.RangeNotSatisfiable):
+        responses.parse_range("bytes=100-", 100)
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.defect.models import Defect
+from app.trend.models import DefectDailyRollup
+from app.photo.models import Photo
+from app.seed import seed_database
+
+AS_OF = datetime(2025, 6, 30)
+
+def _seed(connection, **kwargs):
+    options = dict(
+        projects=2, users=6, base_maps_per_project=2, vendors_per_project=3,
+        categories_per_project=2, defects=120, seed=7, as_of=AS_OF, batch_size=50
+    )
+    options.update(kwargs)
+    return seed_database(connection, **options)
+
+def _defect_rows(connection):
+    return connection.execute(
+        select(Defect.project_id, Defect.status, Defect.unique_code, Defect.previous_defect_id, Defect.created_at)
+        .order_by(Defect.defect_id)
+    ).all()
+
+def test_seed_database_counts(db):
+    connection = db.connection()
+    
+    counts = _seed(connection)
+    
+    assert counts["projects"] == 2
+    assert counts["users"] == 6
+    assert counts["defects"] == 120
+    assert connection.execute(select(func.count()).select_from(Defect)).scalar() == 120
+    assert counts["photos"] >= 240
+    assert counts["improvements"] >= counts["confirmations"] > 0
+    # 退件缺失被重新開單，形成 previous_defect_id 串鏈
+    chained = connection.execute(select(func.count()).where(Defect.previous_defect_id.isnot(None))).scalar()
+    assert chained > 0
+    assert connection.execute(select(func.max(Defect.created_at))).scalar() <= AS_OF
+
+def test_seed_database_is_deterministic(db):
+    connection = db.connection()
+    
+    savepoint = connection.begin_nested()
+    _seed(connection)
+    first = _defect_rows(connection)
+    savepoint.rollback()
+    
+    savepoint = connection.begin_nested()
+    _seed(connection)
+    second = _defect_rows(connection)
+    savepoint.rollback()
+    
+    assert first == second
+    assert len(first) == 120
+
+def test_seed_database_appends_after_existing_rows(db, test_defect):
+    existing_id = test_defect.defect_id
+    connection = db.connection()
+    
+    _seed(connection, defects=10, photos_per_defect=1)
+    
+    assert connection.execute(select(func.min(Defect.defect_id)).where(Defect.defect_id != existing_id)).scalar() > existing_id
+    assert connection.execute(select(func.count()).select_from(Photo).where(Photo.related_type == "defect")).scalar() == 10
+
+def test_seed_database_rebuilds_rollup(db):
+    connection = db.connection()
+
+    counts = _seed(connection)
+
+    assert counts["defect_daily_rollup"] > 0
+    opened, backlog = connection.execute(
+        select(func.sum(DefectDailyRollup.opened), func.sum(DefectDailyRollup.backlog_delta))
+    ).one()
+    open_defects = connection.execute(
+        select(func.count()).where(Defect.status.notin_(("已完成", "退件")))
+    ).scalar()
+    # Core 寫入的缺失也都計入彙總，未結案數與實際資料一致
+    assert (opened, backlog) == (120, open_defects)
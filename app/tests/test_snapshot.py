@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from fastapi import status
+
+from app.defect import crud as defect_crud
+from app.project.models import Project
+from app.snapshot import crud
+from app.sync import crud as sync_crud
+from app.vendor import crud as vendor_crud
+
+def test_summarize_defect_stats_matches_stats_query(db, test_project, test_defect):
+    defects = defect_crud.get_defects_with_details(db, limit=None, project_id=test_project.project_id)
+    assert defect_crud.summarize_defect_stats(defects) == defect_crud.get_defect_stats(db, project_id=test_project.project_id)
+
+def test_snapshot_version_changes_with_project_data(db, test_project, test_defect, test_vendor, test_user):
+    version = crud.get_snapshot_version(db, test_project.project_id)
+    assert version == crud.get_snapshot_version(db, test_project.project_id)
+
+    test_defect.status = "改善中"
+    db.commit()
+    after_defect = crud.get_snapshot_version(db, test_project.project_id)
+    assert after_defect != version
+
+    test_user.name = "Renamed"
+    db.commit()
+    after_user = crud.get_snapshot_version(db, test_project.project_id)
+    assert after_user != after_defect
+
+    vendor_crud.delete_vendor(db, test_vendor.vendor_id)
+    assert crud.get_snapshot_version(db, test_project.project_id) != after_user
+    assert crud.get_snapshot_version(db, 999999) is None
+
+def test_snapshot_uses_fixed_number_of_queries(db, test_project, test_permission, test_base_map, test_defect, query_counter):
+    version = crud.get_snapshot_version(db, test_project.project_id)
+    query_counter.clear()
+    crud.get_snapshot_body(db, test_project.project_id, version)
+    built = len(query_counter)
+    assert built <= 7
+
+    query_counter.clear()
+    crud.get_snapshot_body(db, test_project.project_id, version)
+    # 同一版本直接使用快取
+    assert len(query_counter) == 0
+
+def test_snapshot_cache_keeps_latest_version_per_project(db, test_project, test_defect):
+    version = crud.get_snapshot_version(db, test_project.project_id)
+    crud.get_snapshot_body(db, test_project.project_id, version)
+    test_defect.status = "改善中"
+    db.commit()
+    new_version = crud.get_snapshot_version(db, test_project.project_id)
+    body = crud.get_snapshot_body(db, test_project.project_id, new_version)
+    # 舊版本的快照被取代，不會佔用快取
+    assert crud._snapshot_cache.get(test_project.project_id) == (new_version, body)
+    assert len(crud._snapshot_cache._data) == 1
+
+def test_api_snapshot(client, test_project, test_permission, test_base_map, test_defect):
+    response = client.get(f"/projects/{test_project.project_id}/snapshot")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["project"]["project_id"] == test_project.project_id
+    assert [b["base_map_id"] for b in data["base_maps"]] == [test_base_map.base_map_id]
+    assert len(data["vendors"]) == 1
+    assert len(data["defect_categories"]) == 1
+    assert data["permissions"][0]["user_name"] == "Test User"
+    assert data["defects"][0]["defect_id"] == test_defect.defect_id
+    assert data["defect_stats"]["total_count"] == 1
+    assert response.headers["etag"] == f'W/"{data["version"]}"'
+
+    # 與個別端點的回應一致
+    assert data["defects"] == client.get("/defects/", params={"project_id": test_project.project_id}).json()
+    assert data["defect_stats"] == client.get("/defects/stats", params={"project_id": test_project.project_id}).json()
+
+def test_api_snapshot_not_modified(client, db, test_project, test_defect):
+    response = client.get(f"/projects/{test_project.project_id}/snapshot")
+    etag = response.headers["etag"]
+
+    response = client.get(f"/projects/{test_project.project_id}/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    test_defect.status = "改善中"
+    db.commit()
+    response = client.get(f"/projects/{test_project.project_id}/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.json()["defects"][0]["status"] == "改善中"
+
+def test_api_snapshot_project_not_found(client):
+    response = client.get("/projects/999999/snapshot")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_snapshot_version_changes_when_rows_move_project(db, test_project, test_vendor, monkeypatch):
+    monkeypatch.setattr(sync_crud, "SYNC_OVERLAP_SECONDS", 0)
+    other = Project(project_name="Other Project")
+    db.add(other)
+    db.commit()
+    since = datetime.utcnow() - timedelta(seconds=1)
+    version = crud.get_snapshot_version(db, test_project.project_id)
+    other_version = crud.get_snapshot_version(db, other.project_id)
+
+    # 移到其他專案的廠商在原專案視為刪除
+    test_vendor.project_id = other.project_id
+    db.commit()
+    assert crud.get_snapshot_version(db, test_project.project_id) != version
+    assert crud.get_snapshot_version(db, other.project_id) != other_version
+    assert sync_crud.get_changes(db, test_project.project_id, since=since)["deleted"] == {"vendors": [test_vendor.vendor_id]}
+    changes = sync_crud.get_changes(db, other.project_id, since=since)
+    assert [row["vendor_id"] for row in changes["changes"]["vendors"]] == [test_vendor.vendor_id]
+    assert changes["deleted"] == {}
+
+    # 移回原專案時不再回報為已刪除
+    test_vendor.project_id = test_project.project_id
+    db.commit()
+    assert sync_crud.get_changes(db, test_project.project_id, since=since)["deleted"] == {}
+    assert sync_crud.get_changes(db, other.project_id, since=since)["deleted"] == {"vendors": [test_vendor.vendor_id]}
@@ -0,0 +1,162 @@
+import io
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.storage.backends import (
+    DEFAULT_IMAGE_KEYS, LocalStorage, StorageBackend, StorageError, set_storage, storage_key, upload_default_images
+)
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 30), color="blue").save(buffer, format="JPEG")
+    buffer.seek(0)
+    return buffer
+
+class DirectUploadStorage(LocalStorage):
+    """本機儲存加上假的預簽上傳網址，測試直傳流程"""
+
+    supports_presigned_upload = True
+
+    def presigned_upload(self, key, content_type):
+        return {"upload_url": f"https://bucket.test/{key}", "method": "PUT",
+                "headers": {"Content-Type": content_type}, "expires_in": 60}
+
+@pytest.fixture
+def direct_storage(tmp_path):
+    storage = DirectUploadStorage(str(tmp_path))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+def test_local_storage_roundtrip(local_storage, tmp_path):
+    key = storage_key("/static/photos/defect/a.jpg")
+    assert key == "static/photos/defect/a.jpg"
+    assert not local_storage.exists(key)
+
+    local_storage.save(key, io.BytesIO(b"data"))
+    assert (tmp_path / key).read_bytes() == b"data"
+    assert local_storage.exists(key)
+    with local_storage.open(key) as f:
+        assert f.read() == b"data"
+    assert local_storage.url(key, "http://api/") == "http://api/static/photos/defect/a.jpg"
+    # 寫入時使用的暫存檔不會留下
+    assert [p.name for p in (tmp_path / "static/photos/defect").iterdir()] == ["a.jpg"]
+
+    local_storage.delete(key)
+    local_storage.delete(key)
+    assert not local_storage.exists(key)
+
+def test_local_storage_rejects_escaping_keys_and_direct_uploads(local_storage):
+    with pytest.raises(StorageError):
+        local_storage.save("static/../../etc/passwd", io.BytesIO(b"x"))
+    with pytest.raises(StorageError):
+        local_storage.presigned_upload("static/a.jpg", "image/jpeg")
+
+def test_upload_url_requires_direct_upload_backend(client, test_defect, local_storage):
+    response = client.post("/photos/upload-url", json={
+        "related_type": "defect", "related_id": test_defect.defect_id, "filename": "a.jpg"
+    })
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_direct_upload_and_confirm(client, db, test_defect, direct_storage):
+    from app.job.models import Job
+
+    response = client.post("/photos/upload-url", json={
+        "related_type": "defect", "related_id": test_defect.defect_id, "filename": "a.JPG"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    upload = response.json()
+    assert upload["image_url"].startswith(f"/static/photos/defect/defect_{test_defect.defect_id}_")
+    assert upload["image_url"].endswith(".jpg")
+    assert upload["method"] == "PUT"
+    assert upload["upload_url"] == "https://bucket.test/" + upload["image_url"].lstrip("/")
+
+    confirm = {"related_type": "defect", "related_id": test_defect.defect_id, "image_urls": [upload["image_url"]]}
+    # 檔案還沒上傳
+    assert client.post("/photos/confirm", json=confirm).status_code == status.HTTP_400_BAD_REQUEST
+
+    # 客戶端直接上傳到儲存端
+    direct_storage.save(storage_key(upload["image_url"]), _jpeg())
+    response = client.post("/photos/confirm", json={**confirm, "description": "direct"})
+    assert response.status_code == status.HTTP_201_CREATED
+    photos = response.json()
+    assert [p["image_url"] for p in photos] == [upload["image_url"]]
+    assert photos[0]["description"] == "direct"
+    assert photos[0]["full_url"] == "http://testserver" + upload["image_url"]
+    assert db.query(Job).filter(Job.job_type == "photo.thumbnail").count() == 1
+
+def test_confirm_rejects_foreign_urls(client, test_defect, direct_storage):
+    direct_storage.save("static/avatar/user_1.png", _jpeg())
+    for image_url in (
+        "/static/avatar/user_1.png",
+        f"/static/photos/defect/defect_{test_defect.defect_id + 1}_x.jpg",
+        f"/static/photos/defect/defect_{test_defect.defect_id}_/../../../avatar/user_1.png",
+        f"/static/photos/defect/defect_{test_defect.defect_id}_x.txt"
+    ):
+        response = client.post("/photos/confirm", json={
+            "related_type": "defect", "related_id": test_defect.defect_id, "image_urls": [image_url]
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, image_url
+
+def test_s3_storage_presigned_urls():
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    from app.storage.backends import S3Storage
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="photos")
+        storage = S3Storage("photos", prefix="dev/", client=client, expires=120)
+
+        storage.save("static/photos/defect/a.jpg", io.BytesIO(b"data"))
+        assert storage.exists("static/photos/defect/a.jpg")
+        assert not storage.exists("static/photos/defect/b.jpg")
+        assert storage.open("static/photos/defect/a.jpg").read() == b"data"
+        assert client.head_object(Bucket="photos", Key="dev/static/photos/defect/a.jpg")["ContentType"] == "image/jpeg"
+
+        assert "dev/static/photos/defect/a.jpg" in storage.url("static/photos/defect/a.jpg", "http://api")
+        upload = storage.presigned_upload("static/photos/defect/b.jpg", "image/jpeg")
+        assert upload["method"] == "PUT" and upload["expires_in"] == 120
+        assert "dev/static/photos/defect/b.jpg" in upload["upload_url"]
+
+        storage.delete("static/photos/defect/a.jpg")
+        assert not storage.exists("static/photos/defect/a.jpg")
+
+    public = S3Storage("photos", client=object(), public_base_url="https://cdn.test/")
+    assert public.url("static/a.jpg", "http://api") == "https://cdn.test/static/a.jpg"
+
+class MemoryStorage(StorageBackend):
+    """遠端儲存的替身，內容放在記憶體"""
+
+    def __init__(self):
+        self.files = {}
+
+    def save(self, key, source, content_type=None):
+        self.files[key] = source.read()
+
+    def open(self, key):
+        return io.BytesIO(self.files[key])
+
+    def delete(self, key):
+        self.files.pop(key, None)
+
+    def exists(self, key):
+        return key in self.files
+
+    def url(self, key, base_url):
+        return f"https://bucket.test/{key}"
+
+def test_upload_default_images(tmp_path, local_storage):
+    for key in DEFAULT_IMAGE_KEYS[:2]:
+        (tmp_path / key).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / key).write_bytes(b"default")
+    remote = MemoryStorage()
+    remote.files[DEFAULT_IMAGE_KEYS[1]] = b"customized"
+
+    # 只上傳遠端沒有的；已存在的不覆蓋，本機沒有的略過
+    assert upload_default_images(remote, root=str(tmp_path)) == [DEFAULT_IMAGE_KEYS[0]]
+    assert remote.files == {DEFAULT_IMAGE_KEYS[0]: b"default", DEFAULT_IMAGE_KEYS[1]: b"customized"}
+    assert upload_default_images(remote, root=str(tmp_path)) == []
+    assert upload_default_images(local_storage, root=str(tmp_path)) == []
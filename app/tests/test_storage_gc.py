@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+from app.base_map.models import BaseMap
+from app.defect import crud as defect_crud
+from app.defect.models import Defect
+from app.job.handlers import get_handler, get_periodic_job_types
+from app.photo.models import Photo
+from app.storage import gc, jobs
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(gc, "quarantine_root", str(tmp_path / "quarantine"))
+    root = tmp_path / "root"
+
+    def write(path, data=b"x", age_hours=48):
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        stamp = time.time() - age_hours * 3600
+        os.utime(target, (stamp, stamp))
+
+    write.root = str(root)
+    return write
+
+@pytest.fixture
+def referenced_files(db, storage, test_project, test_defect, test_user):
+    db.add_all([
+        Photo(related_type="defect", related_id=test_defect.defect_id, image_url="/static/photos/defect/kept.jpg"),
+        Photo(related_type="defect", related_id=test_defect.defect_id, image_url="/static/photos/defect/gone.jpg"),
+        BaseMap(project_id=test_project.project_id, map_name="m", file_path="static/base_map/map.png")
+    ])
+    test_user.avatar_path = "static/avatar/user_1.png"
+    db.commit()
+    storage("static/photos/defect/kept.jpg")
+    storage("static/photos/defect/thumbs/kept.jpg")
+    storage("static/photos/defect/orphan.jpg", b"12345")
+    storage("static/photos/defect/thumbs/orphan.jpg", b"12")
+    storage("static/photos/defect-old/orphan.jpg")
+    storage("static/photos/improvement/fresh.jpg", age_hours=1)
+    storage("static/base_map/map.png")
+    storage("static/avatar/user_1.png")
+    storage("static/avatar/default.png")
+    storage("static/project/default.png")
+    # 不在檢查範圍內的目錄
+    storage("static/other/file.txt")
+    return storage
+
+def test_walk_is_sorted_by_path(storage):
+    for path in ("static/photos/a-b.jpg", "static/photos/a/b.jpg", "static/photos/a.jpg", "static/avatar/z.png"):
+        storage(path)
+    paths = [path for path, _ in gc.iter_stored_files(storage.root)]
+    assert paths == sorted(paths)
+    assert len(paths) == 4
+
+def test_iter_orphans_merge_join():
+    files = [(name, os.stat(__file__)) for name in ("static/photos/a", "static/photos/b", "static/photos/d")]
+    references = ["static/photos/b", "static/photos/b", "static/photos/c", "static/zzz/other"]
+    result = [(path, stat is None) for path, stat in gc.iter_orphans(files, references)]
+    assert result == [("static/photos/a", False), ("static/photos/c", True), ("static/photos/d", False)]
+
+def test_dry_run_reports_without_touching_files(db, referenced_files):
+    report = gc.collect_garbage(db, root=referenced_files.root)
+    assert report["mode"] == "dry-run"
+    assert report["sample_orphans"] == [
+        "static/photos/defect-old/orphan.jpg",
+        "static/photos/defect/orphan.jpg",
+        "static/photos/defect/thumbs/orphan.jpg"
+    ]
+    assert report["orphans"] == 3
+    assert report["orphan_bytes"] == 1 + 5 + 2
+    assert report["skipped_recent"] == 1
+    assert report["sample_missing_files"] == ["static/photos/defect/gone.jpg"]
+    assert report["scanned"] == 10
+    assert os.path.exists(os.path.join(referenced_files.root, "static/photos/defect/orphan.jpg"))
+
+def test_quarantine_moves_orphans(db, referenced_files):
+    report = gc.collect_garbage(db, mode="quarantine", root=referenced_files.root)
+    assert report["orphans"] == 3
+    assert not os.path.exists(os.path.join(referenced_files.root, "static/photos/defect/orphan.jpg"))
+    assert os.path.exists(os.path.join(report["quarantine_dir"], "static/photos/defect/orphan.jpg"))
+    assert os.path.exists(os.path.join(referenced_files.root, "static/photos/defect/kept.jpg"))
+    assert os.path.exists(os.path.join(referenced_files.root, "static/avatar/default.png"))
+
+def test_photos_of_deleted_defects_are_orphans(db, storage, test_project, test_user):
+    defect = Defect(project_id=test_project.project_id, submitted_id=test_user.user_id, status="等待中")
+    db.add(defect)
+    db.flush()
+    db.add(Photo(related_type="defect", related_id=defect.defect_id, image_url="/static/photos/defect/deleted.jpg"))
+    db.commit()
+    storage("static/photos/defect/deleted.jpg", b"123")
+    storage("static/photos/defect/thumbs/deleted.jpg")
+    assert gc.collect_garbage(db, root=storage.root)["orphans"] == 0
+
+    # 刪除缺失後照片資料列仍在，但檔案已無人使用
+    assert defect_crud.delete_defect(db, defect.defect_id) is True
+    report = gc.collect_garbage(db, root=storage.root)
+    assert report["sample_orphans"] == ["static/photos/defect/deleted.jpg", "static/photos/defect/thumbs/deleted.jpg"]
+    assert report["orphan_bytes"] == 4
+
+def test_delete_removes_orphans(db, referenced_files):
+    gc.collect_garbage(db, mode="delete", root=referenced_files.root)
+    remaining = [path for path, _ in gc.iter_stored_files(referenced_files.root)]
+    assert remaining == [
+        "static/avatar/default.png",
+        "static/avatar/user_1.png",
+        "static/base_map/map.png",
+        "static/photos/defect/kept.jpg",
+        "static/photos/defect/thumbs/kept.jpg",
+        "static/photos/improvement/fresh.jpg",
+        "static/project/default.png"
+    ]
+    with pytest.raises(ValueError):
+        gc.collect_garbage(db, mode="purge", root=referenced_files.root)
+
+def test_unsorted_references_abort(db, monkeypatch, referenced_files):
+    # 定序與 Python 字串順序不同時寧可中止，避免誤刪
+    monkeypatch.setattr(gc, "_byte_order", lambda column, dialect_name: column.desc())
+    with pytest.raises(gc.UnsortedReferencesError):
+        gc.collect_garbage(db, mode="delete", root=referenced_files.root)
+    assert os.path.exists(os.path.join(referenced_files.root, "static/photos/defect/orphan.jpg"))
+
+def test_gc_job_is_periodic(db, monkeypatch, referenced_files):
+    monkeypatch.setattr(gc, "project_root", referenced_files.root)
+    assert jobs.STORAGE_GC_JOB_TYPE in get_periodic_job_types()
+    result = get_handler(jobs.STORAGE_GC_JOB_TYPE)(db, {})
+    assert result["mode"] == "dry-run"
+    assert result["orphans"] == 3
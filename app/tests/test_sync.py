@@ -0,0 +1,256 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, delete, inspect, update
+
+from app.database import add_missing_columns
+from app.defect.models import Defect
+from app.defect_mark.models import DefectMark
+from app.improvement.models import Improvement
+from app.job import crud as job_crud
+from app.job.handlers import get_handler, get_periodic_job_types
+from app.job.models import Job
+from app.photo.models import Photo
+from app.sync import crud, jobs
+from app.sync.models import Tombstone
+from app.vendor.models import Vendor
+
+@pytest.fixture
+def synced_rows(db, test_defect, test_defect_mark, test_photo, test_improvement, test_confirmation):
+    return {
+        "defect": test_defect,
+        "defect_mark": test_defect_mark,
+        "photo": test_photo,
+        "improvement": test_improvement,
+        "confirmation": test_confirmation
+    }
+
+def _age_all_rows(db, when):
+    for model in crud.SYNCED_MODELS:
+        db.execute(update(model.__table__).values(updated_at=when))
+    db.commit()
+
+def test_child_rows_get_project_id(db, test_project, synced_rows):
+    for name in ("defect_mark", "photo", "improvement", "confirmation"):
+        assert synced_rows[name].project_id == test_project.project_id, name
+
+def test_project_id_resolved_through_pending_parent(db, test_project, test_user):
+    defect = Defect(project_id=test_project.project_id, submitted_id=test_user.user_id, status="等待中")
+    improvement = Improvement(defect=defect, submitter_id=test_user.user_id, content="c")
+    db.add_all([defect, improvement])
+    db.commit()
+    assert improvement.project_id == test_project.project_id
+
+def test_updated_at_maintained(db, test_defect):
+    old = datetime(2020, 1, 1)
+    db.execute(update(Defect.__table__).where(Defect.defect_id == test_defect.defect_id).values(updated_at=old))
+    db.commit()
+    db.refresh(test_defect)
+    assert test_defect.updated_at == old
+    test_defect.status = "改善中"
+    db.commit()
+    db.refresh(test_defect)
+    assert test_defect.updated_at > old
+
+def test_sync_token_round_trip():
+    value = datetime(2025, 3, 4, 5, 6, 7, 890123)
+    assert crud.decode_sync_token(crud.encode_sync_token(value)) == value
+    with pytest.raises(crud.SyncTokenError):
+        crud.decode_sync_token("not-a-token")
+
+def test_full_sync_returns_all_project_rows(db, test_project, synced_rows):
+    result = crud.get_changes(db, test_project.project_id)
+    assert result["full"] is True
+    assert [row["project_id"] for row in result["changes"]["projects"]] == [test_project.project_id]
+    assert [row["defect_id"] for row in result["changes"]["defects"]] == [synced_rows["defect"].defect_id]
+    assert len(result["changes"]["defect_marks"]) == 1
+    assert len(result["changes"]["photos"]) == 1
+    assert len(result["changes"]["confirmations"]) == 1
+    assert result["deleted"] == {}
+
+def test_incremental_sync_returns_only_changed_rows(db, test_project, synced_rows, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 0)
+    since = datetime.utcnow() - timedelta(minutes=1)
+    _age_all_rows(db, since - timedelta(hours=1))
+
+    synced_rows["defect"].status = "改善中"
+    db.commit()
+
+    result = crud.get_changes(db, test_project.project_id, since=since)
+    assert result["full"] is False
+    assert [row["defect_id"] for row in result["changes"]["defects"]] == [synced_rows["defect"].defect_id]
+    assert result["changes"]["defects"][0]["status"] == "改善中"
+    assert all(not rows for name, rows in result["changes"].items() if name != "defects")
+
+def test_overlap_window_repeats_recent_rows(db, test_project, test_defect, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 60)
+    since = datetime.utcnow()
+    _age_all_rows(db, since - timedelta(seconds=30))
+    result = crud.get_changes(db, test_project.project_id, since=since)
+    # 在 token 之前 30 秒的異動仍在重疊區間內
+    assert len(result["changes"]["defects"]) == 1
+
+def test_deletes_recorded_as_tombstones(db, test_project, synced_rows, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 0)
+    since = datetime.utcnow() - timedelta(seconds=1)
+    photo_id = synced_rows["photo"].photo_id
+    mark_id = synced_rows["defect_mark"].defect_mark_id
+    db.delete(synced_rows["photo"])
+    db.delete(synced_rows["defect_mark"])
+    db.commit()
+
+    result = crud.get_changes(db, test_project.project_id, since=since)
+    assert result["deleted"] == {"photos": [photo_id], "defect_marks": [mark_id]}
+    tombstones = db.query(Tombstone).all()
+    assert {t.project_id for t in tombstones} == {test_project.project_id}
+
+def test_bulk_deletes_recorded_as_tombstones(db, test_project, test_vendor, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 0)
+    since = datetime.utcnow() - timedelta(seconds=1)
+    vendor_id = test_vendor.vendor_id
+    db.query(Vendor).filter(Vendor.vendor_id == vendor_id).delete(synchronize_session=False)
+    db.execute(delete(Photo).where(Photo.photo_id == -1))
+    db.commit()
+
+    result = crud.get_changes(db, test_project.project_id, since=since)
+    assert result["deleted"] == {"vendors": [vendor_id]}
+
+def test_paginated_changes(db, test_project, test_user, test_defect, monkeypatch):
+    for index in range(4):
+        db.add(Defect(project_id=test_project.project_id, submitted_id=test_user.user_id, status="等待中"))
+    db.commit()
+    full = crud.get_changes(db, test_project.project_id)
+
+    rows, after, pages = {}, None, 0
+    while True:
+        page = crud.get_changes(db, test_project.project_id, limit=2, after=after)
+        pages += 1
+        assert sum(len(r) for r in page["changes"].values()) <= 2
+        for name, page_rows in page["changes"].items():
+            rows.setdefault(name, []).extend(page_rows)
+        after = page["next_position"]
+        if after is None:
+            break
+    assert rows == full["changes"]
+    assert pages >= 3
+
+def test_expired_token_rejected(db, test_project):
+    with pytest.raises(crud.SyncTokenExpired):
+        crud.get_changes(db, test_project.project_id, since=datetime.utcnow() - timedelta(days=365))
+
+def test_prune_tombstones(db, test_project):
+    now = datetime.utcnow()
+    db.add_all([
+        Tombstone(entity="defects", entity_id=1, project_id=test_project.project_id, deleted_at=now - timedelta(days=400)),
+        Tombstone(entity="defects", entity_id=2, project_id=test_project.project_id, deleted_at=now)
+    ])
+    db.commit()
+    assert crud.prune_tombstones(db, now=now) == 1
+    assert [t.entity_id for t in db.query(Tombstone).all()] == [2]
+
+def test_prune_job_reschedules_itself(db):
+    assert jobs.PRUNE_TOMBSTONES_JOB_TYPE in get_periodic_job_types()
+    assert job_crud.ensure_job_queued(db, jobs.PRUNE_TOMBSTONES_JOB_TYPE) is True
+    assert job_crud.ensure_job_queued(db, jobs.PRUNE_TOMBSTONES_JOB_TYPE) is False
+
+    handler = get_handler(jobs.PRUNE_TOMBSTONES_JOB_TYPE)
+    assert handler(db, {}) == {"removed": 0}
+    next_run = (
+        db.query(Job)
+        .filter(Job.job_type == jobs.PRUNE_TOMBSTONES_JOB_TYPE)
+        .order_by(Job.job_id.desc())
+        .first()
+    )
+    assert next_run.run_after > datetime.utcnow() + timedelta(hours=23)
+
+def test_backfill_sync_columns(db, test_project, synced_rows):
+    created_at = synced_rows["improvement"].created_at
+    db.execute(update(Improvement.__table__).values(project_id=None, updated_at=None))
+    db.execute(update(Photo.__table__).values(project_id=None))
+    db.execute(update(DefectMark.__table__).values(project_id=None))
+    db.commit()
+
+    crud.backfill_sync_columns(db.connection())
+    db.commit()
+    db.expire_all()
+    improvement = db.get(Improvement, synced_rows["improvement"].improvement_id)
+    assert improvement.project_id == test_project.project_id
+    assert improvement.updated_at == created_at
+    assert db.get(Photo, synced_rows["photo"].photo_id).project_id == test_project.project_id
+    assert db.get(DefectMark, synced_rows["defect_mark"].defect_mark_id).project_id == test_project.project_id
+
+def test_add_missing_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old_metadata = MetaData()
+    Table("photos", old_metadata, Column("photo_id", Integer, primary_key=True), Column("image_url", String))
+    old_metadata.create_all(engine)
+
+    add_missing_columns(engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("photos")}
+    assert {"updated_at", "project_id", "description"} <= columns
+    # NOT NULL 欄位無法直接補上，略過
+    assert "related_id" not in columns
+    # 其他資料表不存在時不處理，由 create_all 建立
+    assert inspect(engine).get_table_names() == ["photos"]
+    engine.dispose()
+
+def test_api_changes_flow(client, db, test_project, test_defect, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 0)
+    response = client.get(f"/projects/{test_project.project_id}/changes")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["full"] is True
+    assert data["since"] is None
+    assert [row["defect_id"] for row in data["changes"]["defects"]] == [test_defect.defect_id]
+
+    token = data["next_token"]
+    response = client.get(f"/projects/{test_project.project_id}/changes", params={"since": token})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["full"] is False
+    assert data["since"] == token
+    assert data["changes"]["defects"] == []
+
+    response = client.delete(f"/defects/{test_defect.defect_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    data = client.get(f"/projects/{test_project.project_id}/changes", params={"since": token}).json()
+    assert data["deleted"] == {"defects": [test_defect.defect_id]}
+
+def test_api_changes_pages(client, db, test_project, test_user, test_defect, monkeypatch):
+    monkeypatch.setattr(crud, "SYNC_OVERLAP_SECONDS", 0)
+    for index in range(3):
+        db.add(Defect(project_id=test_project.project_id, submitted_id=test_user.user_id, status="等待中"))
+    db.commit()
+    url = f"/projects/{test_project.project_id}/changes"
+
+    data = client.get(url, params={"limit": 2}).json()
+    token = data["next_token"]
+    defect_ids = []
+    while True:
+        assert data["full"] is True and data["next_token"] == token
+        defect_ids += [row["defect_id"] for row in data["changes"]["defects"]]
+        if data["next_cursor"] is None:
+            break
+        data = client.get(url, params={"cursor": data["next_cursor"], "limit": 2}).json()
+    assert len(defect_ids) == 4 and len(set(defect_ids)) == 4
+
+    # 刪除紀錄也分頁回傳
+    for defect_id in defect_ids[:3]:
+        assert client.delete(f"/defects/{defect_id}").status_code == status.HTTP_204_NO_CONTENT
+    data = client.get(url, params={"since": token, "limit": 2}).json()
+    deleted = data["deleted"].get("defects", [])
+    while data["next_cursor"]:
+        data = client.get(url, params={"cursor": data["next_cursor"], "limit": 2}).json()
+        deleted += data["deleted"].get("defects", [])
+    assert sorted(deleted) == sorted(defect_ids[:3])
+    assert client.get(url, params={"cursor": "bad"}).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_api_changes_errors(client, test_project):
+    response = client.get(f"/projects/{test_project.project_id}/changes", params={"since": "abc"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    expired = crud.encode_sync_token(datetime.utcnow() - timedelta(days=365))
+    response = client.get(f"/projects/{test_project.project_id}/changes", params={"since": expired})
+    assert response.status_code == status.HTTP_410_GONE
+    response = client.get("/projects/999999/changes")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
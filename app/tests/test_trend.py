@@ -0,0 +1,144 @@
+from datetime import date, datetime, timedelta
+
+from fastapi import status
+
+from app.confirmation.models import Confirmation
+from app.defect import crud as defect_crud
+from app.defect.models import Defect
+from app.improvement.models import Improvement
+from app.trend import crud
+from app.trend.models import DefectDailyRollup
+
+def _rollup(db, project_id):
+    rows = db.query(DefectDailyRollup).filter(DefectDailyRollup.project_id == project_id)
+    return {
+        (row.vendor_id, row.day): {counter: getattr(row, counter) for counter in crud.ROLLUP_COUNTERS}
+        for row in rows
+    }
+
+def _counters(**values):
+    return {counter: values.get(counter, 0) for counter in crud.ROLLUP_COUNTERS}
+
+def _defect(db, project, vendor=None, created_at=None, status="等待中"):
+    created_at = created_at or datetime.utcnow()
+    defect = Defect(
+        project_id=project.project_id,
+        assigned_vendor_id=vendor.vendor_id if vendor else None,
+        status=status,
+        created_at=created_at,
+        updated_at=created_at
+    )
+    db.add(defect)
+    db.commit()
+    return defect
+
+def test_rollup_follows_defect_writes(db, test_project, test_vendor, test_user):
+    today = crud.rollup_day()
+    vendor_id = test_vendor.vendor_id
+    defect = _defect(db, test_project, test_vendor)
+    assert _rollup(db, test_project.project_id) == {(vendor_id, today): _counters(opened=1, backlog_delta=1)}
+
+    # 改善與確認經由缺失狀態計入
+    db.add(Improvement(defect_id=defect.defect_id, created_at=datetime.utcnow()))
+    defect.status = "待確認"
+    db.commit()
+    defect.status = "已完成"
+    db.commit()
+    assert _rollup(db, test_project.project_id)[(vendor_id, today)] == _counters(opened=1, closed=1, improvements=1)
+
+    # 重新開啟並改派給未指定廠商，未結案數移到新的組合
+    defect.status = "改善中"
+    defect.assigned_vendor_id = None
+    db.commit()
+    rollup = _rollup(db, test_project.project_id)
+    assert rollup[(0, today)] == _counters(backlog_delta=1)
+
+    assert defect_crud.delete_defect(db, defect.defect_id)
+    assert _rollup(db, test_project.project_id)[(0, today)] == _counters()
+
+def test_rollup_ignores_unchanged_and_deleted_projects(client, db, test_project, test_vendor):
+    defect = _defect(db, test_project, test_vendor)
+    defect.location = "2F"
+    db.commit()
+    assert sum(c["backlog_delta"] for c in _rollup(db, test_project.project_id).values()) == 1
+
+    assert client.delete(f"/projects/{test_project.project_id}").status_code == status.HTTP_204_NO_CONTENT
+    assert db.query(DefectDailyRollup).count() == 0
+
+def test_rebuild_matches_history(db, test_project, test_vendor):
+    created = datetime(2024, 3, 1, 9)
+    closed = _defect(db, test_project, test_vendor, created_at=created, status="已完成")
+    improvement = Improvement(defect_id=closed.defect_id, created_at=created + timedelta(days=2))
+    db.add(improvement)
+    db.flush()
+    db.add(Confirmation(improvement_id=improvement.improvement_id, status="接受", created_at=created + timedelta(days=3)))
+    _defect(db, test_project, None, created_at=created + timedelta(days=1), status="退件")
+    _defect(db, test_project, test_vendor, created_at=created + timedelta(days=1))
+    db.commit()
+
+    assert crud.rebuild_rollup(db, project_id=test_project.project_id) == 5
+    vendor_id = test_vendor.vendor_id
+    assert _rollup(db, test_project.project_id) == {
+        (vendor_id, date(2024, 3, 1)): _counters(opened=1, backlog_delta=1),
+        (vendor_id, date(2024, 3, 2)): _counters(opened=1, backlog_delta=1),
+        (vendor_id, date(2024, 3, 3)): _counters(improvements=1),
+        (vendor_id, date(2024, 3, 4)): _counters(closed=1, backlog_delta=-1),
+        (0, date(2024, 3, 2)): _counters(opened=1, rejected=1)
+    }
+
+def test_backfill_rollup_when_empty(db, test_project, test_vendor):
+    _defect(db, test_project, test_vendor, created_at=datetime(2024, 3, 1, 9))
+    db.commit()
+    # 模擬彙總表建立前就已存在的缺失
+    db.query(DefectDailyRollup).delete()
+    db.commit()
+
+    assert crud.backfill_rollup(db.connection()) == 1
+    assert _rollup(db, test_project.project_id) == {
+        (test_vendor.vendor_id, date(2024, 3, 1)): _counters(opened=1, backlog_delta=1)
+    }
+    # 已有彙總時不重複計算
+    assert crud.backfill_rollup(db.connection()) == 0
+
+def test_trends_endpoint(client, db, test_project, test_vendor):
+    project_id = test_project.project_id
+    vendor_id = test_vendor.vendor_id
+    crud.apply_rollup_deltas(db, {
+        (project_id, vendor_id, date(2024, 2, 28)): {"opened": 2, "backlog_delta": 2},
+        (project_id, vendor_id, date(2024, 3, 1)): {"opened": 1, "backlog_delta": 1},
+        (project_id, 0, date(2024, 3, 4)): {"opened": 1, "rejected": 1},
+        (project_id, vendor_id, date(2024, 3, 5)): {"closed": 2, "improvements": 2, "backlog_delta": -2}
+    })
+    db.commit()
+
+    response = client.get(f"/projects/{project_id}/trends", params={"from": "2024-03-01", "to": "2024-03-05"})
+    assert response.status_code == status.HTTP_200_OK
+    points = response.json()["points"]
+    assert [p["period_start"] for p in points] == [f"2024-03-0{d}" for d in range(1, 6)]
+    # 起始日前的未結案數也會計入
+    assert [p["backlog"] for p in points] == [3, 3, 3, 3, 1]
+    assert [p["opened"] for p in points] == [1, 0, 0, 1, 0]
+    assert points[4]["closed"] == 2 and points[4]["improvements"] == 2
+    assert points[3]["rejected"] == 1
+
+    response = client.get(f"/projects/{project_id}/trends", params={
+        "from": "2024-02-01", "to": "2024-03-31", "granularity": "month", "vendor_id": vendor_id
+    })
+    points = response.json()["points"]
+    assert [(p["period_start"], p["opened"], p["backlog"]) for p in points] == [
+        ("2024-02-01", 2, 2), ("2024-03-01", 1, 1)
+    ]
+
+    response = client.get(f"/projects/{project_id}/trends", params={
+        "from": "2024-02-28", "to": "2024-03-05", "granularity": "week"
+    })
+    assert [p["period_start"] for p in response.json()["points"]] == ["2024-02-26", "2024-03-04"]
+
+def test_trends_validation(client, test_project):
+    url = f"/projects/{test_project.project_id}/trends"
+    assert client.get(url).status_code == status.HTTP_200_OK
+    assert len(client.get(url).json()["points"]) == 30
+    assert client.get(url, params={"from": "2024-03-05", "to": "2024-03-01"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url, params={"from": "2000-01-01", "to": "2024-03-01"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url, params={"granularity": "hour"}).status_code == 422
+    assert client.get("/projects/999999/trends").status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,196 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.job.handlers import get_periodic_job_types
+from app.job.models import Job
+from app.upload import crud, jobs
+from app.upload.models import Upload
+
+CHUNK_HEADERS = {"Content-Type": "application/offset+octet-stream"}
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch, local_storage):
+    path = tmp_path / "uploads"
+    monkeypatch.setattr(crud, "upload_dir", str(path))
+    return path
+
+def _jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 200), color="green").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def _patch(client, upload_id, offset, body):
+    return client.patch(f"/uploads/{upload_id}", content=body, headers={**CHUNK_HEADERS, "Upload-Offset": str(offset)})
+
+def test_resumable_photo_upload(client, db, test_defect, upload_dir, local_storage):
+    data = _jpeg_bytes()
+    response = client.post("/uploads/", json={
+        "target": "photo", "filename": "site.jpg", "content_type": "image/jpeg", "upload_length": len(data),
+        "related_type": "defect", "related_id": test_defect.defect_id, "description": "resumed"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    upload_id = response.json()["upload_id"]
+    assert response.headers["location"].endswith(f"/uploads/{upload_id}")
+    assert response.headers["upload-offset"] == "0"
+
+    half = len(data) // 2
+    response = _patch(client, upload_id, 0, data[:half])
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert response.headers["upload-offset"] == str(half)
+
+    response = client.head(f"/uploads/{upload_id}")
+    assert response.headers["upload-offset"] == str(half)
+    assert response.headers["upload-length"] == str(len(data))
+
+    # 位置不符與尚未傳完都會被拒絕
+    assert _patch(client, upload_id, 0, data).status_code == status.HTTP_409_CONFLICT
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == status.HTTP_409_CONFLICT
+
+    assert _patch(client, upload_id, half, data[half:]).status_code == status.HTTP_204_NO_CONTENT
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == status.HTTP_201_CREATED
+    result = response.json()
+    assert result["target"] == "photo" and result["base_map"] is None
+    photo = result["photos"][0]
+    assert photo["description"] == "resumed"
+    assert photo["image_url"].startswith(f"/static/photos/defect/defect_{test_defect.defect_id}_")
+    with local_storage.open(photo["image_url"]) as f:
+        assert f.read() == data
+
+    assert not os.listdir(upload_dir)
+    assert client.head(f"/uploads/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert db.query(Job).filter(Job.job_type == "photo.thumbnail").count() == 1
+
+def test_resumable_base_map_upload(client, db, test_base_map, upload_dir, local_storage):
+    data = b"map image bytes"
+    response = client.post("/uploads/", json={
+        "target": "base_map", "filename": "floor.png", "upload_length": len(data),
+        "base_map_id": test_base_map.base_map_id
+    })
+    upload_id = response.json()["upload_id"]
+    for offset in range(0, len(data), 4):
+        assert _patch(client, upload_id, offset, data[offset:offset + 4]).status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == status.HTTP_201_CREATED
+    base_map = response.json()["base_map"]
+    assert base_map["file_path"] == f"static/base_map/base_map_{test_base_map.base_map_id}.png"
+    with local_storage.open(base_map["file_path"]) as f:
+        assert f.read() == data
+
+def test_patch_discards_unrecorded_bytes(client, test_base_map, upload_dir):
+    response = client.post("/uploads/", json={
+        "target": "base_map", "filename": "floor.png", "upload_length": 6, "base_map_id": test_base_map.base_map_id
+    })
+    upload_id = response.json()["upload_id"]
+    _patch(client, upload_id, 0, b"abc")
+    # 模擬中斷時已寫入檔案、但 offset 尚未更新的位元組
+    with open(crud.get_part_path(upload_id), "ab") as part:
+        part.write(b"zzzz")
+    assert _patch(client, upload_id, 3, b"def").status_code == status.HTTP_204_NO_CONTENT
+    with open(crud.get_part_path(upload_id), "rb") as part:
+        assert part.read() == b"abcdef"
+
+def test_overlapping_patches_are_serialized(client, db, test_base_map, upload_dir):
+    response = client.post("/uploads/", json={
+        "target": "base_map", "filename": "floor.png", "upload_length": 6, "base_map_id": test_base_map.base_map_id
+    })
+    upload_id = response.json()["upload_id"]
+    # 舊連線仍在寫入時，相同 offset 的重送不能截斷它的資料
+    token = crud.claim_upload(db, upload_id, 0)
+    assert _patch(client, upload_id, 0, b"abcdef").status_code == status.HTTP_409_CONFLICT
+    assert crud.release_claim(db, upload_id, token) is True
+
+    # 佔用超過時限視為已中斷，可以接手
+    assert crud.claim_upload(db, upload_id, 0) is not None
+    db.query(Upload).filter(Upload.upload_id == upload_id).update(
+        {Upload.claimed_at: datetime.utcnow() - timedelta(seconds=crud.UPLOAD_CLAIM_TIMEOUT_SECONDS + 1)}
+    )
+    db.commit()
+    assert _patch(client, upload_id, 0, b"abcdef").status_code == status.HTTP_204_NO_CONTENT
+    upload = db.query(Upload).filter(Upload.upload_id == upload_id).one()
+    db.refresh(upload)
+    assert (upload.upload_offset, upload.claimed_by) == (6, None)
+
+def test_stale_writer_stops_after_takeover(client, db, test_base_map, upload_dir):
+    response = client.post("/uploads/", json={
+        "target": "base_map", "filename": "floor.png", "upload_length": 6, "base_map_id": test_base_map.base_map_id
+    })
+    upload_id = response.json()["upload_id"]
+    stale = crud.claim_upload(db, upload_id, 0)
+    db.query(Upload).filter(Upload.upload_id == upload_id).update(
+        {Upload.claimed_at: datetime.utcnow() - timedelta(seconds=crud.UPLOAD_CLAIM_TIMEOUT_SECONDS + 1)}
+    )
+    db.commit()
+    # 接手的請求寫入後，逾時的舊連線再送來的片段不會寫入也不會截斷
+    takeover = crud.claim_upload(db, upload_id, 0)
+    with open(crud.get_part_path(upload_id), "r+b") as part:
+        assert crud.truncate_part(db, upload_id, takeover, part, 0) is True
+        assert crud.write_part_chunk(db, upload_id, takeover, part, 0, b"abc") is True
+        assert crud.write_part_chunk(db, upload_id, stale, part, 0, b"zzzzzz") is False
+        assert crud.truncate_part(db, upload_id, stale, part, 0) is False
+        assert crud.write_part_chunk(db, upload_id, takeover, part, 3, b"def") is True
+    assert crud.release_claim(db, upload_id, stale, 6) is False
+    assert crud.release_claim(db, upload_id, takeover, 6) is True
+    with open(crud.get_part_path(upload_id), "rb") as part:
+        assert part.read() == b"abcdef"
+
+def test_complete_checks_stored_bytes(client, db, test_base_map, upload_dir):
+    data = b"\x89PNG" + b"0" * 20
+    response = client.post("/uploads/", json={
+        "target": "base_map", "filename": "floor.png", "upload_length": len(data), "base_map_id": test_base_map.base_map_id
+    })
+    upload_id = response.json()["upload_id"]
+    assert _patch(client, upload_id, 0, data).status_code == status.HTTP_204_NO_CONTENT
+
+    # offset 已記錄完成，但暫存檔被截短
+    with open(crud.get_part_path(upload_id), "r+b") as part:
+        part.truncate(10)
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert client.get(f"/uploads/{upload_id}").status_code == status.HTTP_200_OK
+
+    # 仍有請求在寫入時不能完成
+    with open(crud.get_part_path(upload_id), "wb") as part:
+        part.write(data)
+    token = crud.claim_upload(db, upload_id, len(data))
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == status.HTTP_409_CONFLICT
+    crud.release_claim(db, upload_id, token)
+
+def test_upload_validation(client, test_defect, test_base_map, upload_dir, monkeypatch):
+    photo = {"target": "photo", "filename": "a.jpg", "upload_length": 10,
+             "related_type": "defect", "related_id": test_defect.defect_id}
+    assert client.post("/uploads/", json={**photo, "filename": "a.txt"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post("/uploads/", json={**photo, "related_id": 999999}).status_code == status.HTTP_404_NOT_FOUND
+    assert client.post("/uploads/", json={
+        "target": "base_map", "filename": "a.png", "upload_length": 10, "base_map_id": 999999
+    }).status_code == status.HTTP_404_NOT_FOUND
+    monkeypatch.setattr(crud, "UPLOAD_MAX_BYTES", 5)
+    assert client.post("/uploads/", json=photo).status_code == status.HTTP_413_CONTENT_TOO_LARGE
+    monkeypatch.setattr(crud, "UPLOAD_MAX_BYTES", 100)
+
+    upload_id = client.post("/uploads/", json=photo).json()["upload_id"]
+    response = client.patch(f"/uploads/{upload_id}", content=b"x", headers={"Upload-Offset": "0"})
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert _patch(client, upload_id, 0, b"x" * 11).status_code == status.HTTP_413_CONTENT_TOO_LARGE
+    assert client.head(f"/uploads/{upload_id}").headers["upload-offset"] == "0"
+
+    assert client.delete(f"/uploads/{upload_id}").status_code == status.HTTP_204_NO_CONTENT
+    assert not os.path.exists(crud.get_part_path(upload_id))
+    assert client.get(f"/uploads/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+
+def test_prune_expired_uploads(db, test_base_map, upload_dir):
+    fresh = crud.create_upload(db, "base_map", 10, "a.png", None, {"base_map_id": test_base_map.base_map_id})
+    stale = crud.create_upload(db, "base_map", 10, "b.png", None, {"base_map_id": test_base_map.base_map_id})
+    stale.updated_at = datetime.utcnow() - timedelta(hours=crud.UPLOAD_EXPIRE_HOURS + 1)
+    db.commit()
+
+    assert jobs.PRUNE_UPLOADS_JOB_TYPE in get_periodic_job_types()
+    assert crud.prune_expired_uploads(db) == 1
+    assert [u.upload_id for u in db.query(Upload)] == [fresh.upload_id]
+    assert os.listdir(upload_dir) == [f"{fresh.upload_id}.part"]
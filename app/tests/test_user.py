@@ -1,5 +1,8 @@
 import pytest
 from fastapi import status
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from app.database import Base, create_missing_indexes
 from app.user import crud
 from app.user.schemas import UserCreate, UserUpdate
 
@@ -252,3 +255,86 @@ def test_api_delete_user_not_found(client):
     
     # Check response
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_create_user_duplicate_line_id_returns_none(db, test_user):
+    user_data = UserCreate(
+        name="Duplicate LINE User",
+        line_id=test_user.line_id,
+        email="duplicate_line@example.com",
+        company_name="Duplicate Company"
+    )
+    
+    assert crud.create_user(db, user_data) is None
+    assert len(crud.get_users(db)) == 1
+
+def test_create_users_without_line_id(db):
+    # 未綁定 LINE 的使用者不受唯一索引限制
+    for index in range(2):
+        user = crud.create_user(db, UserCreate(
+            name=f"No LINE User {index}",
+            line_id="",
+            email=f"no_line_{index}@example.com",
+            company_name="No LINE Company"
+        ))
+        assert user is not None
+        assert user.line_id is None
+
+def test_get_user_data_by_line_id_is_cached(db, test_user, query_counter):
+    line_id = test_user.line_id
+    user_id = test_user.user_id
+    query_counter.clear()
+    
+    first = crud.get_user_data_by_line_id(db, line_id)
+    second = crud.get_user_data_by_line_id(db, line_id)
+    
+    assert first["user_id"] == user_id
+    assert second == first
+    assert len(query_counter) == 1
+    assert crud.get_user_data_by_line_id(db, "missing_line_id") is None
+
+def test_update_user_invalidates_line_id_cache(db, test_user):
+    old_line_id = test_user.line_id
+    crud.get_user_data_by_line_id(db, old_line_id)
+    
+    crud.update_user(db, test_user.user_id, UserUpdate(name="Renamed", line_id="renamed_line_id"))
+    
+    assert crud.get_user_data_by_line_id(db, old_line_id) is None
+    assert crud.get_user_data_by_line_id(db, "renamed_line_id")["name"] == "Renamed"
+
+def test_delete_user_invalidates_line_id_cache(db, test_user):
+    line_id = test_user.line_id
+    crud.get_user_data_by_line_id(db, line_id)
+    
+    crud.delete_user(db, test_user.user_id)
+    
+    assert crud.get_user_data_by_line_id(db, line_id) is None
+
+def test_resolve_line_id_conflicts_allows_unique_index(tmp_path):
+    # 模擬唯一索引建立前、已有空白與重複 LINE ID 的資料庫
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_users_line_id"))
+        for name, line_id in (("A", ""), ("B", ""), ("C", "dup"), ("D", "dup"), ("E", "single")):
+            connection.execute(text("INSERT INTO users (name, line_id) VALUES (:name, :line_id)"), {"name": name, "line_id": line_id})
+
+    with engine.begin() as connection:
+        conflicts = crud.get_line_id_conflicts(connection)
+        assert [user["name"] for user in conflicts["dup"]] == ["C", "D"]
+        assert list(conflicts) == ["dup"]
+        # 未指定保留的使用者時不修改資料
+        with pytest.raises(ValueError):
+            crud.resolve_line_id_conflicts(connection, [])
+        keep = conflicts["dup"][1]["user_id"]
+        assert crud.resolve_line_id_conflicts(connection, [keep]) == 1
+    create_missing_indexes(engine)
+    assert "ix_users_line_id" in {index["name"] for index in inspect(engine).get_indexes("users")}
+    with engine.connect() as connection:
+        rows = dict(connection.execute(text("SELECT name, line_id FROM users")).all())
+    assert rows == {"A": None, "B": None, "C": None, "D": "dup", "E": "single"}
+
+    # 索引建立後由 ON CONFLICT 判斷重複
+    with Session(engine) as session:
+        assert crud.create_user(session, UserCreate(name="F", line_id="dup")) is None
+        assert crud.create_user(session, UserCreate(name="G", line_id="")).line_id is None
+    engine.dispose()
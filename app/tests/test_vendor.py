@@ -289,3 +289,77 @@ def test_api_delete_vendor_not_found(client):
     
     # Check response
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_vendors_with_defect_counts_by_project(db, test_vendor, test_defect, query_counter):
+    from app.project.models import Project
+
+    other_project = Project(project_name="Other Project")
+    db.add(other_project)
+    db.commit()
+    crud.create_vendor(db, VendorCreate(vendor_name="Other Vendor", project_id=other_project.project_id))
+    project_id, vendor_id = test_vendor.project_id, test_vendor.vendor_id
+    query_counter.clear()
+
+    vendors_data = crud.get_vendors_with_defect_counts(db, project_id=project_id)
+
+    # 只回傳該專案廠商，且只送出一次查詢
+    assert len(query_counter) == 1
+    assert [v["vendor_id"] for v in vendors_data] == [vendor_id]
+    assert vendors_data[0]["defect_count"] == 1
+
+def test_api_read_vendors_with_defect_counts_invalid_project(client):
+    response = client.get("/vendors/with-counts?project_id=999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_get_vendor_workload(db, test_project, test_user, test_vendor, test_defect, query_counter):
+    from datetime import date, timedelta
+    from app.defect.models import Defect
+
+    def add_defect(status, due, responsible=False):
+        db.add(Defect(
+            project_id=test_project.project_id,
+            submitted_id=test_user.user_id,
+            defect_description="workload",
+            assigned_vendor_id=test_vendor.vendor_id,
+            responsible_vendor_id=test_vendor.vendor_id if responsible else None,
+            expected_completion_day=due,
+            status=status
+        ))
+
+    yesterday = date.today() - timedelta(days=1)
+    add_defect("改善中", yesterday, responsible=True)
+    add_defect("待確認", yesterday)
+    add_defect("已完成", yesterday)
+    add_defect("退件", yesterday)
+    db.commit()
+    project_id, vendor_id = test_project.project_id, test_vendor.vendor_id
+    query_counter.clear()
+
+    report = crud.get_vendor_workload(db, project_id=project_id)
+
+    assert len(query_counter) == 1
+    vendor = next(v for v in report["vendors"] if v["vendor_id"] == vendor_id)
+    # test_defect（等待中、尚未到期）＋ 改善中 ＋ 待確認
+    assert vendor["open_count"] == 3
+    assert vendor["overdue_count"] == 2
+    assert vendor["awaiting_confirmation_count"] == 1
+    assert vendor["responsible_open_count"] == 1
+    assert vendor["responsible_overdue_count"] == 1
+    assert report["totals"]["open_count"] == 3
+
+def test_api_read_vendor_workload(client, test_vendor, test_defect):
+    response = client.get(f"/vendors/workload?project_id={test_vendor.project_id}")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["project_id"] == test_vendor.project_id
+    assert data["vendors"][0]["vendor_id"] == test_vendor.vendor_id
+    assert data["vendors"][0]["open_count"] == 1
+
+    # 不指定專案時統計所有專案
+    response = client.get("/vendors/workload")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["project_id"] is None
+
+def test_api_read_vendor_workload_invalid_project(client):
+    response = client.get("/vendors/workload?project_id=999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,38 @@
+"""
+重新計算 defect_daily_rollup。升級後以 --if-empty 執行一次，將彙總表建立前已存在的缺失計入；
+彙總與實際資料不一致時再重建：
+
+    python -m app.trend.backfill --if-empty   # 彙總表為空時才計算（backfill_rollup）
+    python -m app.trend.backfill              # 所有專案
+    python -m app.trend.backfill --project 3
+
+狀態異動沒有歷程紀錄，重建的結案日與廠商以目前資料推估，見 rebuild_rollup。
+"""
+import argparse
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily defect rollup from the current data")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--project", type=int, help="only rebuild this project")
+    target.add_argument("--if-empty", action="store_true", help="only fill the rollup when it has no rows yet")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal, engine
+    import app.main  # noqa: F401  載入所有資料表
+    from app.trend.crud import backfill_rollup, rebuild_rollup
+
+    if args.if_empty:
+        with engine.begin() as connection:
+            rows = backfill_rollup(connection)
+        print(f"wrote {rows} rollup rows")
+        return
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollup(db, project_id=args.project)
+    finally:
+        db.close()
+    print(f"wrote {rows} rollup rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, exists, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.confirmation.models import Confirmation
+from app.defect.models import Defect
+from app.improvement.models import Improvement
+from app.project.models import Project
+from app.trend.models import DefectDailyRollup
+from app.utils import dialect_insert
+
+# 彙總的日期以 UTC 加上此時差切分，例如台灣為 8
+ROLLUP_UTC_OFFSET_HOURS = float(os.getenv("ROLLUP_UTC_OFFSET_HOURS", "0"))
+# 結案狀態，其餘狀態都算未結案
+CLOSED_STATUSES = ("已完成", "退件")
+ROLLUP_COUNTERS = ("opened", "closed", "rejected", "improvements", "backlog_delta")
+GRANULARITIES = ("day", "week", "month")
+
+# (project_id, vendor_id, day) -> {counter: 增減}
+RollupKey = Tuple[int, int, date]
+RollupDeltas = Dict[RollupKey, Dict[str, int]]
+
+def rollup_day(value: Optional[datetime] = None) -> date:
+    """Day a UTC timestamp is counted on"""
+    value = value or datetime.utcnow()
+    return (value + timedelta(hours=ROLLUP_UTC_OFFSET_HOURS)).date()
+
+def _vendor_key(vendor_id: Optional[int]) -> int:
+    return vendor_id or 0
+
+def _is_open(status: Optional[str]) -> bool:
+    return status not in CLOSED_STATUSES
+
+def _old_value(obj: Any, name: str) -> Any:
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, name)
+
+def _add(deltas: RollupDeltas, project_id: Optional[int], vendor_id: Optional[int], day: date, counter: str, amount: int = 1) -> None:
+    if project_id is None:
+        return
+    deltas[(project_id, _vendor_key(vendor_id), day)][counter] += amount
+
+def _collect_deltas(session: Session) -> RollupDeltas:
+    deltas: RollupDeltas = defaultdict(lambda: defaultdict(int))
+    today = rollup_day()
+
+    for obj in session.new:
+        if isinstance(obj, Defect):
+            day = rollup_day(obj.created_at)
+            _add(deltas, obj.project_id, obj.assigned_vendor_id, day, "opened")
+            if _is_open(obj.status):
+                _add(deltas, obj.project_id, obj.assigned_vendor_id, day, "backlog_delta")
+            elif obj.status == "已完成":
+                _add(deltas, obj.project_id, obj.assigned_vendor_id, day, "closed")
+            else:
+                _add(deltas, obj.project_id, obj.assigned_vendor_id, day, "rejected")
+        elif isinstance(obj, Improvement) and obj.defect_id is not None:
+            defect = obj.__dict__.get("defect") or session.get(Defect, obj.defect_id)
+            if defect is not None:
+                _add(deltas, defect.project_id, defect.assigned_vendor_id, rollup_day(obj.created_at), "improvements")
+
+    for obj in session.dirty:
+        if not isinstance(obj, Defect) or not session.is_modified(obj):
+            continue
+        old_status, new_status = _old_value(obj, "status"), obj.status
+        old_key = (_old_value(obj, "project_id"), _vendor_key(_old_value(obj, "assigned_vendor_id")))
+        new_key = (obj.project_id, _vendor_key(obj.assigned_vendor_id))
+        if new_status != old_status:
+            if new_status == "已完成":
+                _add(deltas, *new_key, today, "closed")
+            elif new_status == "退件":
+                _add(deltas, *new_key, today, "rejected")
+        # 結案、重新開啟或換廠商時，未結案數從舊的組合移到新的組合
+        if (_is_open(old_status), old_key) != (_is_open(new_status), new_key):
+            if _is_open(old_status):
+                _add(deltas, *old_key, today, "backlog_delta", -1)
+            if _is_open(new_status):
+                _add(deltas, *new_key, today, "backlog_delta")
+
+    for obj in session.deleted:
+        if isinstance(obj, Defect) and _is_open(obj.status):
+            _add(deltas, obj.project_id, obj.assigned_vendor_id, today, "backlog_delta", -1)
+
+    # 同一次 flush 刪除的專案，其彙總資料由外鍵一併刪除
+    deleted_projects = {obj.project_id for obj in session.deleted if isinstance(obj, Project)}
+    return {
+        key: counters for key, counters in deltas.items()
+        if key[0] not in deleted_projects and any(counters.values())
+    }
+
+def apply_rollup_deltas(session: Session, deltas: RollupDeltas) -> None:
+    """Add counter changes to the rollup in one upsert"""
+    _upsert_rollup(session.connection(), deltas)
+
+def _upsert_rollup(connection: Connection, deltas: RollupDeltas) -> None:
+    if not deltas:
+        return
+    rows = [
+        {
+            "project_id": project_id, "vendor_id": vendor_id, "day": day,
+            **{counter: counters.get(counter, 0) for counter in ROLLUP_COUNTERS}
+        }
+        for (project_id, vendor_id, day), counters in sorted(deltas.items())
+    ]
+    statement = dialect_insert(connection, DefectDailyRollup).values(rows)
+    table = DefectDailyRollup.__table__
+    # 已有當日資料時累加，不需要先查詢
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.project_id, table.c.vendor_id, table.c.day],
+        set_={counter: table.c[counter] + statement.excluded[counter] for counter in ROLLUP_COUNTERS}
+    )
+    connection.execute(statement)
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+# commit 後屬性已過期，需在設定新值前載入舊值，flush 時才能比較狀態與廠商的變化
+for _attribute in (Defect.status, Defect.project_id, Defect.assigned_vendor_id):
+    event.listen(_attribute, "set", _keep_old_value, active_history=True, retval=True)
+
+@event.listens_for(Session, "after_flush")
+def _track_defect_activity(session, flush_context):
+    """Keep defect_daily_rollup in step with defect, improvement and confirmation writes"""
+    # 改善與確認會更新缺失狀態，因此只需觀察缺失與新增的改善單
+    apply_rollup_deltas(session, _collect_deltas(session))
+
+def rebuild_rollup(db: Session, project_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollup from the current defects, for one project or all.
+    Status history is not stored, so a defect counts toward its current
+    vendor, is closed on its last accepted confirmation (or last update)
+    and earlier reopen cycles are lost. Returns the number of rows written.
+    """
+    rows = rebuild_rollup_rows(db.connection(), project_id)
+    db.commit()
+    return rows
+
+def rebuild_rollup_rows(connection: Connection, project_id: Optional[int] = None) -> int:
+    """rebuild_rollup on a connection, without committing"""
+    def scoped(statement: Any, column: Any) -> Any:
+        return statement.where(column == project_id) if project_id is not None else statement
+
+    accepted_at = dict(connection.execute(
+        scoped(
+            select(Improvement.defect_id, func.max(Confirmation.created_at))
+            .join(Confirmation, Confirmation.improvement_id == Improvement.improvement_id)
+            .where(Confirmation.status == "接受")
+            .group_by(Improvement.defect_id),
+            Improvement.project_id
+        )
+    ).all())
+
+    deltas: RollupDeltas = defaultdict(lambda: defaultdict(int))
+    defects = connection.execute(scoped(
+        select(
+            Defect.defect_id, Defect.project_id, Defect.assigned_vendor_id,
+            Defect.status, Defect.created_at, Defect.updated_at
+        ),
+        Defect.project_id
+    ).execution_options(yield_per=1000))
+    for defect_id, defect_project_id, vendor_id, status, created_at, updated_at in defects:
+        opened_on = rollup_day(created_at or updated_at)
+        _add(deltas, defect_project_id, vendor_id, opened_on, "opened")
+        _add(deltas, defect_project_id, vendor_id, opened_on, "backlog_delta")
+        if not _is_open(status):
+            closed_at = accepted_at.get(defect_id) if status == "已完成" else None
+            closed_on = max(rollup_day(closed_at or updated_at or created_at), opened_on)
+            _add(deltas, defect_project_id, vendor_id, closed_on, "closed" if status == "已完成" else "rejected")
+            _add(deltas, defect_project_id, vendor_id, closed_on, "backlog_delta", -1)
+
+    improvements = connection.execute(scoped(
+        select(Defect.project_id, Defect.assigned_vendor_id, Improvement.created_at)
+        .join(Defect, Defect.defect_id == Improvement.defect_id),
+        Defect.project_id
+    ).execution_options(yield_per=1000))
+    for defect_project_id, vendor_id, created_at in improvements:
+        _add(deltas, defect_project_id, vendor_id, rollup_day(created_at), "improvements")
+
+    connection.execute(scoped(delete(DefectDailyRollup), DefectDailyRollup.project_id))
+    items = sorted(deltas.items())
+    # 分批寫入，避免單一語句的參數過多
+    for start in range(0, len(items), 500):
+        _upsert_rollup(connection, dict(items[start:start + 500]))
+    return len(items)
+
+def backfill_rollup(connection: Connection) -> int:
+    """
+    Build the rollup of defects written before it existed; does nothing once
+    the rollup has rows. Returns the number of rows written.
+    """
+    # 資料表剛建立時彙總為空，但已有缺失；以是否為空判斷，重複執行也不會重複計算
+    if connection.execute(select(exists().select_from(DefectDailyRollup))).scalar():
+        return 0
+    if not connection.execute(select(exists().select_from(Defect))).scalar():
+        return 0
+    return rebuild_rollup_rows(connection)
+
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def iter_periods(start: date, end: date, granularity: str) -> Iterable[date]:
+    """Start of every period overlapping start..end"""
+    period = _period_start(start, granularity)
+    while period <= end:
+        yield period
+        period = _next_period(period, granularity)
+
+def get_trends(
+    db: Session,
+    project_id: int,
+    start: date,
+    end: date,
+    granularity: str = "day",
+    vendor_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+    """Activity per period and the backlog at the end of each period, from the rollup only"""
+    rollup = DefectDailyRollup
+    filters = [rollup.project_id == project_id]
+    if vendor_id is not None:
+        filters.append(rollup.vendor_id == _vendor_key(vendor_id))
+
+    # 起始日之前累計的未結案數
+    backlog = db.execute(
+        select(func.coalesce(func.sum(rollup.backlog_delta), 0)).where(*filters, rollup.day < start)
+    ).scalar()
+    rows = db.execute(
+        select(rollup.day, *(func.sum(getattr(rollup, counter)) for counter in ROLLUP_COUNTERS))
+        .where(*filters, rollup.day >= start, rollup.day <= end)
+        .group_by(rollup.day)
+        .order_by(rollup.day)
+    ).all()
+
+    points = {
+        period: {"period_start": period, "opened": 0, "closed": 0, "rejected": 0, "improvements": 0, "backlog": 0}
+        for period in iter_periods(start, end, granularity)
+    }
+    by_day = {row[0]: dict(zip(ROLLUP_COUNTERS, row[1:])) for row in rows}
+    for period, point in points.items():
+        day = max(period, start)
+        period_end = min(_next_period(period, granularity), end + timedelta(days=1))
+        while day < period_end:
+            counters = by_day.get(day)
+            if counters is not None:
+                for counter in ("opened", "closed", "rejected", "improvements"):
+                    point[counter] += counters[counter]
+                backlog += counters["backlog_delta"]
+            day += timedelta(days=1)
+        point["backlog"] = backlog
+    return list(points.values())
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from app.database import Base
+
+class DefectDailyRollup(Base):
+    """Defect activity per project, assigned vendor and day, maintained on every flush"""
+    __tablename__ = "defect_daily_rollup"
+
+    project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), primary_key=True)
+    vendor_id = Column(Integer, primary_key=True)  # 指派廠商，0 為未指派
+    day = Column(Date, primary_key=True)
+    opened = Column(Integer, nullable=False, default=0)  # 新增的缺失
+    closed = Column(Integer, nullable=False, default=0)  # 轉為「已完成」
+    rejected = Column(Integer, nullable=False, default=0)  # 轉為「退件」
+    improvements = Column(Integer, nullable=False, default=0)  # 提交的改善單
+    # 未結案缺失數的增減，累加即為當日結束時的未結案數
+    backlog_delta = Column(Integer, nullable=False, default=0)
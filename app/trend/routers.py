@@ -0,0 +1,52 @@
+import os
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.project.models import Project
+from app.trend import crud, schemas
+
+router = APIRouter()
+
+# 單次查詢最多回傳的期間數
+TRENDS_MAX_POINTS = int(os.getenv("TRENDS_MAX_POINTS", "400"))
+# 未指定起始日時回傳的天數
+TRENDS_DEFAULT_DAYS = 30
+
+@router.get("/{project_id}/trends", response_model=schemas.ProjectTrendsOut)
+def read_project_trends(
+    project_id: int,
+    start_date: Optional[date] = Query(None, alias="from"),
+    end_date: Optional[date] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    vendor_id: Optional[int] = Query(None, description="Only defects assigned to this vendor, 0 for unassigned"),
+    db: Session = Depends(get_db)
+):
+    """Opened, closed and rejected defects per period and the backlog over time
+
+    只讀取每日彙總表，不需重播每筆缺失的歷程
+    """
+    if db.query(Project.project_id).filter(Project.project_id == project_id).first() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    end_date = end_date or crud.rollup_day()
+    start_date = start_date or end_date - timedelta(days=TRENDS_DEFAULT_DAYS - 1)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if sum(1 for _ in crud.iter_periods(start_date, end_date, granularity)) > TRENDS_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too long. At most {TRENDS_MAX_POINTS} {granularity} periods per request"
+        )
+
+    points = crud.get_trends(db, project_id, start_date, end_date, granularity, vendor_id)
+    return {
+        "project_id": project_id,
+        "vendor_id": vendor_id,
+        "granularity": granularity,
+        "start_date": start_date,
+        "end_date": end_date,
+        "points": points
+    }
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import List, Optional
+
+class TrendPointOut(BaseModel):
+    period_start: date
+    opened: int
+    closed: int
+    rejected: int
+    improvements: int
+    backlog: int = Field(description="Open defects at the end of the period")
+
+class ProjectTrendsOut(BaseModel):
+    project_id: int
+    vendor_id: Optional[int] = None
+    granularity: str
+    start_date: date
+    end_date: date
+    points: List[TrendPointOut]
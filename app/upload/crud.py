@@ -0,0 +1,189 @@
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.upload.models import Upload
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 沒有 fcntl，只靠資料庫的佔用檢查
+    fcntl = None
+
+# 單一檔案大小上限
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# 超過此時間未再傳送的上傳視為放棄，由定期工作清除
+UPLOAD_EXPIRE_HOURS = float(os.getenv("UPLOAD_EXPIRE_HOURS", "24"))
+# 寫入中的請求超過此秒數未更新佔用時間，視為已中斷，其他請求可以接手
+UPLOAD_CLAIM_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_CLAIM_TIMEOUT_SECONDS", "60"))
+
+# 專案根目錄；暫存的片段放在 static/ 之外，完成前不會被公開存取
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".."))
+upload_dir = os.getenv("UPLOAD_DIR", os.path.join(project_root, "uploads"))
+
+def get_part_path(upload_id: str) -> str:
+    """Path of the file the received bytes of an upload are appended to"""
+    return os.path.join(upload_dir, f"{upload_id}.part")
+
+def get_upload(db: Session, upload_id: str) -> Optional[Upload]:
+    return db.query(Upload).filter(Upload.upload_id == upload_id).first()
+
+def get_upload_params(upload: Upload) -> Dict[str, Any]:
+    return json.loads(upload.params or "{}")
+
+def create_upload(
+    db: Session,
+    target: str,
+    upload_length: int,
+    filename: Optional[str],
+    content_type: Optional[str],
+    params: Dict[str, Any]
+    ) -> Upload:
+    """Register a new upload and create its empty part file"""
+    db_upload = Upload(
+        upload_id=uuid.uuid4().hex,
+        target=target,
+        params=json.dumps(params),
+        filename=filename,
+        content_type=content_type,
+        upload_length=upload_length,
+        upload_offset=0
+    )
+    os.makedirs(upload_dir, exist_ok=True)
+    open(get_part_path(db_upload.upload_id), "wb").close()
+    db.add(db_upload)
+    db.commit()
+    db.refresh(db_upload)
+    return db_upload
+
+def _claim_expired_before(now: datetime) -> datetime:
+    return now - timedelta(seconds=UPLOAD_CLAIM_TIMEOUT_SECONDS)
+
+def is_claimed(upload: Upload, now: Optional[datetime] = None) -> bool:
+    """Whether a request is currently writing to the upload"""
+    now = now or datetime.utcnow()
+    return upload.claimed_by is not None and upload.claimed_at is not None and upload.claimed_at >= _claim_expired_before(now)
+
+def claim_upload(db: Session, upload_id: str, expected_offset: int) -> Optional[str]:
+    """
+    Take exclusive write access to an upload at expected_offset, before any
+    byte is written. Returns the claim token, None when the offset moved or
+    another request is still writing.
+    """
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    # 以 offset 與佔用狀態為條件更新，兩個同時送來的片段只有一個會取得
+    claimed = (
+        db.query(Upload)
+        .filter(
+            Upload.upload_id == upload_id,
+            Upload.upload_offset == expected_offset,
+            or_(Upload.claimed_by.is_(None), Upload.claimed_at < _claim_expired_before(now))
+        )
+        .update({Upload.claimed_by: token, Upload.claimed_at: now}, synchronize_session=False)
+    )
+    db.commit()
+    return token if claimed == 1 else None
+
+def refresh_claim(db: Session, upload_id: str, token: str) -> bool:
+    """Keep a claim alive while writing; False when it was taken over"""
+    refreshed = (
+        db.query(Upload)
+        .filter(Upload.upload_id == upload_id, Upload.claimed_by == token)
+        .update({Upload.claimed_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return refreshed == 1
+
+def release_claim(db: Session, upload_id: str, token: str, new_offset: Optional[int] = None) -> bool:
+    """Record the received bytes (when new_offset is given) and release the claim"""
+    values: Dict[Any, Any] = {Upload.claimed_by: None, Upload.claimed_at: None}
+    if new_offset is not None:
+        values[Upload.upload_offset] = new_offset
+        values[Upload.updated_at] = datetime.utcnow()
+    released = (
+        db.query(Upload)
+        .filter(Upload.upload_id == upload_id, Upload.claimed_by == token)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return released == 1
+
+def holds_claim(db: Session, upload_id: str, token: str) -> bool:
+    """Whether token still holds the write claim of an upload"""
+    held = db.query(Upload.upload_id).filter(Upload.upload_id == upload_id, Upload.claimed_by == token).first()
+    # 結束讀取交易，下次檢查才看得到其他請求的接手
+    db.commit()
+    return held is not None
+
+@contextmanager
+def _locked_part(part: BinaryIO) -> Iterator[None]:
+    # 檢查佔用與寫入之間不讓接手的請求截斷檔案
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(part.fileno(), fcntl.LOCK_UN)
+
+def truncate_part(db: Session, upload_id: str, token: str, part: BinaryIO, offset: int) -> bool:
+    """Drop the bytes of the part file after offset, only while token holds the claim"""
+    with _locked_part(part):
+        if not holds_claim(db, upload_id, token):
+            return False
+        part.truncate(offset)
+    return True
+
+def write_part_chunk(db: Session, upload_id: str, token: str, part: BinaryIO, offset: int, chunk: bytes) -> bool:
+    """
+    Write a chunk at offset of the part file, only while token holds the
+    claim. Returns False, without writing, once another request took over.
+    """
+    # 確認佔用與寫入都在檔案鎖內，接手的請求截斷檔案前也要取得同一個鎖，
+    # 已被接手的舊連線不會再寫入新請求的位元組
+    with _locked_part(part):
+        if not holds_claim(db, upload_id, token):
+            return False
+        os.pwrite(part.fileno(), chunk, offset)
+    return True
+
+def get_part_size(upload_id: str) -> int:
+    """Bytes actually stored in the part file"""
+    try:
+        return os.path.getsize(get_part_path(upload_id))
+    except FileNotFoundError:
+        return -1
+
+def remove_part_file(upload_id: str) -> None:
+    try:
+        os.remove(get_part_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+def delete_upload(db: Session, upload: Upload) -> None:
+    """Cancel an upload and discard the bytes received so far"""
+    upload_id = upload.upload_id
+    db.delete(upload)
+    db.commit()
+    remove_part_file(upload_id)
+
+def prune_expired_uploads(db: Session, now: Optional[datetime] = None) -> int:
+    """Remove uploads abandoned for longer than UPLOAD_EXPIRE_HOURS"""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=UPLOAD_EXPIRE_HOURS)
+    upload_ids = [
+        upload_id for (upload_id,) in db.query(Upload.upload_id).filter(Upload.updated_at < cutoff)
+    ]
+    if not upload_ids:
+        return 0
+    db.query(Upload).filter(Upload.upload_id.in_(upload_ids)).delete(synchronize_session=False)
+    db.commit()
+    for upload_id in upload_ids:
+        remove_part_file(upload_id)
+    return len(upload_ids)
@@ -0,0 +1,14 @@
+from datetime import timedelta
+from typing import Dict, Any
+
+from sqlalchemy.orm import Session
+
+from app.job.handlers import register_periodic_handler
+from app.upload import crud
+
+PRUNE_UPLOADS_JOB_TYPE = "upload.prune_expired"
+
+@register_periodic_handler(PRUNE_UPLOADS_JOB_TYPE, timedelta(hours=1))
+def prune_expired_uploads(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove resumable uploads that were abandoned"""
+    return {"removed": crud.prune_expired_uploads(db)}
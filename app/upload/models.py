@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from app.database import Base
+from datetime import datetime
+
+class Upload(Base):
+    __tablename__ = "uploads"
+
+    upload_id = Column(String, primary_key=True)  # 隨機 ID，也是暫存檔名
+    target = Column(String, nullable=False)  # photo、base_map
+    params = Column(Text)  # JSON，完成時建立資料所需的欄位
+    filename = Column(String)
+    content_type = Column(String)
+    upload_length = Column(Integer, nullable=False)
+    upload_offset = Column(Integer, nullable=False, default=0)
+    # 正在寫入的 PATCH 請求；同一個上傳一次只允許一個請求寫入暫存檔
+    claimed_by = Column(String)
+    claimed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
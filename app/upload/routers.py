@@ -0,0 +1,220 @@
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from sqlalchemy.orm import Session
+
+from app.base_map import crud as base_map_crud
+from app.base_map.schemas import BaseMapOut
+from app.database import get_db
+from app.photo import services as photo_services
+from app.photo.schemas import PhotoResponse
+from app.upload import crud, schemas
+from app.upload import jobs  # noqa: F401  註冊過期上傳清理工作
+
+router = APIRouter()
+
+# 協定沿用 tus 1.0 的標頭：建立後以 PATCH 依 Upload-Offset 續傳，HEAD 查詢已收到的位置
+TUS_VERSION = "1.0.0"
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
+
+def _upload_headers(upload) -> dict:
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.upload_offset),
+        "Upload-Length": str(upload.upload_length),
+        "Cache-Control": "no-store"
+    }
+
+def _get_upload_or_404(db: Session, upload_id: str):
+    db_upload = crud.get_upload(db, upload_id=upload_id)
+    if db_upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return db_upload
+
+@router.post("/", response_model=schemas.UploadOut, status_code=status.HTTP_201_CREATED)
+def create_upload(upload: schemas.UploadCreate, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Start a resumable upload of a photo or base map image"""
+    if upload.upload_length > crud.UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"File too large. At most {crud.UPLOAD_MAX_BYTES} bytes"
+        )
+    # 先檢查目標，避免傳完整個檔案才發現無法建立
+    if upload.target == "photo":
+        if upload.related_type is None or upload.related_id is None:
+            raise HTTPException(status_code=400, detail="related_type and related_id are required for photos")
+        photo_services.check_related_exists(db, upload.related_type, upload.related_id)
+        photo_services.get_photo_extension(upload.filename)
+        params = {
+            "related_type": upload.related_type,
+            "related_id": upload.related_id,
+            "description": upload.description
+        }
+    else:
+        if upload.base_map_id is None:
+            raise HTTPException(status_code=400, detail="base_map_id is required for base maps")
+        if base_map_crud.get_base_map(db, base_map_id=upload.base_map_id) is None:
+            raise HTTPException(status_code=404, detail="Base map not found")
+        params = {"base_map_id": upload.base_map_id}
+
+    db_upload = crud.create_upload(
+        db, upload.target, upload.upload_length, upload.filename, upload.content_type, params
+    )
+    response.headers.update(_upload_headers(db_upload))
+    response.headers["Location"] = str(request.url_for("get_upload", upload_id=db_upload.upload_id))
+    return db_upload
+
+@router.head("/{upload_id}")
+def head_upload(upload_id: str, db: Session = Depends(get_db)):
+    """How many bytes of the upload were received, resume from Upload-Offset"""
+    db_upload = _get_upload_or_404(db, upload_id)
+    return Response(status_code=status.HTTP_200_OK, headers=_upload_headers(db_upload))
+
+@router.get("/{upload_id}", response_model=schemas.UploadOut)
+def get_upload(upload_id: str, response: Response, db: Session = Depends(get_db)):
+    """Get the status of an upload"""
+    db_upload = _get_upload_or_404(db, upload_id)
+    response.headers.update(_upload_headers(db_upload))
+    return db_upload
+
+@router.patch("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def append_upload_chunk(upload_id: str, request: Request, db: Session = Depends(get_db)):
+    """Append the request body to the upload at Upload-Offset
+
+    連線中斷時已收到的部分仍會保留，客戶端以 HEAD 查詢後從新的位置續傳
+    """
+    db_upload = _get_upload_or_404(db, upload_id)
+    if request.headers.get("content-type") != CHUNK_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be {CHUNK_CONTENT_TYPE}"
+        )
+    try:
+        start = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+    if start != db_upload.upload_offset:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload-Offset {start} does not match the current offset {db_upload.upload_offset}"
+        )
+
+    # 寫入前先取得這個上傳的寫入權，重送的請求不會和仍在傳送的舊連線互相截斷
+    token = crud.claim_upload(db, upload_id, start)
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload is being written by another request or its offset changed"
+        )
+
+    remaining = db_upload.upload_length - start
+    written = 0
+    too_large = False
+    taken_over = False
+    recorded = False
+    refresh_interval = crud.UPLOAD_CLAIM_TIMEOUT_SECONDS / 3
+    last_refresh = time.monotonic()
+    try:
+        with open(crud.get_part_path(upload_id), "r+b") as part:
+            # 捨棄上次中斷後可能多寫、但未記錄的位元組
+            taken_over = not await run_in_threadpool(crud.truncate_part, db, upload_id, token, part, start)
+            try:
+                async for chunk in request.stream():
+                    if taken_over:
+                        break
+                    if written + len(chunk) > remaining:
+                        too_large = True
+                        break
+                    # 每個片段都在確認仍持有佔用後才寫入；已被接手時立即停止
+                    if not await run_in_threadpool(
+                        crud.write_part_chunk, db, upload_id, token, part, start + written, chunk
+                    ):
+                        taken_over = True
+                        break
+                    written += len(chunk)
+                    if time.monotonic() - last_refresh > refresh_interval:
+                        # 長時間的傳送定期更新佔用時間
+                        if not crud.refresh_claim(db, upload_id, token):
+                            taken_over = True
+                            break
+                        last_refresh = time.monotonic()
+            except ClientDisconnect:
+                pass
+            if too_large:
+                await run_in_threadpool(crud.truncate_part, db, upload_id, token, part, start)
+        if not too_large and not taken_over:
+            recorded = crud.release_claim(db, upload_id, token, start + written)
+    finally:
+        if not recorded:
+            crud.release_claim(db, upload_id, token)
+    if too_large:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail="Chunk exceeds Upload-Length"
+        )
+    if not recorded:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload was modified concurrently")
+    db.refresh(db_upload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_upload_headers(db_upload))
+
+@router.post("/{upload_id}/complete", response_model=schemas.UploadCompleteOut, status_code=status.HTTP_201_CREATED)
+def complete_upload(upload_id: str, request: Request, db: Session = Depends(get_db)):
+    """Create the photo or update the base map from a fully received upload"""
+    db_upload = _get_upload_or_404(db, upload_id)
+    if db_upload.upload_offset != db_upload.upload_length:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {db_upload.upload_offset} of {db_upload.upload_length} bytes received"
+        )
+    if crud.is_claimed(db_upload):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is still being written")
+    # 紀錄的 offset 之外再確認暫存檔本身，避免以不完整的檔案建立資料
+    part_size = crud.get_part_size(upload_id)
+    if part_size != db_upload.upload_length:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Stored upload has {part_size} of {db_upload.upload_length} bytes, upload it again"
+        )
+    params = crud.get_upload_params(db_upload)
+    result = schemas.UploadCompleteOut(upload_id=upload_id, target=db_upload.target)
+
+    # 上傳紀錄與建立的資料在同一個交易中提交；失敗時上傳保留，可再次完成
+    if db_upload.target == "photo":
+        related_type, related_id = params["related_type"], params["related_id"]
+        photo_services.check_related_exists(db, related_type, related_id)
+        image_url = photo_services.new_photo_url(
+            related_type, related_id, photo_services.get_photo_extension(db_upload.filename)
+        )
+        with open(crud.get_part_path(upload_id), "rb") as part:
+            checksum = photo_services.save_photo_file(part, image_url, db_upload.content_type)
+        db.delete(db_upload)
+        photos = photo_services.create_uploaded_photos(
+            db, related_type, related_id, [image_url], params["description"], [checksum]
+        )
+        base_url = str(request.base_url).rstrip('/')
+        result.photos = [
+            PhotoResponse(**photo.__dict__, full_url=photo_services.get_photo_full_url(photo.image_url, base_url))
+            for photo in photos
+        ]
+    else:
+        db_base_map = base_map_crud.get_base_map(db, base_map_id=params["base_map_id"])
+        if db_base_map is None:
+            raise HTTPException(status_code=404, detail="Base map not found")
+        db.delete(db_upload)
+        with open(crud.get_part_path(upload_id), "rb") as part:
+            db_base_map = base_map_crud.save_base_map_image(
+                db, db_base_map, part, db_upload.filename, db_upload.content_type
+            )
+        result.base_map = BaseMapOut.model_validate(db_base_map)
+
+    crud.remove_part_file(upload_id)
+    return result
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Cancel an upload"""
+    db_upload = _get_upload_or_404(db, upload_id)
+    crud.delete_upload(db, db_upload)
+    return None
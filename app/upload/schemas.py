@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from app.base_map.schemas import BaseMapOut
+from app.photo.schemas import PhotoResponse
+
+class UploadCreate(BaseModel):
+    target: Literal["photo", "base_map"]
+    filename: str
+    content_type: str = "application/octet-stream"
+    upload_length: int = Field(gt=0, description="Total size of the file in bytes")
+    # target 為 photo 時使用
+    related_type: Optional[str] = None
+    related_id: Optional[int] = None
+    description: Optional[str] = None
+    # target 為 base_map 時使用
+    base_map_id: Optional[int] = None
+
+class UploadOut(BaseModel):
+    upload_id: str
+    target: str
+    filename: Optional[str] = None
+    upload_length: int
+    upload_offset: int = Field(description="Bytes received so far, send the next chunk from here")
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = {"from_attributes": True}
+
+class UploadCompleteOut(BaseModel):
+    """What the finished upload created, depending on its target"""
+    upload_id: str
+    target: str
+    photos: Optional[List[PhotoResponse]] = None
+    base_map: Optional[BaseMapOut] = None
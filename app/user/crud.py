@@ -1,10 +1,18 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, selectinload
+from typing import Iterable, List, Optional, Dict, Any
+from datetime import datetime
 
 from app.user.models import User
 from app.user.schemas import UserCreate, UserUpdate
-from app.permission.models import Permission
 from app.project.models import Project
+from app.permission import crud as permission_crud
+from app.cache import TTLCache
+from app.utils import dialect_insert
+
+# line_id -> 使用者資料；LINE 登入每次都會查詢，其他 worker 的修改靠 ttl 限制過期時間
+_line_id_cache = TTLCache(ttl=60, maxsize=4096)
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """Get a single user by ID"""
@@ -14,6 +22,31 @@ def get_user_by_line_id(db: Session, line_id: str) -> Optional[User]:
     """Get a single user by LINE ID"""
     return db.query(User).filter(User.line_id == line_id).first()
 
+def get_user_data_by_line_id(db: Session, line_id: str) -> Optional[Dict[str, Any]]:
+    """Get the column values of a user by LINE ID, cached for LINE login"""
+    user_data = _line_id_cache.get(line_id)
+    if user_data is None:
+        db_user = get_user_by_line_id(db, line_id)
+        if not db_user:
+            return None
+        user_data = {
+            "user_id": db_user.user_id,
+            "name": db_user.name,
+            "email": db_user.email,
+            "company_name": db_user.company_name,
+            "line_id": db_user.line_id,
+            "avatar_path": db_user.avatar_path,
+            "created_at": db_user.created_at
+        }
+        _line_id_cache.set(line_id, user_data)
+    return dict(user_data)
+
+def invalidate_line_id_cache(*line_ids: Optional[str]) -> None:
+    """Drop cached users for the given LINE IDs"""
+    for line_id in line_ids:
+        if line_id:
+            _line_id_cache.pop(line_id)
+
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get a single user by email"""
     return db.query(User).filter(User.email == email).first()
@@ -22,19 +55,69 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     """Get a list of users with pagination"""
     return db.query(User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Create a new user"""
-    db_user = User(
-        name=user.name,
-        email=user.email,
-        company_name=user.company_name,
-        line_id=user.line_id,
-        avatar_path=user.avatar_path
-    )
-    db.add(db_user)
+def create_user(db: Session, user: UserCreate) -> Optional[User]:
+    """Create a new user, returns None if the LINE ID is already taken"""
+    values = {
+        "name": user.name,
+        "email": user.email,
+        "company_name": user.company_name,
+        # 空字串視為未綁定 LINE，避免違反唯一索引
+        "line_id": user.line_id or None,
+        "avatar_path": user.avatar_path,
+        "created_at": datetime.utcnow()
+    }
+    # 由唯一索引判斷重複，不需先查詢再新增；舊資料庫的索引由 python -m app.user.line_ids 建立
+    statement = dialect_insert(db, User).values(**values).on_conflict_do_nothing(index_elements=[User.line_id])
+    result = db.execute(statement)
+    if result.rowcount == 0:
+        db.rollback()
+        return None
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    return get_user(db, result.inserted_primary_key[0])
+
+def get_line_id_conflicts(connection: Connection) -> Dict[str, List[Dict[str, Any]]]:
+    """Users sharing a LINE ID, by LINE ID, which keep the unique index from being built"""
+    users = User.__table__
+    duplicated = (
+        select(users.c.line_id)
+        .where(users.c.line_id.isnot(None), users.c.line_id != "")
+        .group_by(users.c.line_id)
+        .having(func.count() > 1)
+    )
+    rows = connection.execute(
+        select(users.c.line_id, users.c.user_id, users.c.name, users.c.email, users.c.created_at)
+        .where(users.c.line_id.in_(duplicated))
+        .order_by(users.c.line_id, users.c.user_id)
+    ).mappings()
+    conflicts: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        conflicts.setdefault(row["line_id"], []).append(dict(row))
+    return conflicts
+
+def resolve_line_id_conflicts(connection: Connection, keep_user_ids: Iterable[int]) -> int:
+    """
+    Prepare users for the unique line_id index: empty LINE IDs become NULL and
+    every shared LINE ID stays only on the user listed in keep_user_ids.
+    Raises ValueError, without changing anything, unless exactly one user is
+    chosen for every shared LINE ID. Returns the number of users unbound.
+    """
+    keep = set(keep_user_ids)
+    conflicts = get_line_id_conflicts(connection)
+    keepers: Dict[str, int] = {}
+    for line_id, conflict_users in conflicts.items():
+        chosen = [u["user_id"] for u in conflict_users if u["user_id"] in keep]
+        if len(chosen) != 1:
+            raise ValueError(f"Choose exactly one user to keep LINE ID {line_id}: {[u['user_id'] for u in conflict_users]}")
+        keepers[line_id] = chosen[0]
+
+    users = User.__table__
+    connection.execute(update(users).where(users.c.line_id == "").values(line_id=None))
+    unbound = 0
+    for line_id, user_id in keepers.items():
+        unbound += connection.execute(
+            update(users).where(users.c.line_id == line_id, users.c.user_id != user_id).values(line_id=None)
+        ).rowcount
+    return unbound
 
 def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     """Update an existing user"""
@@ -42,22 +125,38 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     if not db_user:
         return None
     
+    old_line_id = db_user.line_id
     update_data = user.model_dump(exclude_unset=True)
+    if "line_id" in update_data:
+        update_data["line_id"] = update_data["line_id"] or None
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
     db.commit()
+    invalidate_line_id_cache(old_line_id, db_user.line_id)
     db.refresh(db_user)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
     """Delete a user"""
-    db_user = get_user(db, user_id)
+    # 刪除時需將子表外鍵設為 NULL，先一併載入關聯集合，避免逐一 lazy load
+    db_user = (
+        db.query(User)
+        .options(
+            selectinload(User.submitted_defects),
+            selectinload(User.submitted_improvements),
+            selectinload(User.confirmations)
+        )
+        .filter(User.user_id == user_id)
+        .first()
+    )
     if not db_user:
         return False
     
+    line_id = db_user.line_id
     db.delete(db_user)
     db.commit()
+    invalidate_line_id_cache(line_id)
     return True
 
 def get_user_with_projects(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
@@ -66,20 +165,23 @@ def get_user_with_projects(db: Session, user_id: int) -> Optional[Dict[str, Any]
     if not user:
         return None
     
-    # Get user's projects and roles
-    projects_query = (
-        db.query(Project, Permission.user_role)
-        .join(Permission, Permission.project_id == Project.project_id)
-        .join(User, User.email == Permission.user_email)
-        .filter(User.user_id == user_id)
-    )
+    # 由快取的角色對照表取得專案，不需每次 join permissions 與 users
+    roles = permission_crud.get_user_project_roles(db, user.email)
+    projects = []
+    if roles:
+        projects = (
+            db.query(Project)
+            .filter(Project.project_id.in_(list(roles)))
+            .order_by(Project.project_id)
+            .all()
+        )
     
     projects_data = []
-    for project, role in projects_query:
+    for project in projects:
         projects_data.append({
             "project_id": project.project_id,
             "project_name": project.project_name,
-            "role": role
+            "role": roles[project.project_id]
         })
     
     # Create result dictionary
@@ -0,0 +1,45 @@
+"""
+建立 users.line_id 唯一索引的一次性遷移。舊資料庫可能有空白或重複的 LINE ID，索引因此無法建立，
+新增使用者的 ON CONFLICT 也會失敗：
+
+    python -m app.user.line_ids                          # 只列出共用同一個 LINE ID 的使用者
+    python -m app.user.line_ids --keep 12 --keep 40 --apply
+
+空白的 LINE ID 改為 NULL；重複的 LINE ID 由 --keep 指定保留的使用者，其餘使用者解除綁定，
+需重新以 LINE 登入綁定。任一個重複的 LINE ID 未指定時不修改任何資料。
+"""
+import argparse
+import sys
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resolve shared LINE IDs and build the unique line_id index")
+    parser.add_argument("--keep", type=int, action="append", default=[], metavar="USER_ID",
+                        help="user that keeps its LINE ID, once for every shared LINE ID")
+    parser.add_argument("--apply", action="store_true", help="change the data and build the index")
+    args = parser.parse_args()
+
+    from app.database import engine
+    import app.main  # noqa: F401  載入所有資料表
+    from app.user.crud import get_line_id_conflicts, resolve_line_id_conflicts
+    from app.user.models import User
+
+    with engine.begin() as connection:
+        conflicts = get_line_id_conflicts(connection)
+        for line_id, users in conflicts.items():
+            print(f"LINE ID {line_id}:")
+            for user in users:
+                marker = "keep" if user["user_id"] in args.keep else "    "
+                print(f"  {marker} user {user['user_id']:>8}  {user['name']}  {user['email'] or '-'}  created {user['created_at']}")
+        if not args.apply:
+            print(f"dry-run: {len(conflicts)} shared LINE IDs, rerun with --keep USER_ID ... --apply")
+            return
+        try:
+            unbound = resolve_line_id_conflicts(connection, args.keep)
+        except ValueError as e:
+            sys.exit(str(e))
+        index = next(index for index in User.__table__.indexes if index.name == "ix_users_line_id")
+        index.create(bind=connection, checkfirst=True)
+    print(f"unbound LINE ID from {unbound} users, unique index ix_users_line_id is in place")
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,13 @@ class User(Base):
     __tablename__ = "users"
     
     user_id = Column(Integer, primary_key=True, index=True)
-    line_id = Column(String)
+    line_id = Column(String, unique=True, index=True)
     name = Column(String, nullable=False)
-    email = Column(String)
+    email = Column(String, index=True)
     company_name = Column(String)
     avatar_path = Column(String, default="static/avatar/default.png")
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     # 註解掉與 Permission 的關聯，因為 Permission 模型中對應的關聯已被註解
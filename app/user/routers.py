@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
-import shutil
 import os
-from pathlib import Path
 
 from app.database import get_db
 from app.user import crud, schemas
+from app.storage.backends import get_storage
 from app.utils import paginate_query
 
 router = APIRouter()
@@ -14,15 +14,14 @@ router = APIRouter()
 @router.post("/", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """Create a new user"""
-    # Check if user with the same LINE ID already exists
-    if user.line_id:
-        db_user = crud.get_user_by_line_id(db, line_id=user.line_id)
-        if db_user:
-            raise HTTPException(
-                status_code=400,
-                detail="User with this LINE ID already exists"
-            )
-    return crud.create_user(db=db, user=user)
+    db_user = crud.create_user(db=db, user=user)
+    # LINE ID 已存在時由唯一索引擋下
+    if db_user is None:
+        raise HTTPException(
+            status_code=400,
+            detail="User with this LINE ID already exists"
+        )
+    return db_user
 
 @router.get("/", response_model=List[schemas.UserOut])
 def read_users(
@@ -45,10 +44,10 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
 @router.get("/line/{line_id}", response_model=schemas.UserOut)
 def read_user_by_line_id(line_id: str, db: Session = Depends(get_db)):
     """Get a specific user by LINE ID"""
-    db_user = crud.get_user_by_line_id(db, line_id=line_id)
-    if db_user is None:
+    user_data = crud.get_user_data_by_line_id(db, line_id=line_id)
+    if user_data is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return user_data
 
 @router.get("/{user_id}/projects", response_model=schemas.UserWithProjectsOut)
 def read_user_with_projects(user_id: int, db: Session = Depends(get_db)):
@@ -63,7 +62,14 @@ def update_user(
     user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)
 ):
     """Update a user"""
-    db_user = crud.update_user(db, user_id=user_id, user=user)
+    try:
+        db_user = crud.update_user(db, user_id=user_id, user=user)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="User with this LINE ID already exists"
+        )
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
@@ -84,18 +90,13 @@ def upload_avatar(user_id: int, file: UploadFile = File(...), db: Session = Depe
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # 確保目錄存在
-    avatar_dir = Path("static/avatar")
-    avatar_dir.mkdir(parents=True, exist_ok=True)
-    
     # 建立檔案名稱 (使用使用者 ID)
     file_extension = os.path.splitext(file.filename)[1] if file.filename else ".png"
     avatar_filename = f"user_{user_id}{file_extension}"
     avatar_path = f"static/avatar/{avatar_filename}"
     
     # 儲存檔案
-    with open(avatar_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    get_storage().save(avatar_path, file.file, file.content_type)
     
     # 更新使用者的頭像路徑
     user_update = schemas.UserUpdate(avatar_path=avatar_path)
@@ -1,7 +1,10 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, Query
+from sqlalchemy.sql import func
 
 def check_exists(db: Session, model, id_value: int, id_field_name: str = "id"):
     """
@@ -54,3 +57,41 @@ def paginate_query(query, page: int = 1, page_size: int = 10):
         "page_size": page_size,
         "total_pages": total_pages
     }
+
+def query_with_counts(db: Session, model, counts: Dict[str, Any]) -> Query:
+    """
+    Build a query returning rows of `model` together with counts of related rows,
+    all in a single statement.
+
+    `counts` maps an output name to the foreign key column that references the
+    model's primary key, e.g. {"defect_count": DefectMark.base_map_id}. Each count
+    comes from one GROUP BY subquery LEFT JOINed to the model, so rows without
+    related records get 0 instead of being dropped.
+
+    Rows are tuples of (instance, count_1, count_2, ...) in the order of `counts`;
+    callers can still add filters, ordering and pagination to the returned query.
+    """
+    primary_key = inspect(model).primary_key[0]
+    query = db.query(model)
+    for name, foreign_key in counts.items():
+        grouped = (
+            db.query(foreign_key.label("key"), func.count().label("count"))
+            .filter(foreign_key.isnot(None))
+            .group_by(foreign_key)
+            .subquery()
+        )
+        query = query.outerjoin(grouped, grouped.c.key == primary_key)
+        query = query.add_columns(func.coalesce(grouped.c.count, 0).label(name))
+    return query.order_by(primary_key)
+
+def dialect_insert(db: Union[Session, Connection], model):
+    """
+    INSERT construct of the session's (or connection's) database dialect, which
+    supports on_conflict_do_nothing / on_conflict_do_update on SQLite and PostgreSQL.
+    """
+    dialect = db.dialect if isinstance(db, Connection) else db.get_bind().dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
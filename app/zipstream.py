@@ -0,0 +1,176 @@
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# 超過這個值的大小或位移改用 ZIP64 欄位
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_CHUNK_SIZE = 256 * 1024
+
+_UTF8_FLAG = 0x0800
+_EPOCH_DOS = (1980, 1, 1, 0, 0, 0)
+
+class ZipEntry(NamedTuple):
+    name: str
+    size: int
+    crc: int
+    modified: Tuple[int, int, int, int, int, int]
+    # 內容本身、要讀取的檔案路徑，或交給 iter_zip_range 的 read_source 讀取的物件
+    source: Any
+
+class ZipLayout(NamedTuple):
+    entries: List[ZipEntry]
+    # 依序組成 ZIP 的片段：bytes 或 (內容來源, 長度)
+    segments: List[Union[bytes, Tuple[Any, int]]]
+    size: int
+
+# read_source(來源, 起點, 終點)：依序產生來源中 [起點, 終點) 的位元組
+SourceReader = Callable[[Any, int, int], Iterator[bytes]]
+
+def file_crc32(path: str) -> int:
+    """CRC32 of a file; prefer checksums recorded when the file was written"""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(ZIP_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def bytes_entry(name: str, data: bytes, modified: Optional[datetime] = None) -> ZipEntry:
+    stamp = modified.timetuple()[:6] if modified is not None else _EPOCH_DOS
+    return ZipEntry(name, len(data), zlib.crc32(data), _dos_clamp(stamp), data)
+
+def file_entry(name: str, path: str, modified: Optional[datetime] = None, crc: Optional[int] = None) -> ZipEntry:
+    """Entry read from a file; pass crc when it was computed while writing the file"""
+    stat = os.stat(path)
+    stamp = (modified or datetime.fromtimestamp(stat.st_mtime)).timetuple()[:6]
+    if crc is None:
+        crc = file_crc32(path)
+    return ZipEntry(name, stat.st_size, crc, _dos_clamp(stamp), path)
+
+def source_entry(name: str, source: Any, size: int, crc: int, modified: Optional[datetime] = None) -> ZipEntry:
+    """Entry whose content is produced by the read_source given to iter_zip_range"""
+    stamp = modified.timetuple()[:6] if modified is not None else _EPOCH_DOS
+    return ZipEntry(name, size, crc, _dos_clamp(stamp), source)
+
+def _dos_clamp(stamp: Tuple[int, ...]) -> Tuple[int, int, int, int, int, int]:
+    # DOS 時間只能表示 1980 年之後
+    return tuple(stamp) if stamp[0] >= 1980 else _EPOCH_DOS  # type: ignore[return-value]
+
+def _dos_time(stamp: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = stamp
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+def _local_header(entry: ZipEntry, name: bytes) -> bytes:
+    dos_time, dos_date = _dos_time(entry.modified)
+    extra = b""
+    size = entry.size
+    version = 10
+    if entry.size >= ZIP64_LIMIT:
+        extra = struct.pack("<2H2Q", 0x0001, 16, entry.size, entry.size)
+        size = 0xFFFFFFFF
+        version = 45
+    return struct.pack(
+        "<4s5H3L2H", b"PK\x03\x04", version, _UTF8_FLAG, 0, dos_time, dos_date,
+        entry.crc, size, size, len(name), len(extra)
+    ) + name + extra
+
+def _central_header(entry: ZipEntry, name: bytes, offset: int) -> bytes:
+    dos_time, dos_date = _dos_time(entry.modified)
+    zip64 = []
+    size = entry.size
+    if entry.size >= ZIP64_LIMIT:
+        zip64 += [entry.size, entry.size]
+        size = 0xFFFFFFFF
+    if offset >= ZIP64_LIMIT:
+        zip64.append(offset)
+        offset = 0xFFFFFFFF
+    extra = struct.pack(f"<2H{len(zip64)}Q", 0x0001, 8 * len(zip64), *zip64) if zip64 else b""
+    version = 45 if zip64 else 10
+    return struct.pack(
+        "<4s6H3L5H2L", b"PK\x01\x02", version, version, _UTF8_FLAG, 0, dos_time, dos_date,
+        entry.crc, size, size, len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset
+    ) + name + extra
+
+def _end_records(count: int, directory_size: int, directory_offset: int) -> bytes:
+    records = b""
+    if count >= 0xFFFF or directory_size >= ZIP64_LIMIT or directory_offset >= ZIP64_LIMIT:
+        end64_offset = directory_offset + directory_size
+        records += struct.pack(
+            "<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0,
+            count, count, directory_size, directory_offset
+        )
+        records += struct.pack("<4sLQL", b"PK\x06\x07", 0, end64_offset, 1)
+        count = 0xFFFF
+        directory_size = 0xFFFFFFFF
+        directory_offset = 0xFFFFFFFF
+    return records + struct.pack(
+        "<4s4H2LH", b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+        min(directory_size, 0xFFFFFFFF), min(directory_offset, 0xFFFFFFFF), 0
+    )
+
+def build_zip_layout(entries: List[ZipEntry]) -> ZipLayout:
+    """
+    Byte layout of an uncompressed ZIP of entries. Sizes and CRCs are known
+    up front, so the archive length is fixed and any byte range of it can be
+    produced without building the rest.
+    """
+    segments: List[Union[bytes, Tuple[Any, int]]] = []
+    directory = []
+    offset = 0
+    for entry in entries:
+        name = entry.name.encode("utf-8")
+        header = _local_header(entry, name)
+        segments.append(header)
+        segments.append(entry.source if isinstance(entry.source, bytes) else (entry.source, entry.size))
+        directory.append(_central_header(entry, name, offset))
+        offset += len(header) + entry.size
+    directory_bytes = b"".join(directory)
+    segments.append(directory_bytes)
+    segments.append(_end_records(len(entries), len(directory_bytes), offset))
+    size = offset + len(directory_bytes) + len(segments[-1])
+    return ZipLayout(entries, segments, size)
+
+def _segment_length(segment: Union[bytes, Tuple[Any, int]]) -> int:
+    return len(segment) if isinstance(segment, bytes) else segment[1]
+
+def read_stream_range(f: BinaryIO, first: int, last: int, name: str) -> Iterator[bytes]:
+    """Bytes first..last (exclusive) of an open file object, in fixed-size chunks"""
+    f.seek(first)
+    remaining = last - first
+    while remaining > 0:
+        chunk = f.read(min(ZIP_CHUNK_SIZE, remaining))
+        if not chunk:
+            # 檔案在建立 layout 之後被截短，繼續輸出會產生錯誤的壓縮檔
+            raise IOError(f"File changed while streaming: {name}")
+        remaining -= len(chunk)
+        yield chunk
+
+def read_file_range(path: str, first: int, last: int) -> Iterator[bytes]:
+    """Bytes first..last (exclusive) of a file, in fixed-size chunks"""
+    with open(path, "rb") as f:
+        yield from read_stream_range(f, first, last, path)
+
+def iter_zip_range(
+    layout: ZipLayout,
+    start: int = 0,
+    end: Optional[int] = None,
+    read_source: SourceReader = read_file_range
+    ) -> Iterator[bytes]:
+    """Bytes start..end (inclusive) of the archive; entry contents come from read_source"""
+    end = layout.size - 1 if end is None else end
+    position = 0
+    for segment in layout.segments:
+        length = _segment_length(segment)
+        segment_start, segment_end = position, position + length
+        position = segment_end
+        if segment_end <= start or length == 0:
+            continue
+        if segment_start > end:
+            break
+        first = max(start - segment_start, 0)
+        last = min(end + 1 - segment_start, length)
+        if isinstance(segment, bytes):
+            yield segment[first:last]
+            continue
+        yield from read_source(segment[0], first, last)
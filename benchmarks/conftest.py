@@ -0,0 +1,123 @@
+"""
+CRUD 微基準測試的共用 fixture。
+
+    pip install -r benchmarks/requirements.txt
+    BENCHMARK_SIZES=1000,100000 python -m pytest benchmarks/ --benchmark-only
+
+每個資料量只會以 app.seed 建立一次種子資料庫（存放於 BENCHMARK_DB_DIR），
+之後重複使用；每個測試都在交易中執行並於結束時回滾，不會改動種子資料。
+"""
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+import app.main  # noqa: F401  載入所有資料表
+from app.seed import seed_database
+from app.defect.models import Defect
+from app.improvement.models import Improvement
+from app.permission.models import Permission
+from app.user.models import User
+
+BENCHMARK_SIZES = [int(size) for size in os.getenv("BENCHMARK_SIZES", "1000").split(",") if size]
+BENCHMARK_DB_DIR = os.getenv(
+    "BENCHMARK_DB_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".benchmarks", "db")
+)
+BENCHMARK_SEED = 42
+# 固定時間基準，確保每次建立的資料完全相同
+BENCHMARK_AS_OF = datetime(2025, 1, 1)
+
+def _create_engine(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    # 與 app/tests 相同，讓 pysqlite 正確處理 SAVEPOINT
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+def _schema_digest() -> str:
+    # 資料表結構改變時換檔名，不會沿用舊結構的種子資料庫
+    columns = sorted(
+        f"{table.name}.{column.name}:{column.type}"
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+    )
+    return hashlib.sha1("\n".join(columns).encode("utf-8")).hexdigest()[:8]
+
+def _seeded_database(size: int) -> str:
+    os.makedirs(BENCHMARK_DB_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_DB_DIR, f"seed-{size}-{BENCHMARK_SEED}-{_schema_digest()}.db")
+    if os.path.exists(path):
+        return path
+    # 先寫到暫存檔，中斷時不會留下不完整的資料庫
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    engine = _create_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        seed_database(
+            connection,
+            projects=max(2, min(50, size // 20000)),
+            defects=size,
+            seed=BENCHMARK_SEED,
+            as_of=BENCHMARK_AS_OF
+        )
+    engine.dispose()
+    os.replace(tmp_path, path)
+    return path
+
+@pytest.fixture(scope="session", params=BENCHMARK_SIZES, ids=lambda size: f"{size}defects")
+def seeded_engine(request):
+    engine = _create_engine(_seeded_database(request.param))
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def bench_db(seeded_engine):
+    connection = seeded_engine.connect()
+    transaction = connection.begin()
+    session = sessionmaker(autocommit=False, autoflush=False)(
+        bind=connection, join_transaction_mode="create_savepoint"
+    )
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+@pytest.fixture
+def sample(bench_db):
+    """Representative ids from the seeded database"""
+    chained = bench_db.execute(
+        select(Defect.previous_defect_id).where(Defect.previous_defect_id.isnot(None)).limit(1)
+    ).scalar()
+    improvement = bench_db.execute(select(Improvement.improvement_id, Improvement.defect_id).limit(1)).first()
+    permission = bench_db.execute(select(Permission.project_id, Permission.user_email).limit(1)).first()
+    user_id = bench_db.execute(select(User.user_id).limit(1)).scalar()
+    return {
+        "project_id": permission.project_id,
+        "user_email": permission.user_email,
+        "user_id": user_id,
+        "defect_id": improvement.defect_id,
+        "improvement_id": improvement.improvement_id,
+        "chained_defect_id": chained
+    }
@@ -0,0 +1,357 @@
+"""
+端對端 HTTP 壓力測試：以多個非同步 httpx client 模擬實際操作流程，
+輸出各端點的 p50/p95/p99 延遲與吞吐量。
+
+    # 自動建立種子資料庫並啟動 uvicorn
+    python -m benchmarks.http_load --defects 100000 --concurrency 20 --duration 30 --output results.json
+
+    # 對既有服務測試，並與先前的結果比較
+    python -m benchmarks.http_load --base-url http://localhost:8000 --baseline results.json
+
+操作流程：
+- inspector：建立缺失、加上圖面標記、上傳照片
+- manager：統計、各種 with-counts、缺失列表
+- vendor：以唯一碼查詢缺失並提交改善與照片
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Recorder:
+    """Latency samples per endpoint label, e.g. 'GET /defects/stats'"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - start
+        self.samples.setdefault(label, []).append(elapsed)
+        if response is None or response.status_code >= 400:
+            self.errors[label] = self.errors.get(label, 0) + 1
+            return None
+        return response
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles (ms) and throughput per endpoint"""
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        values = sorted(samples)
+        endpoints[label] = {
+            "count": len(values),
+            "errors": recorder.errors.get(label, 0),
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2)
+        }
+    total = sum(endpoint["count"] for endpoint in endpoints.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints
+    }
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compare p95 latency and throughput per endpoint with a previous run.
+
+    An endpoint regresses when its p95 grows by more than threshold.
+    """
+    rows = []
+    for mix_name, mix in results["mixes"].items():
+        baseline_mix = baseline.get("mixes", {}).get(mix_name)
+        if not baseline_mix:
+            continue
+        for label, current in mix["endpoints"].items():
+            previous = baseline_mix["endpoints"].get(label)
+            if not previous or not previous["p95_ms"]:
+                continue
+            p95_change = current["p95_ms"] / previous["p95_ms"] - 1
+            throughput_change = (
+                current["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0.0
+            )
+            rows.append({
+                "mix": mix_name,
+                "endpoint": label,
+                "baseline_p95_ms": previous["p95_ms"],
+                "p95_ms": current["p95_ms"],
+                "p95_change": round(p95_change, 4),
+                "throughput_change": round(throughput_change, 4),
+                "regression": p95_change > threshold
+            })
+    return rows
+
+def _png_bytes() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (180, 180, 180)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+async def discover_context(client: httpx.AsyncClient, max_projects: int = 10) -> Dict[str, Any]:
+    """Collect ids the flows need from the running API"""
+    projects = (await client.get("/projects/", params={"limit": 100})).json()[:max_projects]
+    context = {"projects": [], "unique_codes": []}
+    for project in projects:
+        project_id = project["project_id"]
+        base_maps = (await client.get("/base-maps/", params={"project_id": project_id})).json()
+        vendors = (await client.get("/vendors/with-counts", params={"project_id": project_id})).json()
+        defects = (await client.get("/defects/", params={"project_id": project_id, "limit": 200})).json()
+        users = sorted({defect["submitted_id"] for defect in defects if defect["submitted_id"]})
+        if not base_maps or not users:
+            continue
+        context["projects"].append({
+            "project_id": project_id,
+            "base_map_ids": [base_map["base_map_id"] for base_map in base_maps],
+            "vendor_ids": [vendor["vendor_id"] for vendor in vendors],
+            "category_ids": sorted({d["defect_category_id"] for d in defects if d["defect_category_id"]}),
+            "user_ids": users
+        })
+        context["unique_codes"].extend(
+            defect["unique_code"] for defect in defects if defect["status"] in ("等待中", "改善中")
+        )
+    if not context["projects"] or not context["unique_codes"]:
+        raise RuntimeError("The target database has no usable projects; seed it with python -m app.seed first")
+    return context
+
+async def inspector_flow(client, recorder: Recorder, context: Dict[str, Any], rng: random.Random, state: Dict[str, Any]):
+    project = rng.choice(context["projects"])
+    response = await recorder.request(client, "POST /defects/", "POST", "/defects/", json={
+        "project_id": project["project_id"],
+        "submitted_id": rng.choice(project["user_ids"]),
+        "location": "3F 走道",
+        "defect_category_id": rng.choice(project["category_ids"]) if project["category_ids"] else None,
+        "defect_description": "壓力測試建立的缺失",
+        "assigned_vendor_id": rng.choice(project["vendor_ids"]) if project["vendor_ids"] else None,
+        "expected_completion_day": (date.today() + timedelta(days=14)).isoformat(),
+        "status": "等待中"
+    })
+    if response is None:
+        return
+    defect_id = response.json()["defect_id"]
+    await recorder.request(client, "POST /defect-marks/", "POST", "/defect-marks/", json={
+        "defect_id": defect_id,
+        "base_map_id": rng.choice(project["base_map_ids"]),
+        "coordinate_x": round(rng.uniform(0, 4000), 1),
+        "coordinate_y": round(rng.uniform(0, 3000), 1),
+        "scale": 1.0
+    })
+    await _upload_photo(client, recorder, state, "defect", defect_id)
+
+async def manager_flow(client, recorder: Recorder, context: Dict[str, Any], rng: random.Random, state: Dict[str, Any]):
+    project_id = rng.choice(context["projects"])["project_id"]
+    await recorder.request(client, "GET /defects/stats", "GET", "/defects/stats", params={"project_id": project_id})
+    await recorder.request(client, "GET /projects/{project_id}/with-counts", "GET", f"/projects/{project_id}/with-counts")
+    await recorder.request(client, "GET /vendors/with-counts", "GET", "/vendors/with-counts", params={"project_id": project_id})
+    await recorder.request(
+        client, "GET /base-maps/project/{project_id}/with-counts", "GET", f"/base-maps/project/{project_id}/with-counts"
+    )
+    await recorder.request(client, "GET /defects/", "GET", "/defects/", params={"project_id": project_id, "limit": 100})
+
+async def vendor_flow(client, recorder: Recorder, context: Dict[str, Any], rng: random.Random, state: Dict[str, Any]):
+    unique_code = rng.choice(context["unique_codes"])
+    await recorder.request(client, "GET /defects/unique_code/{unique_code}", "GET", f"/defects/unique_code/{unique_code}")
+    response = await recorder.request(
+        client, "POST /improvements/by-unique-code/{unique_code}", "POST", f"/improvements/by-unique-code/{unique_code}",
+        json={"content": "已完成修繕", "improvement_date": date.today().isoformat()}
+    )
+    if response is not None:
+        await _upload_photo(client, recorder, state, "improvement", response.json()["improvement_id"])
+
+async def _upload_photo(client, recorder: Recorder, state: Dict[str, Any], related_type: str, related_id: int):
+    response = await recorder.request(
+        client, "POST /photos/", "POST", "/photos/",
+        data={"related_type": related_type, "related_id": str(related_id)},
+        files={"file": ("benchmark.png", state["image"], "image/png")}
+    )
+    if response is not None:
+        state["uploaded"].append(response.json())
+
+MIXES: Dict[str, Callable[..., Awaitable[None]]] = {
+    "inspector": inspector_flow,
+    "manager": manager_flow,
+    "vendor": vendor_flow
+}
+
+async def run_mix(
+    base_url: str,
+    flow: Callable[..., Awaitable[None]],
+    context: Dict[str, Any],
+    state: Dict[str, Any],
+    concurrency: int,
+    duration: float,
+    seed: int
+) -> Dict[str, Any]:
+    """Run one flow from concurrency clients for duration seconds"""
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(worker_id: int):
+            rng = random.Random(seed * 1000 + worker_id)
+            while time.monotonic() < deadline:
+                await flow(client, recorder, context, rng, state)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return summarize(recorder, elapsed)
+
+async def run_benchmark(base_url: str, mixes: List[str], concurrency: int, duration: float, seed: int) -> Dict[str, Any]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        context = await discover_context(client)
+    state = {"image": _png_bytes(), "uploaded": []}
+    results = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "base_url": base_url,
+        "config": {"mixes": mixes, "concurrency": concurrency, "duration_s": duration, "seed": seed},
+        "mixes": {}
+    }
+    for name in mixes:
+        results["mixes"][name] = await run_mix(base_url, MIXES[name], context, state, concurrency, duration, seed)
+    results["uploaded_photos"] = state["uploaded"]
+    return results
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(database_url: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    """Start uvicorn on a free port and wait until it answers"""
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 60 seconds")
+
+def remove_uploaded_files(photos: List[Dict[str, Any]]) -> None:
+    # 照片存放在專案的 static 目錄，測試完成後移除
+    for photo in photos:
+        path = os.path.join(REPO_ROOT, photo["image_url"].lstrip("/"))
+        if os.path.exists(path):
+            os.remove(path)
+
+def print_report(results: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> None:
+    for mix_name, mix in results["mixes"].items():
+        print(f"\n[{mix_name}] {mix['requests']} requests, {mix['errors']} errors, {mix['throughput_rps']} req/s")
+        print(f"  {'endpoint':<52} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for label, endpoint in mix["endpoints"].items():
+            print(
+                f"  {label:<52} {endpoint['count']:>7} {endpoint['errors']:>5} {endpoint['throughput_rps']:>8}"
+                f" {endpoint['p50_ms']:>8} {endpoint['p95_ms']:>8} {endpoint['p99_ms']:>8}"
+            )
+    if comparison:
+        print("\nCompared with baseline (p95):")
+        for row in comparison:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(
+                f"  {row['mix']:<10} {row['endpoint']:<52} {row['baseline_p95_ms']:>8} -> {row['p95_ms']:>8}"
+                f" ({row['p95_change'] * 100:+.1f}%){flag}"
+            )
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end HTTP load benchmark")
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--mix", action="append", choices=sorted(MIXES), help="mix to run, repeatable (default: all)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per mix")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--defects", type=int, default=50000, help="size of the seeded database when starting a server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting a server")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95 growth counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    mixes = args.mix or list(MIXES)
+
+    process = None
+    tmpdir = None
+    base_url = args.base_url
+    try:
+        if not base_url:
+            tmpdir = tempfile.TemporaryDirectory()
+            database_url = f"sqlite:///{os.path.join(tmpdir.name, 'benchmark.db')}"
+            subprocess.run(
+                [sys.executable, "-m", "app.seed", "--defects", str(args.defects), "--seed", str(args.seed)],
+                cwd=REPO_ROOT, env=dict(os.environ, DATABASE_URL=database_url), check=True
+            )
+            process, base_url = start_server(database_url, args.workers)
+
+        results = asyncio.run(run_benchmark(base_url, mixes, args.concurrency, args.duration, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    if process is not None:
+        remove_uploaded_files(results["uploaded_photos"])
+    results["uploaded_photos"] = len(results["uploaded_photos"])
+    results["config"]["defects"] = args.defects if not args.base_url else None
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare_to_baseline(results, json.load(f), args.threshold)
+        results["comparison"] = comparison
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_report(results, comparison)
+    if args.fail_on_regression and comparison and any(row["regression"] for row in comparison):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+回應壓縮的 CPU 成本與壓縮後大小。
+
+壓縮前後的 bytes 數記錄在 extra_info，以 --benchmark-json 輸出即可比較：
+
+    python -m pytest benchmarks/test_compression_benchmarks.py --benchmark-only --benchmark-json=compression.json
+"""
+import pytest
+
+from app import compression, responses
+from app.defect import crud as defect_crud
+from app.defect.schemas import DefectDetailOut, DefectFullDetailOut
+
+ENCODINGS = [
+    ("gzip", {"gzip_level": 1}),
+    ("gzip", {"gzip_level": 6}),
+    ("gzip", {"gzip_level": 9}),
+    ("br", {"brotli_quality": 4}),
+    ("br", {"brotli_quality": 11}),
+]
+ENCODING_IDS = [f"{encoding}-{next(iter(options.values()))}" for encoding, options in ENCODINGS]
+
+@pytest.fixture
+def defect_list_body(bench_db):
+    rows = defect_crud.get_defects_with_details(bench_db, limit=1000)
+    return responses.trusted_response(rows, DefectDetailOut, validate=False).body
+
+@pytest.fixture
+def defect_full_body(bench_db, sample):
+    details = defect_crud.get_defect_details(bench_db, sample["defect_id"], True, True, True, True)
+    return responses.trusted_response(details, DefectFullDetailOut, validate=False).body
+
+def _run(benchmark, body, encoding, options):
+    if encoding == "br" and compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    compressed = benchmark(compression.compress, body, encoding, **options)
+    benchmark.extra_info["uncompressed_bytes"] = len(body)
+    benchmark.extra_info["compressed_bytes"] = len(compressed)
+    benchmark.extra_info["ratio"] = round(len(compressed) / len(body), 4)
+    assert len(compressed) < len(body)
+
+@pytest.mark.parametrize("encoding,options", ENCODINGS, ids=ENCODING_IDS)
+def test_compress_defect_list(benchmark, defect_list_body, encoding, options):
+    _run(benchmark, defect_list_body, encoding, options)
+
+@pytest.mark.parametrize("encoding,options", ENCODINGS, ids=ENCODING_IDS)
+def test_compress_defect_full(benchmark, defect_full_body, encoding, options):
+    _run(benchmark, defect_full_body, encoding, options)
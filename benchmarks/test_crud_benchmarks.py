@@ -0,0 +1,82 @@
+"""常用 CRUD 函式的微基準測試，資料量由 BENCHMARK_SIZES 控制。"""
+import itertools
+
+import pytest
+
+from app.confirmation import crud as confirmation_crud
+from app.confirmation.schemas import ConfirmationCreate
+from app.defect import crud as defect_crud
+from app.defect.models import Defect
+from app.defect.schemas import DefectUpdate
+from app.permission import crud as permission_crud
+
+DETAIL_FLAGS = list(itertools.product([False, True], repeat=4))
+
+def test_get_defects_with_details(benchmark, bench_db, sample):
+    result = benchmark(defect_crud.get_defects_with_details, bench_db, project_id=sample["project_id"], limit=100)
+    assert len(result) == 100
+
+def test_get_defects_with_details_unfiltered(benchmark, bench_db):
+    result = benchmark(defect_crud.get_defects_with_details, bench_db, limit=1000)
+    assert result
+
+@pytest.mark.parametrize(
+    "with_marks,with_photos,with_improvements,with_full_related",
+    DETAIL_FLAGS,
+    ids=["".join("1" if flag else "0" for flag in flags) for flags in DETAIL_FLAGS]
+)
+def test_get_defect_details(benchmark, bench_db, sample, with_marks, with_photos, with_improvements, with_full_related):
+    result = benchmark(
+        defect_crud.get_defect_details,
+        bench_db,
+        sample["defect_id"],
+        with_marks=with_marks,
+        with_photos=with_photos,
+        with_improvements=with_improvements,
+        with_full_related=with_full_related
+    )
+    assert result["defect_id"] == sample["defect_id"]
+
+def test_get_defect_stats_project(benchmark, bench_db, sample):
+    result = benchmark(defect_crud.get_defect_stats, bench_db, sample["project_id"])
+    assert result["total_count"] > 0
+
+def test_get_defect_stats_all(benchmark, bench_db):
+    result = benchmark(defect_crud.get_defect_stats, bench_db)
+    assert result["total_count"] > 0
+
+def test_get_permissions_with_details(benchmark, bench_db, sample):
+    result = benchmark(permission_crud.get_permissions_with_details, bench_db, project_id=sample["project_id"])
+    assert result
+
+def test_get_permissions_with_details_by_user(benchmark, bench_db, sample):
+    result = benchmark(permission_crud.get_permissions_with_details, bench_db, user_email=sample["user_email"])
+    assert result
+
+@pytest.mark.parametrize("status", ["接受", "退回"], ids=["accepted", "returned"])
+def test_create_confirmation(benchmark, bench_db, sample, status):
+    confirmation = ConfirmationCreate(
+        improvement_id=sample["improvement_id"],
+        confirmer_id=sample["user_id"],
+        comment="benchmark",
+        confirmation_date="2025-01-01",
+        status=status
+    )
+    result = benchmark(confirmation_crud.create_confirmation, bench_db, confirmation)
+    assert result.confirmation_id
+
+def test_update_defect_with_propagation(benchmark, bench_db, sample):
+    defect_id = sample["chained_defect_id"]
+    assert defect_id is not None
+
+    def reset():
+        # 每輪重設狀態，讓更新為「退件」時都會帶動後續缺失單
+        bench_db.query(Defect).filter(Defect.defect_id == defect_id).update({"status": "待確認"})
+        bench_db.query(Defect).filter(Defect.previous_defect_id == defect_id).update({"status": "等待中"})
+        bench_db.commit()
+        return (bench_db, defect_id, DefectUpdate(status="退件")), {}
+
+    benchmark.pedantic(defect_crud.update_defect, setup=reset, rounds=50)
+
+    linked = bench_db.query(Defect).filter(Defect.previous_defect_id == defect_id).all()
+    assert linked and all(defect.status == "改善中" for defect in linked)
@@ -0,0 +1,33 @@
+"""缺失清單序列化的微基準測試：response model 驗證路徑與 trusted orjson 路徑比較。"""
+import json
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app import responses
+from app.defect import crud as defect_crud
+from app.defect.schemas import DefectDetailOut
+
+LIST_ADAPTER = TypeAdapter(List[DefectDetailOut])
+
+@pytest.fixture
+def defect_rows(bench_db):
+    rows = defect_crud.get_defects_with_details(bench_db, limit=1000)
+    assert rows
+    return rows
+
+def _validated_json(rows):
+    # FastAPI 在 response_model 上做的事：驗證後再序列化
+    return LIST_ADAPTER.dump_json(LIST_ADAPTER.validate_python(rows))
+
+def _trusted_json(rows):
+    return responses.trusted_response(rows, DefectDetailOut, validate=False).body
+
+def test_serialize_defects_response_model(benchmark, defect_rows):
+    body = benchmark(_validated_json, defect_rows)
+    assert len(json.loads(body)) == len(defect_rows)
+
+def test_serialize_defects_trusted(benchmark, defect_rows):
+    body = benchmark(_trusted_json, defect_rows)
+    assert json.loads(body) == json.loads(_validated_json(defect_rows))